@@ -0,0 +1,267 @@
+"""
+Materialized per-agent, per-day statistics.
+
+Every saved report updates one small document per (agent_name, date) in the
+stats collection, so trend views read O(days) documents instead of scanning
+O(calls) full reports. Rebuild from the reports collection after a backfill:
+
+    python agent_stats.py --rebuild [--agent NAME]
+"""
+import os
+import argparse
+from collections import defaultdict
+
+import numpy as np
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+from mongo_connector import db, collection, create_indexes_once
+
+load_dotenv()
+
+# ---------------- Stats Settings ----------------
+STATS_COLLECTION = os.getenv("MONGO_STATS_COLLECTION", "agent_daily_stats")
+# Most recent feature values kept per day for percentiles (means use exact sums)
+STATS_MAX_SAMPLES = int(os.getenv("STATS_MAX_SAMPLES", "1000"))
+SCALAR_FEATURES = ("pitch", "pitch_range", "tempo", "jitter", "zero_crossing_rate", "rms_energy")
+PERCENTILES = (50, 90, 95)
+
+# Only the fields call_metrics reads, so a rebuild never loads feature arrays
+METRICS_PROJECTION = dict(
+    {"agent_name": 1, "date": 1, "report.bedrock_analysis": 1, "report.classification.status": 1},
+    **{f"report.audio_features.{name}": 1 for name in SCALAR_FEATURES}
+)
+
+stats_collection = db[STATS_COLLECTION]
+
+
+def ensure_indexes():
+    stats_collection.create_index([("agent_name", 1), ("date", 1)], name="agent_date", unique=True)
+
+
+def _field_key(name):
+    """Rule/status text usable as a MongoDB field name."""
+    key = str(name).strip().replace(".", "_")
+    return key.lstrip("$") or "_"
+
+
+def _rule_name(violation):
+    if isinstance(violation, dict):
+        for field in ("rule", "violation", "phrase", "text"):
+            if violation.get(field):
+                return violation[field]
+        return "unknown"
+    return violation
+
+
+def call_metrics(report):
+    """The per-call numbers that feed the daily aggregates."""
+    report = report or {}
+    analysis = report.get("bedrock_analysis") or {}
+    violations = analysis.get("violations") or []
+    features = report.get("audio_features") or {}
+    by_rule = defaultdict(int)
+    for v in violations:
+        by_rule[_field_key(_rule_name(v))] += 1
+    status = (report.get("classification") or {}).get("status")
+    return {
+        "compliant": not violations and not analysis.get("total_violations"),
+        "violations": len(violations),
+        "by_rule": dict(by_rule),
+        "status": None if status is None else _field_key(status),
+        "features": {
+            name: float(features[name])
+            for name in SCALAR_FEATURES
+            if isinstance(features.get(name), (int, float))
+        }
+    }
+
+
+def _update(metrics, sign=1):
+    """Update document adding (sign=1) or removing (sign=-1) one call's metrics."""
+    inc = {
+        "calls": sign,
+        "compliant_calls": sign if metrics["compliant"] else 0,
+        "violations_total": sign * metrics["violations"]
+    }
+    for rule, count in metrics["by_rule"].items():
+        inc[f"violations_by_rule.{rule}"] = sign * count
+    if metrics["status"] is not None:
+        inc[f"status_counts.{metrics['status']}"] = sign
+    for name, value in metrics["features"].items():
+        inc[f"features.{name}.sum"] = sign * value
+        inc[f"features.{name}.count"] = sign
+    update = {"$inc": inc}
+    if sign > 0 and metrics["features"]:
+        # Samples are append-only; a replaced call's old values age out of the window
+        update["$push"] = {
+            f"samples.{name}": {"$each": [value], "$slice": -STATS_MAX_SAMPLES}
+            for name, value in metrics["features"].items()
+        }
+    return update
+
+
+def stats_ops(agent_name, date, report, previous=None):
+    """
+    Write operations applying one saved report to its day's stats. ``previous``
+    is the report it replaced (same recording saved again), whose counts are
+    taken back out first.
+    """
+    ops = []
+    if previous is not None:
+        prev_report = previous.get("report")
+        ops.append(UpdateOne({"agent_name": previous.get("agent_name", agent_name),
+                              "date": previous.get("date", date)},
+                             _update(call_metrics(prev_report), sign=-1)))
+    ops.append(UpdateOne({"agent_name": agent_name, "date": date},
+                         _update(call_metrics(report)), upsert=True))
+    return ops
+
+
+def recheck_ops(agent_name, date, old_report, new_report):
+    """
+    Stats update for a report re-checked in place (reaudit.py): the call and
+    its feature samples are already counted, so only the compliance,
+    violation and status counters move.
+    """
+    old, new = call_metrics(old_report), call_metrics(new_report)
+    inc = defaultdict(int)
+    inc["compliant_calls"] += int(new["compliant"]) - int(old["compliant"])
+    inc["violations_total"] += new["violations"] - old["violations"]
+    for sign, metrics in ((-1, old), (1, new)):
+        for rule, count in metrics["by_rule"].items():
+            inc[f"violations_by_rule.{rule}"] += sign * count
+        if metrics["status"] is not None:
+            inc[f"status_counts.{metrics['status']}"] += sign
+    inc = {key: value for key, value in inc.items() if value}
+    return [UpdateOne({"agent_name": agent_name, "date": date}, {"$inc": inc})] if inc else []
+
+
+def apply_stats_ops(ops):
+    """Write stats_ops output (creating the stats index on the first write)."""
+    if not ops:
+        return
+    create_indexes_once("agent_stats", ensure_indexes)
+    stats_collection.bulk_write(ops, ordered=True)
+
+
+def record_call(agent_name, date, report, previous=None):
+    """Apply one saved report to the stats collection (called by save_report)."""
+    apply_stats_ops(stats_ops(agent_name, date, report, previous))
+
+
+def record_calls(records, previous_by_hash=None):
+    """
+    Batch form of record_call for ReportWriter flushes. ``records`` are report
+    documents; ``previous_by_hash`` maps (agent_name, audio_hash) to the
+    documents they replaced.
+    """
+    previous_by_hash = previous_by_hash or {}
+    ops = []
+    for r in records:
+        previous = previous_by_hash.get((r["agent_name"], r.get("audio_hash")))
+        ops.extend(stats_ops(r["agent_name"], r["date"], r["report"], previous))
+    apply_stats_ops(ops)
+
+
+# ---------------- Reading ----------------
+def _summarize(doc):
+    calls = doc.get("calls", 0)
+    features = {}
+    for name, acc in (doc.get("features") or {}).items():
+        count = acc.get("count", 0)
+        samples = (doc.get("samples") or {}).get(name) or []
+        entry = {"mean": acc.get("sum", 0.0) / count if count else None}
+        if samples:
+            values = np.percentile(np.asarray(samples, dtype=np.float64), PERCENTILES)
+            entry.update({f"p{p}": float(v) for p, v in zip(PERCENTILES, values)})
+        features[name] = entry
+    return {
+        "agent_name": doc.get("agent_name"),
+        "date": doc.get("date"),
+        "calls": calls,
+        "compliant_calls": doc.get("compliant_calls", 0),
+        "compliance_rate": doc.get("compliant_calls", 0) / calls if calls else None,
+        "violations_total": doc.get("violations_total", 0),
+        "violations_by_rule": {k: v for k, v in (doc.get("violations_by_rule") or {}).items() if v},
+        "status_counts": {k: v for k, v in (doc.get("status_counts") or {}).items() if v},
+        "features": features
+    }
+
+
+def get_daily_stats(agent_name, start=None, end=None):
+    """Per-day stats for an agent, oldest first; ``start``/``end`` are inclusive date strings."""
+    query = {"agent_name": agent_name}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start
+        if end:
+            query["date"]["$lte"] = end
+    return [_summarize(d) for d in stats_collection.find(query, {"_id": 0}).sort("date", 1)]
+
+
+# ---------------- Rebuild ----------------
+def rebuild_stats(agent_name=None):
+    """
+    Recompute stats from the reports collection (all agents, or one). Reports
+    are folded in memory per day and written back in one bulk insert.
+    """
+    query = {} if agent_name is None else {"agent_name": agent_name}
+    days = {}
+    for doc in collection.find(query, METRICS_PROJECTION):
+        key = (doc.get("agent_name"), doc.get("date"))
+        day = days.setdefault(key, {
+            "agent_name": key[0], "date": key[1], "calls": 0, "compliant_calls": 0,
+            "violations_total": 0, "violations_by_rule": defaultdict(int),
+            "status_counts": defaultdict(int), "features": {}, "samples": defaultdict(list)
+        })
+        metrics = call_metrics(doc.get("report"))
+        day["calls"] += 1
+        day["compliant_calls"] += int(metrics["compliant"])
+        day["violations_total"] += metrics["violations"]
+        for rule, count in metrics["by_rule"].items():
+            day["violations_by_rule"][rule] += count
+        if metrics["status"] is not None:
+            day["status_counts"][metrics["status"]] += 1
+        for name, value in metrics["features"].items():
+            acc = day["features"].setdefault(name, {"sum": 0.0, "count": 0})
+            acc["sum"] += value
+            acc["count"] += 1
+            day["samples"][name].append(value)
+
+    docs = []
+    for day in days.values():
+        for field in ("violations_by_rule", "status_counts", "samples"):
+            day[field] = dict(day[field])
+        day["samples"] = {name: values[-STATS_MAX_SAMPLES:] for name, values in day["samples"].items()}
+        docs.append(day)
+
+    create_indexes_once("agent_stats", ensure_indexes)
+    stats_collection.delete_many(query)
+    if docs:
+        stats_collection.insert_many(docs, ordered=False)
+    print(f"[STATS] Rebuilt {len(docs)} agent/day documents"
+          + (f" for agent={agent_name}" if agent_name else ""))
+    return len(docs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the per-agent daily stats collection.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute stats from saved reports")
+    parser.add_argument("--agent", default=None, help="Limit to one agent")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        rebuild_stats(args.agent)
+    elif args.agent:
+        for day in get_daily_stats(args.agent):
+            rate = day["compliance_rate"]
+            print(f"{day['date']}  calls={day['calls']:<5} "
+                  f"compliance={'-' if rate is None else f'{rate:.0%}'}  violations={day['violations_total']}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
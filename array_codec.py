@@ -0,0 +1,67 @@
+import os
+import base64
+
+import numpy as np
+from bson import Binary
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- Codec Settings ----------------
+# Store feature arrays as float32 binary instead of lists of doubles
+COMPACT_ARRAYS = os.getenv("COMPACT_ARRAYS", "0").lower() in ("1", "true", "yes")
+ARRAY_FIELDS = ("mel_spectrogram", "log_mel_spectrogram", "scalogram", "mfcc", "gfcc", "chroma")
+DTYPE = "<f4"
+MARKER = "__ndarray__"
+
+
+def encode_array(values, target="bson"):
+    """
+    Pack a numeric list/array as little-endian float32 with dtype and shape.
+    ``target="bson"`` stores BSON Binary, ``target="json"`` stores base64 text.
+    """
+    arr = np.asarray(values, dtype=DTYPE)
+    raw = arr.tobytes()
+    data = Binary(raw) if target == "bson" else base64.b64encode(raw).decode("ascii")
+    return {MARKER: data, "dtype": "float32", "shape": list(arr.shape)}
+
+
+def is_encoded(value):
+    return isinstance(value, dict) and MARKER in value
+
+
+def decode_array(value):
+    """Inverse of encode_array; plain lists pass through unchanged."""
+    if not is_encoded(value):
+        return value
+    data = value[MARKER]
+    raw = base64.b64decode(data) if isinstance(data, str) else bytes(data)
+    return np.frombuffer(raw, dtype=DTYPE).reshape(value["shape"]).tolist()
+
+
+def encode_report(report, target="bson"):
+    """Copy of ``report`` with the large audio_features arrays packed."""
+    features = report.get("audio_features")
+    if not isinstance(features, dict):
+        return report
+    packed = dict(features)
+    for field in ARRAY_FIELDS:
+        value = packed.get(field)
+        if isinstance(value, (list, tuple, np.ndarray)) and len(value):
+            packed[field] = encode_array(value, target)
+    return dict(report, audio_features=packed)
+
+
+def decode_report(report):
+    """Copy of ``report`` with any packed arrays expanded back to lists."""
+    if not isinstance(report, dict):
+        return report
+    features = report.get("audio_features")
+    if not isinstance(features, dict) or not any(is_encoded(v) for v in features.values()):
+        return report
+    return dict(report, audio_features={k: decode_array(v) for k, v in features.items()})
+
+
+def maybe_encode_report(report, target="bson"):
+    """encode_report when COMPACT_ARRAYS is enabled, otherwise the report as-is."""
+    return encode_report(report, target) if COMPACT_ARRAYS else report
@@ -0,0 +1,209 @@
+"""
+Optional audio preprocessing before upload and transcription.
+
+The recording is decoded once to mono 16 kHz (parallel_features.decode_to_file),
+silences longer than ``PREPROCESS_MIN_SILENCE`` are shortened to
+``PREPROCESS_KEEP_SILENCE`` using a frame-energy voice activity detector,
+and the result is encoded to a compact format (FLAC by default). A TimeMap
+records which stretches of the original were kept, so timestamps from the
+processed audio (transcript words, violations) are mapped back onto the
+original recording.
+
+    python audio_preprocess.py call.mp3 [--out call.flac]
+"""
+import os
+import bisect
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+from dotenv import load_dotenv
+
+from parallel_features import decode_to_file
+
+load_dotenv()
+
+# ---------------- Preprocessing Settings ----------------
+PREPROCESS_AUDIO = os.getenv("PREPROCESS_AUDIO", "0") == "1"
+PREPROCESS_SAMPLE_RATE = int(os.getenv("PREPROCESS_SAMPLE_RATE", "16000"))
+# "flac" (lossless) or "ogg" (Opus via ffmpeg, Vorbis otherwise); both accepted by Transcribe
+PREPROCESS_FORMAT = os.getenv("PREPROCESS_FORMAT", "flac")
+# Frames quieter than this (dBFS), or than the noise floor + margin, count as silence
+PREPROCESS_SILENCE_DB = float(os.getenv("PREPROCESS_SILENCE_DB", "-45"))
+PREPROCESS_NOISE_MARGIN_DB = float(os.getenv("PREPROCESS_NOISE_MARGIN_DB", "8"))
+# Pauses longer than MIN_SILENCE seconds are shortened to KEEP_SILENCE seconds
+PREPROCESS_MIN_SILENCE = float(os.getenv("PREPROCESS_MIN_SILENCE", "1.0"))
+PREPROCESS_KEEP_SILENCE = float(os.getenv("PREPROCESS_KEEP_SILENCE", "0.3"))
+FRAME_SECONDS = 0.03
+# Samples scanned/copied per step, so memory stays flat with call length
+CHUNK_SECONDS = 60
+
+
+# ---------------- Time Map ----------------
+class TimeMap:
+    """
+    Kept stretches of the original audio, in order: the stretch starting at
+    ``out_starts[k]`` in the processed audio begins at ``in_starts[k]`` in
+    the original and lasts ``lengths[k]`` seconds.
+    """
+
+    def __init__(self, out_starts=(), in_starts=(), lengths=()):
+        self.out_starts = list(out_starts)
+        self.in_starts = list(in_starts)
+        self.lengths = list(lengths)
+
+    def add(self, in_start, length):
+        out_start = self.out_starts[-1] + self.lengths[-1] if self.lengths else 0.0
+        self.out_starts.append(out_start)
+        self.in_starts.append(in_start)
+        self.lengths.append(length)
+
+    def to_original(self, t):
+        """Original-audio time for processed-audio time ``t`` (seconds)."""
+        if not self.out_starts:
+            return t
+        k = max(0, bisect.bisect_right(self.out_starts, t) - 1)
+        return self.in_starts[k] + min(max(t - self.out_starts[k], 0.0), self.lengths[k])
+
+    def remap_index(self, index):
+        """Move a TranscriptIndex's word times onto the original audio, in place."""
+        for times in (index.starts, index.ends):
+            for i, t in enumerate(times):
+                times[i] = self.to_original(t)
+        return index
+
+    def to_dict(self):
+        return {"out_starts": self.out_starts, "in_starts": self.in_starts, "lengths": self.lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["out_starts"], data["in_starts"], data["lengths"])
+
+
+# ---------------- Voice Activity ----------------
+def _frame_db(samples, frame):
+    """Per-frame RMS level in dBFS, computed CHUNK_SECONDS at a time."""
+    n_frames = len(samples) // frame
+    levels = np.empty(n_frames, dtype=np.float32)
+    step = int(CHUNK_SECONDS / FRAME_SECONDS)
+    for f0 in range(0, n_frames, step):
+        f1 = min(n_frames, f0 + step)
+        block = np.asarray(samples[f0 * frame:f1 * frame], dtype=np.float32).reshape(f1 - f0, frame)
+        levels[f0:f1] = 10 * np.log10(np.mean(block * block, axis=1) + 1e-10)
+    return levels
+
+
+def speech_frames(samples, sr, silence_db=PREPROCESS_SILENCE_DB, margin_db=PREPROCESS_NOISE_MARGIN_DB):
+    """Boolean voice activity per FRAME_SECONDS frame (energy above an adaptive threshold)."""
+    frame = max(1, int(FRAME_SECONDS * sr))
+    levels = _frame_db(samples, frame)
+    if not len(levels):
+        return levels.astype(bool), frame
+    # The quiet end of the call estimates the line's noise floor
+    threshold = max(silence_db, float(np.percentile(levels, 10)) + margin_db)
+    return levels > threshold, frame
+
+
+def kept_ranges(active, frame, n_samples, sr, min_silence=PREPROCESS_MIN_SILENCE,
+                keep_silence=PREPROCESS_KEEP_SILENCE):
+    """
+    Sample ranges ``(start, end)`` to keep: everything except the middle of
+    silent runs longer than ``min_silence``, which keep ``keep_silence``
+    seconds split between their two edges.
+    """
+    min_frames = max(1, int(min_silence * sr / frame))
+    pad = int(keep_silence * sr / 2)
+    # Silent runs as [first, last) frame indices
+    edges = np.diff(np.concatenate(([0], (~active).astype(np.int8), [0])))
+    run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    ranges, start = [], 0
+    for i, j in zip(run_starts, run_ends):
+        if j - i < min_frames:
+            continue
+        cut_from = int(i) * frame + pad
+        cut_to = n_samples if j == len(active) else int(j) * frame - pad
+        if cut_to > cut_from:
+            ranges.append((start, cut_from))
+            start = cut_to
+    ranges.append((start, n_samples))
+    return [(a, b) for a, b in ranges if b > a]
+
+
+# ---------------- Encoding ----------------
+def _encode(raw_path, sr, out_path, fmt):
+    """Encode raw mono float32 samples to ``fmt`` (ffmpeg when available, else soundfile)."""
+    if shutil.which("ffmpeg"):
+        codec = ["-c:a", "libopus", "-b:a", "24k"] if fmt == "ogg" else ["-c:a", "flac"]
+        cmd = ["ffmpeg", "-v", "error", "-y", "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", raw_path,
+               *codec, out_path]
+        if subprocess.run(cmd).returncode == 0:
+            return out_path
+        print(f"[WARN] ffmpeg could not encode {out_path}; falling back to soundfile")
+
+    import soundfile as sf
+
+    samples = np.memmap(raw_path, dtype=np.float32, mode="r")
+    subtype = "VORBIS" if fmt == "ogg" else "PCM_16"
+    step = CHUNK_SECONDS * sr
+    with sf.SoundFile(out_path, "w", samplerate=sr, channels=1, format=fmt.upper(), subtype=subtype) as f:
+        for start in range(0, len(samples), step):
+            f.write(np.asarray(samples[start:start + step]))
+    return out_path
+
+
+# ---------------- Pipeline Stage ----------------
+def preprocess_audio(audio_path, out_path=None, sr=PREPROCESS_SAMPLE_RATE, fmt=PREPROCESS_FORMAT):
+    """
+    Decode, downmix/resample, compress silences and encode ``audio_path``.
+
+    Returns ``(out_path, time_map, savings)`` where savings has the original
+    and processed bytes and seconds. ``out_path`` defaults to a file in a new
+    temporary directory, which the caller removes when done.
+    """
+    if out_path is None:
+        stem = os.path.splitext(os.path.basename(audio_path))[0]
+        out_path = os.path.join(tempfile.mkdtemp(prefix="preprocess_"), f"{stem}.{fmt}")
+    with tempfile.TemporaryDirectory() as tmp:
+        decoded, trimmed = os.path.join(tmp, "decoded.f32"), os.path.join(tmp, "trimmed.f32")
+        n_samples = decode_to_file(audio_path, decoded, sr=sr)
+        samples = np.memmap(decoded, dtype=np.float32, mode="r") if n_samples else np.zeros(0, np.float32)
+
+        active, frame = speech_frames(samples, sr)
+        time_map = TimeMap()
+        with open(trimmed, "wb") as out:
+            for start, end in kept_ranges(active, frame, n_samples, sr):
+                time_map.add(start / sr, (end - start) / sr)
+                for k in range(start, end, CHUNK_SECONDS * sr):
+                    out.write(np.asarray(samples[k:min(end, k + CHUNK_SECONDS * sr)]).tobytes())
+        del samples
+        _encode(trimmed, sr, out_path, fmt)
+
+    original_seconds = n_samples / sr
+    processed_seconds = sum(time_map.lengths)
+    savings = {
+        "original_bytes": os.path.getsize(audio_path),
+        "processed_bytes": os.path.getsize(out_path),
+        "original_seconds": round(original_seconds, 2),
+        "processed_seconds": round(processed_seconds, 2)
+    }
+    savings["bytes_saved"] = savings["original_bytes"] - savings["processed_bytes"]
+    savings["seconds_saved"] = round(original_seconds - processed_seconds, 2)
+    return out_path, time_map, savings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Downmix, resample and trim silences from a call recording.")
+    parser.add_argument("audio")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--format", choices=("flac", "ogg"), default=PREPROCESS_FORMAT)
+    args = parser.parse_args(argv)
+    out_path, time_map, savings = preprocess_audio(args.audio, args.out, fmt=args.format)
+    print(f"[INFO] Wrote {out_path}: {savings['original_seconds']}s -> {savings['processed_seconds']}s, "
+          f"{savings['original_bytes'] / 1e6:.2f} MB -> {savings['processed_bytes'] / 1e6:.2f} MB "
+          f"({len(time_map.lengths)} kept stretches)")
+
+
+if __name__ == "__main__":
+    main()
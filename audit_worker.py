@@ -0,0 +1,131 @@
+"""
+Worker processes that drain the audit job queue:
+
+    python audit_worker.py --workers 4
+
+Each process claims one job at a time, runs generate_full_audit on it and
+reports its progress back to the queue for the dashboard to show. While a
+job runs its worker sends heartbeats, and every worker periodically requeues
+jobs whose worker died (see JobQueue.requeue_stale). The saved
+upload is streamed to S3 (hashed in the same pass, see
+aws_call_audit.upload_audio_stream) rather than read twice.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import traceback
+import multiprocessing
+from datetime import date
+
+from job_queue import JobQueue, JOB_QUEUE_PATH, HEARTBEAT_INTERVAL
+
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# How often each worker looks for jobs left running by a dead worker
+REQUEUE_INTERVAL = float(os.getenv("JOB_REQUEUE_INTERVAL", "60"))
+
+
+def _heartbeat(queue, job_id, stopped, interval=HEARTBEAT_INTERVAL):
+    """Refresh the job's heartbeat until ``stopped`` is set (long stages report no progress)."""
+    while not stopped.wait(interval):
+        try:
+            queue.heartbeat(job_id)
+        except Exception as e:
+            print(f"[WARN] Could not record heartbeat for job {job_id}: {e}")
+
+
+def run_job(queue, job):
+    """Run one claimed job; the queue records success or schedules a retry."""
+    from aws_call_audit import AuditContext, generate_full_audit
+
+    payload = job["payload"]
+    audio_stream = None
+    stopped = threading.Event()
+    threading.Thread(target=_heartbeat, args=(queue, job["id"], stopped), daemon=True).start()
+    try:
+        # A missing or unreadable upload is a failed attempt like any other
+        audio_stream = open(payload["audio_file"], "rb")
+        ctx = AuditContext(
+            audio_file=payload["audio_file"],
+            audio_stream=audio_stream,
+            agent_name=payload.get("agent_name") or os.getenv("DEFAULT_AGENT_NAME", "test_agent"),
+            call_date=payload.get("call_date") or str(date.today()),
+            report_path=payload.get("report_path"),
+            save_to_mongo=payload.get("save_to_mongo", True),
+            on_progress=lambda stage, fraction: queue.update_progress(job["id"], stage, fraction)
+        )
+        report = generate_full_audit(ctx=ctx)
+    except Exception as e:
+        status = queue.fail(job["id"], f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+        print(f"[WARN] Job {job['id']} attempt {job['attempts']} failed ({e}); now {status}")
+        return False
+    finally:
+        stopped.set()
+        if audio_stream is not None:
+            audio_stream.close()
+    # The audit swallows a failed MongoDB save; the dashboard shows it from here
+    queue.complete(job["id"], {"report": report, "mongo_saved": ctx.mongo_saved, "mongo_error": ctx.mongo_error})
+    print(f"[INFO] Job {job['id']} done: {ctx.file_name}")
+    return True
+
+
+def run_worker(queue_path=JOB_QUEUE_PATH, poll_interval=POLL_INTERVAL, max_jobs=None, exit_when_idle=False):
+    """Claim and run jobs until stopped (or ``max_jobs`` ran / queue idle, if asked)."""
+    queue = JobQueue(queue_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    done, next_requeue = 0, 0.0
+    try:
+        while max_jobs is None or done < max_jobs:
+            if time.monotonic() >= next_requeue:
+                requeued = queue.requeue_stale()
+                if requeued:
+                    print(f"[INFO] Requeued {requeued} jobs left running by a stopped worker")
+                next_requeue = time.monotonic() + REQUEUE_INTERVAL
+            job = queue.claim(worker)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(queue, job)
+            done += 1
+    finally:
+        # The parallel extractor's process pool would keep this worker from exiting
+        if "parallel_features" in sys.modules:
+            sys.modules["parallel_features"].shutdown_pool()
+        if "transcribe_poller" in sys.modules:
+            sys.modules["transcribe_poller"].shutdown_pollers()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run audit workers against the job queue.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AUDIT_WORKERS", "2")))
+    parser.add_argument("--queue", default=JOB_QUEUE_PATH, help="SQLite job queue file")
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    args = parser.parse_args(argv)
+
+    print(f"[INFO] Starting {args.workers} audit workers on {args.queue}")
+    # Not daemonic: a worker may start its own process pool (FEATURE_EXTRACTOR=parallel)
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            kwargs={"queue_path": args.queue, "exit_when_idle": args.drain}
+        )
+        for _ in range(args.workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        print("[INFO] Stopping workers...")
+        for p in processes:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    main()
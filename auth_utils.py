@@ -1,9 +1,8 @@
 import streamlit as st
 import bcrypt
-import pymongo
 
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-db = client["call_audit_db"]
+from mongo_connector import db
+
 users_collection = db["users"]
 
 # ---------------- Helper Functions ----------------
@@ -2,29 +2,54 @@ import os
 import json
 import time
 import uuid
-import boto3
-import requests
-import joblib
-import numpy as np
+import shutil
+import threading
 from dotenv import load_dotenv
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import date
+from typing import Any, Optional
 
 # ---------------- Load Environment Variables ----------------
 load_dotenv()
 
-AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "call-audit-temp-bucket")
+# "parallel" switches feature extraction to the block-parallel extractor
+FEATURE_EXTRACTOR = os.getenv("FEATURE_EXTRACTOR", "default")
+# Downmix, resample and trim silences before upload (see audio_preprocess.py)
+PREPROCESS_AUDIO = os.getenv("PREPROCESS_AUDIO", "0") == "1"
 
 # ---------------- Local Imports ----------------
 from bedrock_rule_checker import check_violations as check_bedrock
-from audio_features import extract_audio_features  # Your working feature extraction function
-
-# ---------------- Global Variables ----------------
-AUDIO_FILE = ""
-JOB_NAME = ""
+if FEATURE_EXTRACTOR == "parallel":
+    from parallel_features import extract_audio_features
+else:
+    from audio_features import extract_audio_features  # Your working feature extraction function
+from transcribe_poller import get_background_poller
+from aws_clients import get_client, ensure_bucket
+from s3_upload import stream_upload, transfer_config
+from model_registry import get_model_registry
+from phrase_matcher import triage_transcript, MATCHER_VERSION, TRUST_LOCAL_CLEAN
+from bedrock_chunker import check_long_transcript
+from transcript_index import TranscriptIndex, fetch_transcript
+from result_cache import get_result_cache, hash_audio, rules_fingerprint, model_fingerprint
+from array_codec import maybe_encode_report
+from stage_graph import Stage, run_stages
+from instrumentation import audit_run, measure_stage
+
+SUPPORTED_FORMATS = ["mp3", "wav", "m4a", "flac", "ogg"]
+# Report keys classify_many can fill model inputs from
+CLASSIFY_INPUTS = ("audio_features",)
+# Bumped when the cached transcript layout changes
+TRANSCRIPT_FORMAT = "index-1"
+
+# Progress labels shown (e.g. on the dashboard) when a pipeline stage starts
+STAGE_LABELS = {
+    "transcript": "transcribing",
+    "bedrock": "checking rules",
+    "features": "extracting features",
+    "classification": "classifying"
+}
 
 
 def generate_unique_job_name():
@@ -32,162 +57,363 @@ def generate_unique_job_name():
     return f"CallAuditJob-{uuid.uuid4().hex[:8]}-{int(time.time())}"
 
 
-def transcribe_audio():
+# ---------------- Per-Call Context ----------------
+@dataclass
+class AuditContext:
+    """State for a single audit run, so concurrent audits never share globals."""
+    audio_file: str
+    agent_name: str = field(default_factory=lambda: os.getenv("DEFAULT_AGENT_NAME", "test_agent"))
+    call_date: str = field(default_factory=lambda: str(date.today()))
+    job_name: str = field(default_factory=generate_unique_job_name)
+    report_path: Optional[str] = "report.json"
+    save_to_mongo: bool = True
+    use_cache: bool = True
+    audio_hash: Optional[str] = None
+    # First poll delay of this process's shared Transcribe poller (set by the first call)
+    poll_interval: float = 1.0
+    # Seekable binary stream (e.g. a Streamlit upload or the worker's open
+    # upload file); audio_file is then only written from it when a local copy
+    # is actually needed
+    audio_stream: Any = None
+    s3_key: Optional[str] = None
+    s3_client: Any = None
+    transcribe_client: Any = None
+    # Buffered mongo_connector.ReportWriter shared by a batch run
+    report_writer: Any = None
+    # Called as on_progress(stage, fraction) as the pipeline advances
+    on_progress: Any = None
+    # Upload a preprocessed copy; time_map then maps its times back to audio_file
+    preprocess: bool = PREPROCESS_AUDIO
+    time_map: Any = None
+    preprocessing: Optional[dict] = None
+    # Outcome of the direct MongoDB save (None when not saved directly)
+    mongo_saved: Optional[bool] = None
+    mongo_error: Optional[str] = None
+    _materialized: bool = field(default=False, init=False, repr=False)
+    # The transcript and features stages may both need the local copy at once
+    _materialize_lock: Any = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    @property
+    def file_name(self):
+        return os.path.basename(self.audio_file)
+
+    def ensure_local_file(self):
+        """Materialize audio_file from audio_stream the first time it is needed (thread-safe)."""
+        if self.audio_stream is None or self._materialized:
+            return self.audio_file
+        with self._materialize_lock:
+            if self._materialized:
+                return self.audio_file
+            if os.path.abspath(getattr(self.audio_stream, "name", "")) != os.path.abspath(self.audio_file):
+                # Not opened from audio_file itself: write the local copy
+                os.makedirs(os.path.dirname(self.audio_file) or ".", exist_ok=True)
+                self.audio_stream.seek(0)
+                with open(self.audio_file, "wb") as f:
+                    shutil.copyfileobj(self.audio_stream, f, length=1024 * 1024)
+            self._materialized = True
+        return self.audio_file
+
+    def progress(self, stage, fraction):
+        if self.on_progress is not None:
+            self.on_progress(stage, fraction)
+
+
+def upload_audio_stream(ctx):
+    """Stream ctx.audio_stream straight to S3, hashing it in the same pass."""
+    ensure_bucket(BUCKET_NAME, ctx.s3_client)
+    ctx.audio_stream.seek(0)
+    with measure_stage("s3_upload") as span:
+        result = stream_upload(ctx.audio_stream, BUCKET_NAME, f"{ctx.job_name}/{ctx.file_name}",
+                               s3_client=ctx.s3_client)
+        span.bytes = result["size"]
+    ctx.s3_key = result["key"]
+    ctx.audio_hash = result["sha256"]
+    return result
+
+
+def preprocess_for_upload(ctx):
+    """Write the compact copy of the call that is uploaded instead of the original."""
+    from audio_preprocess import preprocess_audio
+
+    path = ctx.ensure_local_file()
+    ctx.progress("preprocessing", 0.05)
+    with measure_stage("preprocess", bytes=os.path.getsize(path)):
+        out_path, ctx.time_map, ctx.preprocessing = preprocess_audio(path)
+    saved = ctx.preprocessing
+    print(f"[INFO] Preprocessed {ctx.file_name}: saved {saved['bytes_saved'] / 1e6:.2f} MB "
+          f"and {saved['seconds_saved']:.1f}s of audio ({saved['processed_seconds']:.1f}s left)")
+    return out_path
+
+
+def _download_transcript(transcript_url):
+    """Stream the Transcribe output JSON (file:// URIs are read locally) into a TranscriptIndex."""
+    with measure_stage("transcript_download") as span:
+        index, span.bytes = fetch_transcript(transcript_url)
+    return index
+
+
+def transcribe_audio(ctx):
     """Upload audio to S3 and start AWS Transcribe job."""
-    global JOB_NAME
-
-    s3_client = boto3.client(
-        "s3",
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION
-    )
-    transcribe_client = boto3.client(
-        "transcribe",
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION
-    )
-
-    # Ensure bucket exists
-    try:
-        s3_client.head_bucket(Bucket=BUCKET_NAME)
-    except Exception:
-        print(f"[INFO] Creating S3 bucket: {BUCKET_NAME}")
-        if AWS_REGION == "us-east-1":
-            s3_client.create_bucket(Bucket=BUCKET_NAME)
-        else:
-            s3_client.create_bucket(
-                Bucket=BUCKET_NAME,
-                CreateBucketConfiguration={"LocationConstraint": AWS_REGION}
-            )
-
-    # Upload file to S3
-    s3_key = os.path.basename(AUDIO_FILE)
-    print(f"[INFO] Uploading {AUDIO_FILE} to S3 bucket {BUCKET_NAME}...")
-    s3_client.upload_file(AUDIO_FILE, BUCKET_NAME, s3_key)
-
-    audio_uri = f"s3://{BUCKET_NAME}/{s3_key}"
+    s3_client = ctx.s3_client or get_client("s3")
+    transcribe_client = ctx.transcribe_client or get_client("transcribe")
 
-    # Generate unique job name
-    JOB_NAME = generate_unique_job_name()
+    # Ensure bucket exists (verified once per process, then cached)
+    ensure_bucket(BUCKET_NAME, s3_client)
 
     # Detect file format
-    file_ext = Path(AUDIO_FILE).suffix.lower().replace(".", "")
-    if file_ext not in ["mp3", "wav", "m4a"]:
+    file_ext = Path(ctx.audio_file).suffix.lower().replace(".", "")
+    if file_ext not in SUPPORTED_FORMATS:
         raise ValueError(f"Unsupported audio format: {file_ext}")
 
+    # Upload file to S3 unless it was already streamed there
+    # (key includes the job name so same-named uploads don't collide)
+    s3_key = ctx.s3_key
+    if s3_key is None:
+        source = preprocess_for_upload(ctx) if ctx.preprocess else ctx.audio_file
+        file_ext = Path(source).suffix.lower().replace(".", "")
+        s3_key = f"{ctx.job_name}/{os.path.basename(source)}"
+        print(f"[INFO] Uploading {source} to S3 bucket {BUCKET_NAME}...")
+        try:
+            with measure_stage("s3_upload", bytes=os.path.getsize(source)):
+                s3_client.upload_file(source, BUCKET_NAME, s3_key, Config=transfer_config())
+        finally:
+            if source != ctx.audio_file:
+                shutil.rmtree(os.path.dirname(source), ignore_errors=True)
+        ctx.s3_key = s3_key
+
+    audio_uri = f"s3://{BUCKET_NAME}/{s3_key}"
+
     # Start AWS Transcribe
-    print(f"[INFO] Starting AWS Transcribe job: {JOB_NAME}...")
+    print(f"[INFO] Starting AWS Transcribe job: {ctx.job_name}...")
     transcribe_client.start_transcription_job(
-        TranscriptionJobName=JOB_NAME,
+        TranscriptionJobName=ctx.job_name,
         Media={"MediaFileUri": audio_uri},
         MediaFormat=file_ext,
-        LanguageCode="en-US"
+        LanguageCode="en-US",
+        Settings={
+            "ShowSpeakerLabels": True,
+            "MaxSpeakerLabels": 2
+        }
     )
 
-    # Wait for job completion
-    while True:
-        status = transcribe_client.get_transcription_job(TranscriptionJobName=JOB_NAME)
-        state = status["TranscriptionJob"]["TranscriptionJobStatus"]
-        if state in ["COMPLETED", "FAILED"]:
-            break
-        print("[INFO] Waiting for transcription job to complete...")
-        time.sleep(5)
-
-    if state == "COMPLETED":
-        transcript_url = status["TranscriptionJob"]["Transcript"]["TranscriptFileUri"]
-        print(f"[INFO] Transcription completed. Downloading transcript from {transcript_url}...")
-        r = requests.get(transcript_url)
-        transcript_data = r.json()
-        transcript_text = transcript_data["results"]["transcripts"][0]["transcript"]
-
-        # Standardize transcript for Bedrock checker
-        transcript_list = [{"speaker": "agent", "text": transcript_text}]
-        return transcript_list
-    else:
-        raise Exception("AWS Transcribe failed.")
+    # Wait for job completion: one shared poll loop (backoff with jitter) serves
+    # every call in flight in this process, instead of a get loop per job
+    with measure_stage("transcribe_wait"):
+        poller = get_background_poller(transcribe_client, initial_delay=ctx.poll_interval)
+        job = poller.wait(ctx.job_name)
+
+    transcript_url = job["Transcript"]["TranscriptFileUri"]
+    print(f"[INFO] Transcription completed. Downloading transcript from {transcript_url}...")
+    # One streamed pass over the items: word timings and real speaker labels,
+    # shared by the matcher and the Bedrock chunker
+    index = _download_transcript(transcript_url)
+    if ctx.time_map is not None:
+        # Times of the trimmed upload -> times in the original recording
+        ctx.time_map.remap_index(index)
+    return index
+
+
+def detect_violations(index, rules_fp=""):
+    """
+    Run the local phrase matcher first and only skip Bedrock on a final
+    "clean" verdict (LOCAL_MATCHER_TRUST_CLEAN). Everything else is checked
+    by Bedrock, and its result gets the exact, non-negated local matches it
+    did not report itself.
+    """
+    with measure_stage("local_matcher"):
+        verdict = triage_transcript(index, fingerprint=rules_fp)
+    if verdict.is_final():
+        print(f"[INFO] Local matcher verdict '{verdict.decision}', skipping Bedrock")
+        return verdict.as_bedrock_result()
+    print(f"[INFO] Local matcher verdict '{verdict.decision}' ({len(verdict.confirmed)} confirmed, "
+          f"{len(verdict.partial_rules)} rules to confirm), checking with Bedrock...")
+    with measure_stage("bedrock"):
+        # Long calls are split on speaker turns and checked in parallel
+        result = check_long_transcript(index, check_bedrock)
+    return verdict.merge_into(result)
+
+
+def classify_many(features_list):
+    """
+    Classify a batch of feature dicts with a single predict_proba call.
+
+    The input columns come from the feature schema versioned with the model.
+    Only audio features are available here, so a schema that also reads other
+    report fields (e.g. pipeline_v1's violations and tone) is refused rather
+    than silently filled with defaults.
+    """
+    if not features_list:
+        return []
+    clf, schema, _ = get_model_registry().current()
+    unfilled = schema.unfilled(CLASSIFY_INPUTS)
+    if unfilled:
+        raise ValueError(f"Model schema '{schema.name}' needs columns the audit pipeline does not "
+                         f"produce: {', '.join(unfilled)}")
+    X = schema.build([{"audio_features": f} for f in features_list])
+    with measure_stage("predict"):
+        proba = clf.predict_proba(X)
+    best = proba.argmax(axis=1)
+    return [(int(clf.classes_[i]), float(proba[row, i])) for row, i in enumerate(best)]
 
 
 def classify_call(features):
-    """Run ML classification using the trained model."""
-    print("[INFO] Loading classifier from: call_classifier.pkl")
-    clf = joblib.load("call_classifier.pkl")
-
-    # Build feature vector for prediction
-    X = [[
-        features.get("pitch", 0),
-        features.get("pitch_range", 0),
-        features.get("tempo", 0),
-        features.get("jitter", 0),
-        features.get("zero_crossing_rate", 0),
-        features.get("rms_energy", 0),
-        np.mean(features.get("mfcc", [0])),
-        np.mean(features.get("gfcc", [0])),
-        np.mean(features.get("chroma", [0]))
-    ]]
-
-    prediction = clf.predict(X)[0]
-    confidence = max(clf.predict_proba(X)[0])
-    return int(prediction), float(confidence)
-
-
-def generate_full_audit(audio_path=None):
-    """Run full AWS Call Audit pipeline."""
-    global AUDIO_FILE
-    if not audio_path:
-        raise ValueError("Audio path must be provided.")
-    AUDIO_FILE = audio_path
-
-    # Step 1: Transcribe
-    transcript_list = transcribe_audio()
-
-    # Step 2: Bedrock violation detection
-    bedrock_result = check_bedrock(transcript_list)
-
-    # Step 3: Extract audio features
-    print("[INFO] Extracting audio features...")
-    features = extract_audio_features(AUDIO_FILE)
-
-    # Step 4: ML classification
-    classification, confidence = classify_call(features)
+    """Run ML classification using the trained model (loaded once per process)."""
+    return classify_many([features])[0]
 
-    # Step 5: Save report (ensure numpy/int64 are JSON serializable)
+
+def _model_version():
+    try:
+        return get_model_registry().version
+    except OSError:
+        return None
+
+
+def rules_version(rules_fp=None):
+    """Version of the violation check: the rule set plus the local matcher."""
+    trusted = "c" if TRUST_LOCAL_CLEAN else ""
+    return f"{rules_fingerprint() if rules_fp is None else rules_fp}-m{MATCHER_VERSION}{trusted}"
+
+
+def build_report(features, bedrock_result, classification, audio_hash=None, transcript=None, rules_version=None):
+    """
+    Assemble the report dict shared by the batch and streaming pipelines.
+
+    ``transcript`` (a TranscriptIndex) and ``rules_version`` are stored so
+    reaudit.py can re-check the call when the rules change without
+    transcribing it again.
+    """
     report = {
-        "audio_features": json.loads(json.dumps(features, default=lambda o: float(o))),
+        "audio_features": features,
         "bedrock_analysis": bedrock_result,
-        "classification": {
-            "status": int(classification),
-            "confidence": round(float(confidence), 2)
-        }
+        "classification": classification
     }
+    if audio_hash:
+        report["audio_hash"] = audio_hash
+    if transcript is not None:
+        report["transcript"] = transcript.to_dict()
+    if rules_version:
+        report["rules_version"] = rules_version
+    return report
 
-    with open("report.json", "w") as f:
-        json.dump(report, f, indent=2)
 
-    print("[INFO] Final AWS Call Audit Report saved to report.json")
+def classification_block(prediction, confidence):
+    return {
+        "status": int(prediction),
+        "confidence": round(float(confidence), 2),
+        "model_version": _model_version()
+    }
+
+
+def classify_features(features):
+    """Classification block of the report for one feature dict."""
+    return classification_block(*classify_call(features))
+
+
+def generate_full_audit(audio_path=None, ctx=None):
+    """Run full AWS Call Audit pipeline.
+
+    Either pass ``audio_path`` (a fresh AuditContext is created) or a prepared
+    ``ctx`` when the caller needs its own agent, date, report path or clients.
+    """
+    if ctx is None:
+        if not audio_path:
+            raise ValueError("Audio path must be provided.")
+        ctx = AuditContext(audio_file=audio_path)
+
+    # Every stage measured below is tagged with this audit's job name
+    with audit_run(ctx.job_name, "aws_call_audit"), measure_stage("total"):
+        return _run_audit(ctx)
+
+
+def _run_audit(ctx):
+    # Streamed uploads go to S3 first; the content hash comes out of the same pass
+    # (a preprocessed copy is uploaded later instead)
+    if ctx.audio_stream is not None and ctx.s3_key is None and not ctx.preprocess:
+        ctx.progress("uploading", 0.05)
+        upload_audio_stream(ctx)
+
+    # Identical audio (re-uploads, reprocessing) is served stage by stage from the cache
+    cache = get_result_cache() if ctx.use_cache else None
+    if cache is not None and not ctx.audio_hash:
+        ctx.audio_hash = hash_audio(ctx.ensure_local_file())
+
+    def cached(stage, compute, fingerprint=""):
+        if cache is None:
+            return compute()
+        return cache.get_or_compute(ctx.audio_hash, stage, compute, fingerprint)
+
+    # Steps 1-4 as a DAG: transcription -> rule check on one branch, local
+    # feature extraction -> classification on the other, running side by side
+    rules_fp = rules_fingerprint()
+    version = rules_version(rules_fp)
+
+    def extract():
+        print("[INFO] Extracting audio features...")
+        path = ctx.ensure_local_file()
+        with measure_stage("feature_extraction", bytes=os.path.getsize(path)):
+            return json.loads(json.dumps(extract_audio_features(path), default=lambda o: float(o)))
+
+    stages = [
+        # Step 1: Transcribe
+        # (cached as the index's parallel arrays)
+        Stage("transcript", lambda: TranscriptIndex.from_dict(cached(
+            "transcript", lambda: transcribe_audio(ctx).to_dict(), TRANSCRIPT_FORMAT
+        ))),
+        # Step 2: Bedrock violation detection
+        Stage("bedrock", lambda transcript: cached(
+            "bedrock", lambda: detect_violations(transcript, rules_fp), version
+        ), ("transcript",)),
+        # Step 3: Extract audio features
+        Stage("features", lambda: cached(
+            "features", extract, "" if FEATURE_EXTRACTOR == "default" else FEATURE_EXTRACTOR
+        )),
+        # Step 4: ML classification
+        # (keyed on the extractor too: its features differ from the default one's)
+        Stage("classification", lambda features: cached(
+            "classification", lambda: classify_features(features), f"{model_fingerprint()}-{FEATURE_EXTRACTOR}"
+        ), ("features",))
+    ]
+    results, timings = run_stages(
+        stages, on_start=lambda name, done, total: ctx.progress(STAGE_LABELS[name], 0.1 + 0.8 * done / total)
+    )
+
+    # Step 5: Save report (ensure numpy/int64 are JSON serializable)
+    report = build_report(results["features"], results["bedrock"], results["classification"], ctx.audio_hash,
+                          transcript=results["transcript"], rules_version=version)
+    report["stage_timings"] = timings
+    if ctx.preprocessing:
+        report["preprocessing"] = ctx.preprocessing
+
+    if ctx.report_path:
+        with open(ctx.report_path, "w") as f:
+            json.dump(maybe_encode_report(report, target="json"), f, indent=2)
+        print(f"[INFO] Final AWS Call Audit Report saved to {ctx.report_path}")
 
     # Step 6: Save to MongoDB so View Reports shows it immediately
-    try:
-        from mongo_connector import save_report
-        agent_name = os.getenv("DEFAULT_AGENT_NAME", "test_agent")
-        file_name = os.path.basename(audio_path)  # Track specific uploaded file
-
-        # Updated call to match correct signature
-        save_report(
-            agent_name=agent_name,
-            date=str(date.today()),
-            report_data=report,
-            file_name=file_name
-        )
-
-        print(f"[INFO] Report also saved to MongoDB for agent: {agent_name} (File: {file_name})")
-    except Exception as e:
-        print(f"[WARN] Could not save to MongoDB: {e}")
+    if ctx.save_to_mongo:
+        ctx.progress("saving", 0.95)
+        try:
+            if ctx.report_writer is not None:
+                ctx.report_writer.add(ctx.agent_name, ctx.call_date, ctx.file_name, report)
+            else:
+                from mongo_connector import save_report
+
+                save_report(
+                    agent_name=ctx.agent_name,
+                    date=ctx.call_date,
+                    report_data=report,
+                    file_name=ctx.file_name
+                )
+
+                ctx.mongo_saved = True
+                print(f"[INFO] Report also saved to MongoDB for agent: {ctx.agent_name} (File: {ctx.file_name})")
+        except Exception as e:
+            ctx.mongo_saved, ctx.mongo_error = False, f"{type(e).__name__}: {e}"
+            print(f"[WARN] Could not save to MongoDB: {e}")
 
     return report
 
 
 if __name__ == "__main__":
     # For direct testing
-    generate_full_audit("web_backend/uploaded_calls/WhatsApp Audio 2025-08-01 at 10.09.32.mp3")
\ No newline at end of file
+    generate_full_audit("web_backend/uploaded_calls/WhatsApp Audio 2025-08-01 at 10.09.32.mp3")
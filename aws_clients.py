@@ -0,0 +1,110 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- Registry Settings ----------------
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+# Point every client at a local stand-in (moto server, localstack) when set
+AWS_ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL") or None
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+
+_settings = {
+    "region": AWS_REGION,
+    "endpoint_url": AWS_ENDPOINT_URL,
+    "max_pool_connections": MAX_POOL_CONNECTIONS,
+    "credentials": {}
+}
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_verified_buckets = set()
+
+
+def configure(region=None, endpoint_url=None, max_pool_connections=None,
+              aws_access_key_id=None, aws_secret_access_key=None):
+    """
+    Change registry settings and drop every cached client.
+
+    Tests and benchmarks use this to point all modules at a local endpoint:
+
+        aws_clients.configure(endpoint_url="http://localhost:5000")
+    """
+    global _session
+    with _lock:
+        if region is not None:
+            _settings["region"] = region
+        if endpoint_url is not None:
+            _settings["endpoint_url"] = endpoint_url or None
+        if max_pool_connections is not None:
+            _settings["max_pool_connections"] = max_pool_connections
+        if aws_access_key_id is not None:
+            _settings["credentials"] = {
+                "aws_access_key_id": aws_access_key_id,
+                "aws_secret_access_key": aws_secret_access_key
+            }
+        _session = None
+        _clients.clear()
+        _verified_buckets.clear()
+
+
+def get_session():
+    """Process-wide boto3 session (sessions are not thread-safe to build, clients are to use)."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session(region_name=_settings["region"], **_settings["credentials"])
+        return _session
+
+
+def get_client(service):
+    """Shared, pooled client for ``service`` ("s3", "transcribe", "bedrock-runtime", ...)."""
+    client = _clients.get(service)
+    if client is not None:
+        return client
+    with _lock:
+        if service not in _clients:
+            config = Config(
+                max_pool_connections=_settings["max_pool_connections"],
+                retries={"max_attempts": 5, "mode": "adaptive"}
+            )
+            _clients[service] = get_session().client(
+                service,
+                endpoint_url=_settings["endpoint_url"],
+                config=config
+            )
+        return _clients[service]
+
+
+def ensure_bucket(bucket_name, s3_client=None):
+    """Verify (or create) a bucket once per process; later calls cost no round trip."""
+    if bucket_name in _verified_buckets:
+        return
+    with _lock:
+        if bucket_name in _verified_buckets:
+            return
+        s3_client = s3_client or get_client("s3")
+        try:
+            s3_client.head_bucket(Bucket=bucket_name)
+        except Exception:
+            print(f"[INFO] Creating S3 bucket: {bucket_name}")
+            if _settings["region"] == "us-east-1":
+                s3_client.create_bucket(Bucket=bucket_name)
+            else:
+                s3_client.create_bucket(
+                    Bucket=bucket_name,
+                    CreateBucketConfiguration={"LocationConstraint": _settings["region"]}
+                )
+        _verified_buckets.add(bucket_name)
+
+
+def warm_up(buckets=(), services=("s3", "transcribe")):
+    """Build clients and verify buckets up front, off the per-call hot path."""
+    for service in services:
+        get_client(service)
+    for bucket in buckets:
+        ensure_bucket(bucket)
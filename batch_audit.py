@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+from aws_call_audit import AuditContext, SUPPORTED_FORMATS, BUCKET_NAME, generate_full_audit
+from aws_clients import warm_up
+
+# ---------------- Defaults ----------------
+DEFAULT_WORKERS = int(os.getenv("BATCH_AUDIT_WORKERS", "8"))
+DEFAULT_OUTPUT_DIR = "batch_reports"
+
+
+def discover_recordings(source):
+    """
+    Resolve a directory or manifest file into a list of recording paths.
+
+    A manifest is a text file with one path per line; blank lines and lines
+    starting with '#' are ignored, relative paths are resolved against the
+    manifest's own directory.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.rsplit(".", 1)[-1].lower() in SUPPORTED_FORMATS:
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return paths
+
+
+def _report_path_for(output_dir, index, audio_path):
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    return os.path.join(output_dir, f"{index:05d}_{stem}.json")
+
+
+def _audit_one(index, audio_path, output_dir, context_defaults, audit_fn):
+    ctx = AuditContext(
+        audio_file=audio_path,
+        report_path=_report_path_for(output_dir, index, audio_path) if output_dir else None,
+        **context_defaults
+    )
+    started = time.perf_counter()
+    report = audit_fn(ctx=ctx)
+    return {
+        "audio_file": audio_path,
+        "job_name": ctx.job_name,
+        "report_path": ctx.report_path,
+        "seconds": round(time.perf_counter() - started, 3),
+        "status": report.get("classification", {}).get("status")
+    }
+
+
+def run_batch(paths, max_workers=DEFAULT_WORKERS, output_dir=DEFAULT_OUTPUT_DIR,
+              context_defaults=None, audit_fn=generate_full_audit):
+    """
+    Audit many recordings concurrently with a bounded worker pool.
+
+    Every recording gets its own AuditContext; extra AuditContext fields (agent,
+    date, clients, ...) can be supplied through ``context_defaults``. A failing
+    file is recorded in ``failures`` and never aborts the rest of the run.
+    All in-flight Transcribe jobs are tracked by one shared poller (see
+    transcribe_poller.get_background_poller).
+    """
+    context_defaults = dict(context_defaults or {})
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Batch runs write reports to MongoDB in buffered bulk writes
+    writer = None
+    if context_defaults.get("save_to_mongo", True) and "report_writer" not in context_defaults:
+        from mongo_connector import ReportWriter
+        writer = ReportWriter()
+        context_defaults["report_writer"] = writer
+
+    results, failures = [], []
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_audit_one, i, path, output_dir, context_defaults, audit_fn): path
+            for i, path in enumerate(paths)
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"[WARN] Audit failed for {path}: {e}")
+                failures.append({
+                    "audio_file": path,
+                    "error": f"{type(e).__name__}: {e}",
+                    "traceback": traceback.format_exc()
+                })
+
+    # close() retries the tail and never raises; reports it gave up on are listed below
+    unsaved = []
+    if writer is not None:
+        writer.close()
+        unsaved = [{"agent_name": r["agent_name"], "date": r["date"], "file_name": r["file_name"]}
+                   for r in writer.failed]
+
+    elapsed = time.perf_counter() - started
+    calls_per_min = (len(results) / elapsed) * 60 if elapsed > 0 else 0.0
+    summary = {
+        "total": len(paths),
+        "succeeded": len(results),
+        "failed": len(failures),
+        "workers": max_workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "calls_per_min": round(calls_per_min, 2),
+        "mongo_writes": writer.stats() if writer is not None else None,
+        "unsaved_reports": unsaved,
+        "results": results,
+        "failures": failures
+    }
+    print(f"[INFO] Batch finished: {len(results)}/{len(paths)} succeeded in "
+          f"{elapsed:.1f}s ({calls_per_min:.1f} calls/min, {max_workers} workers)")
+    if unsaved:
+        print(f"[WARN] {len(unsaved)} audited reports were not saved to MongoDB "
+              f"({writer.last_error}); see unsaved_reports in the summary")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit a directory or manifest of call recordings.")
+    parser.add_argument("source", help="Directory of recordings or manifest file (one path per line)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--agent", default=os.getenv("DEFAULT_AGENT_NAME", "test_agent"))
+    parser.add_argument("--date", default=str(date.today()))
+    parser.add_argument("--no-mongo", action="store_true", help="Skip saving reports to MongoDB")
+    parser.add_argument("--summary", default=None, help="Write the batch summary JSON here")
+    args = parser.parse_args(argv)
+
+    paths = discover_recordings(args.source)
+    print(f"[INFO] Found {len(paths)} recordings in {args.source}")
+    warm_up(buckets=[BUCKET_NAME])
+    summary = run_batch(
+        paths,
+        max_workers=args.workers,
+        output_dir=args.output_dir,
+        context_defaults={
+            "agent_name": args.agent,
+            "call_date": args.date,
+            "save_to_mongo": not args.no_mongo
+        }
+    )
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if not summary["failures"] and not summary["unsaved_reports"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from transcript_index import TranscriptIndex
+
+load_dotenv()
+
+# ---------------- Chunking Settings ----------------
+CHUNK_MAX_WORDS = int(os.getenv("BEDROCK_CHUNK_MAX_WORDS", "600"))
+CHUNK_MAX_SECONDS = float(os.getenv("BEDROCK_CHUNK_MAX_SECONDS", "240"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("BEDROCK_CHUNK_OVERLAP_WORDS", "40"))
+BEDROCK_MAX_WORKERS = int(os.getenv("BEDROCK_MAX_WORKERS", "4"))
+BEDROCK_RATE_PER_SEC = float(os.getenv("BEDROCK_RATE_PER_SEC", "5"))
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads: ``rate`` calls/s, bursts up to ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ---------------- Turns & Chunks ----------------
+def build_turns(words):
+    """Group consecutive words of the same speaker (a word list or TranscriptIndex) into turns."""
+    if isinstance(words, TranscriptIndex):
+        return [{"speaker": speaker, "words": words.words(i, j)} for speaker, i, j in words.turns()]
+    turns = []
+    for w in words:
+        speaker = w.get("speaker", "agent")
+        if not turns or turns[-1]["speaker"] != speaker:
+            turns.append({"speaker": speaker, "words": []})
+        turns[-1]["words"].append(w)
+    return turns
+
+
+def _split_turn(turn, max_words, overlap):
+    """
+    Split one over-long turn at word boundaries, overlapping consecutive
+    pieces; each later piece records its ``shared`` leading words.
+    """
+    words, pieces, start = turn["words"], [], 0
+    overlap = min(overlap, max_words - 1)
+    step = max(1, max_words - overlap)
+    while True:
+        pieces.append({"speaker": turn["speaker"], "words": words[start:start + max_words],
+                       "shared": min(overlap, start)})
+        if start + max_words >= len(words):
+            return pieces
+        start += step
+
+
+def _make_chunk(turns, carried=0):
+    """``carried`` leading words repeat the end of the previous chunk (its overlap window)."""
+    words = [w for t in turns for w in t["words"]]
+    shared = words[:carried]
+    return {
+        "start_time": words[0].get("start_time"),
+        "end_time": words[-1].get("end_time"),
+        "word_count": len(words),
+        "overlap": {
+            "start_time": shared[0].get("start_time"),
+            "end_time": shared[-1].get("end_time"),
+            "text": " ".join(w["text"] for w in shared)
+        } if shared else None,
+        "transcript": [
+            {"speaker": t["speaker"], "text": " ".join(w["text"] for w in t["words"])}
+            for t in turns
+        ]
+    }
+
+
+def chunk_transcript(words, max_words=CHUNK_MAX_WORDS, max_seconds=CHUNK_MAX_SECONDS,
+                     overlap_words=CHUNK_OVERLAP_WORDS):
+    """
+    Split timed, speaker-labelled words (or a TranscriptIndex) into
+    Bedrock-sized chunks.
+
+    Chunks end on speaker-turn boundaries where possible and are limited by
+    word count (overlap included) and duration. Each chunk repeats the
+    trailing turns (up to ``overlap_words``) of the previous one, so a phrase
+    spanning a boundary is seen whole at least once; a turn too long for one
+    chunk is split into pieces that overlap by themselves.
+    """
+    turns = []
+    for turn in build_turns(words):
+        if len(turn["words"]) > max_words:
+            turns.extend(_split_turn(turn, max_words, overlap_words))
+        else:
+            turns.append(turn)
+
+    chunks, current, count, carried_count = [], [], 0, 0
+    for turn in turns:
+        n = len(turn["words"])
+        start = current[0]["words"][0].get("start_time") if current else None
+        end = turn["words"][-1].get("end_time")
+        too_long = start is not None and end is not None and end - start > max_seconds
+        if current and (count + n > max_words or too_long):
+            chunks.append(_make_chunk(current, carried_count))
+            carried, carried_count = [], 0
+            # A split-turn piece already starts with its overlap; anything
+            # carried must still fit next to the turn within max_words
+            budget = 0 if turn.get("shared") else min(overlap_words, max_words - n)
+            for prev in reversed(current):
+                if carried_count + len(prev["words"]) > budget:
+                    break
+                carried.insert(0, prev)
+                carried_count += len(prev["words"])
+            if not carried and budget > 0:
+                tail = current[-1]["words"][-budget:]
+                carried, carried_count = [{"speaker": current[-1]["speaker"], "words": tail}], len(tail)
+            current, count = carried, carried_count
+        if not current and turn.get("shared"):
+            carried_count = turn["shared"]
+        current.append(turn)
+        count += n
+    if current:
+        chunks.append(_make_chunk(current, carried_count))
+    return chunks
+
+
+# ---------------- Merging ----------------
+def _violation_key(v):
+    if isinstance(v, dict):
+        for field in ("rule", "violation", "phrase", "text"):
+            if v.get(field):
+                return str(v[field]).strip().lower()
+        return json.dumps(v, sort_keys=True)
+    return str(v).strip().lower()
+
+
+def _normalize_quote(text):
+    return " ".join(re.findall(r"[a-z0-9%']+", str(text).lower()))
+
+
+def _quote(v):
+    """Normalized quoted transcript text of a violation, or '' when it has none."""
+    for field in ("quote", "evidence", "excerpt", "text"):
+        if v.get(field):
+            return _normalize_quote(v[field])
+    return ""
+
+
+def _identity(v):
+    """What makes two hits the same occurrence: the quote, else the hit's own times."""
+    quote = _quote(v)
+    if quote:
+        return ("quote", quote)
+    if v.get("start_time") is not None and v.get("end_time") is not None:
+        return ("time", round(float(v["start_time"]), 2), round(float(v["end_time"]), 2))
+    return None
+
+
+def _in_window(v, overlap):
+    """Whether a hit lies inside a chunk's overlap window (by its own times, else its quote)."""
+    if overlap is None:
+        return False
+    if v.get("start_time") is not None and v.get("end_time") is not None and overlap["start_time"] is not None:
+        return overlap["start_time"] <= v["start_time"] and v["end_time"] <= overlap["end_time"]
+    quote = _quote(v)
+    return bool(quote) and quote in _normalize_quote(overlap["text"])
+
+
+def merge_violations(chunk_results):
+    """
+    Combine per-chunk violations, tagging the ones without their own times
+    with their chunk's time span.
+
+    A hit is only dropped as a duplicate when the previous chunk reported the
+    same rule, both hits fall inside the window the two chunks share and
+    their quote (or own times) match; a second occurrence of a rule later in
+    the call is kept.
+    """
+    merged, previous = [], []
+    for chunk, result in chunk_results:
+        overlap = chunk.get("overlap")
+        current = []
+        for v in (result or {}).get("violations", []):
+            hit = dict(v) if isinstance(v, dict) else {"violation": v}
+            key, identity = _violation_key(v), _identity(hit)
+            current.append((key, identity, hit))
+            if identity is not None and _in_window(hit, overlap):
+                # Each earlier hit accounts for at most one repeat
+                twin = next((p for p in previous if p[:2] == (key, identity) and _in_window(p[2], overlap)), None)
+                if twin is not None:
+                    previous.remove(twin)
+                    continue
+            entry = dict(hit)
+            entry.setdefault("start_time", chunk["start_time"])
+            entry.setdefault("end_time", chunk["end_time"])
+            merged.append(entry)
+        previous = current
+    return merged
+
+
+# ---------------- Parallel Checking ----------------
+def check_chunks(chunks, checker, max_workers=BEDROCK_MAX_WORKERS, rate_per_sec=BEDROCK_RATE_PER_SEC):
+    """Run ``checker`` on every chunk concurrently under a shared rate limit."""
+    limiter = RateLimiter(rate_per_sec)
+
+    def run(chunk):
+        limiter.acquire()
+        return checker(chunk["transcript"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(run, chunks))
+    return list(zip(chunks, results))
+
+
+def check_long_transcript(words, checker, **chunk_kwargs):
+    """
+    Chunk a long transcript, check the chunks in parallel and return one
+    result in the usual ``{"total_violations", "violations"}`` shape.
+    """
+    max_workers = chunk_kwargs.pop("max_workers", BEDROCK_MAX_WORKERS)
+    rate_per_sec = chunk_kwargs.pop("rate_per_sec", BEDROCK_RATE_PER_SEC)
+    chunks = chunk_transcript(words, **chunk_kwargs)
+    if len(chunks) > 1:
+        print(f"[INFO] Checking {len(chunks)} transcript chunks with Bedrock in parallel...")
+    violations = merge_violations(check_chunks(chunks, checker, max_workers, rate_per_sec))
+    return {"total_violations": len(violations), "violations": violations, "chunks": len(chunks)}
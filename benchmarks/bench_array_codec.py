@@ -0,0 +1,56 @@
+"""
+Storage size and encode/decode time of plain vs compact (float32 binary)
+feature arrays, measured on copies of a sample report.
+
+    python -m benchmarks.bench_array_codec --report report.json --reports 200
+"""
+import json
+import time
+import argparse
+
+import bson
+
+from array_codec import encode_report, decode_report
+
+
+def _timed(fn, items):
+    started = time.perf_counter()
+    out = [fn(item) for item in items]
+    return out, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--report", default="report.json")
+    parser.add_argument("--reports", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with open(args.report) as f:
+        sample = decode_report(json.load(f))
+    reports = [dict(sample, file_name=f"call_{i:05d}.mp3") for i in range(args.reports)]
+
+    rows = []
+    # BSON (MongoDB documents)
+    plain, plain_enc = _timed(bson.encode, reports)
+    packed, packed_enc = _timed(lambda r: bson.encode(encode_report(r)), reports)
+    _, plain_dec = _timed(bson.decode, plain)
+    _, packed_dec = _timed(lambda b: decode_report(bson.decode(b)), packed)
+    rows.append(("bson", plain, packed, plain_enc, packed_enc, plain_dec, packed_dec))
+
+    # JSON (report.json / API payloads)
+    plain, plain_enc = _timed(lambda r: json.dumps(r).encode(), reports)
+    packed, packed_enc = _timed(lambda r: json.dumps(encode_report(r, target="json")).encode(), reports)
+    _, plain_dec = _timed(json.loads, plain)
+    _, packed_dec = _timed(lambda b: decode_report(json.loads(b)), packed)
+    rows.append(("json", plain, packed, plain_enc, packed_enc, plain_dec, packed_dec))
+
+    for fmt, plain, packed, plain_enc, packed_enc, plain_dec, packed_dec in rows:
+        plain_size, packed_size = sum(map(len, plain)), sum(map(len, packed))
+        print(f"{fmt}: size {plain_size / 1024:>9.1f} KB -> {packed_size / 1024:>9.1f} KB "
+              f"({packed_size / plain_size:.0%}) | "
+              f"encode {plain_enc * 1000:>7.1f} -> {packed_enc * 1000:>7.1f} ms | "
+              f"decode {plain_dec * 1000:>7.1f} -> {packed_dec * 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
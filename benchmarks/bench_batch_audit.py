@@ -0,0 +1,65 @@
+"""
+Throughput benchmark for batch_audit.run_batch against local AWS stand-ins.
+
+    python -m benchmarks.bench_batch_audit --calls 200 --workers 1 8 32
+"""
+import os
+import argparse
+import tempfile
+
+import aws_call_audit
+from batch_audit import run_batch
+from benchmarks.fakes import (
+    FakeS3Client, FakeTranscribeClient, fake_bedrock_check,
+    fake_extract_audio_features, fake_classify_call
+)
+
+
+def _make_recordings(directory, count, size_bytes):
+    paths = []
+    payload = os.urandom(size_bytes)
+    for i in range(count):
+        path = os.path.join(directory, f"call_{i:05d}.mp3")
+        with open(path, "wb") as f:
+            f.write(payload)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--transcribe-seconds", type=float, default=0.5)
+    parser.add_argument("--bedrock-seconds", type=float, default=0.2)
+    parser.add_argument("--s3-seconds-per-mb", type=float, default=0.05)
+    parser.add_argument("--size-kb", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    aws_call_audit.check_bedrock = fake_bedrock_check(args.bedrock_seconds)
+    aws_call_audit.extract_audio_features = fake_extract_audio_features
+    aws_call_audit.classify_call = fake_classify_call
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = _make_recordings(tmp, args.calls, args.size_kb * 1024)
+        for workers in args.workers:
+            transcribe = FakeTranscribeClient(job_seconds=args.transcribe_seconds)
+            summary = run_batch(
+                paths,
+                max_workers=workers,
+                output_dir=None,
+                context_defaults={
+                    "save_to_mongo": False,
+                    "use_cache": False,
+                    "poll_interval": 0.05,
+                    "s3_client": FakeS3Client(seconds_per_mb=args.s3_seconds_per_mb),
+                    "transcribe_client": transcribe
+                }
+            )
+            print(f"workers={workers:<4} calls={summary['succeeded']:<6} "
+                  f"elapsed={summary['elapsed_seconds']:>8.2f}s "
+                  f"throughput={summary['calls_per_min']:>10.1f} calls/min  transcribe_api={transcribe.calls}")
+
+
+if __name__ == "__main__":
+    main()
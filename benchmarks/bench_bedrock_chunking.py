@@ -0,0 +1,83 @@
+"""
+Latency of one-shot vs chunked, parallel Bedrock checking as calls get longer,
+against a fake Bedrock whose latency grows with prompt size.
+
+    python -m benchmarks.bench_bedrock_chunking --minutes 1 5 15 30 60
+
+Before timing, check_chunk_limits asserts that no chunk exceeds
+``max_words`` or repeats a word, including single-speaker monologues.
+"""
+import time
+import random
+import argparse
+
+from bedrock_chunker import check_long_transcript, chunk_transcript, CHUNK_MAX_WORDS
+from benchmarks.fakes import fake_bedrock_check
+
+WORDS_PER_MINUTE = 150
+VOCAB = ("investment portfolio market sir madam returns fund equity risk plan monthly "
+         "please account balance interest option yes okay understand").split()
+
+
+def synthetic_words(minutes, seed=0):
+    """Timed, two-speaker words with turns of 5-60 words."""
+    rng = random.Random(seed)
+    words, t, speaker = [], 0.0, 0
+    total = int(minutes * WORDS_PER_MINUTE)
+    while len(words) < total:
+        for _ in range(rng.randint(5, 60)):
+            duration = 60.0 / WORDS_PER_MINUTE
+            words.append({"text": rng.choice(VOCAB), "start_time": round(t, 3),
+                          "end_time": round(t + duration * 0.9, 3), "speaker": f"spk_{speaker}"})
+            t += duration
+        speaker = 1 - speaker
+    return words[:total]
+
+
+def monologue(n_words):
+    """One speaker, ``n_words`` distinct words (w0, w1, ...)."""
+    return [{"text": f"w{i}", "start_time": i * 0.4, "end_time": i * 0.4 + 0.3, "speaker": "spk_0"}
+            for i in range(n_words)]
+
+
+def check_chunk_limits(max_words=CHUNK_MAX_WORDS):
+    """Every chunk fits max_words (overlap included) and holds no word twice."""
+    for words in (monologue(2000), monologue(max_words + 1), synthetic_words(30)):
+        for chunk in chunk_transcript(words, max_words=max_words, max_seconds=float("inf")):
+            chunk_words = [w for t in chunk["transcript"] for w in t["text"].split()]
+            assert len(chunk_words) <= max_words, (len(chunk_words), max_words)
+            if words[0]["text"] == "w0":
+                assert len(set(chunk_words)) == len(chunk_words), "chunk repeats words"
+    print(f"[INFO] Chunk limits hold (max_words={max_words})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 15, 30, 60])
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--ms-per-word", type=float, default=0.2)
+    parser.add_argument("--context-words", type=int, default=6000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    check_chunk_limits()
+    checker = fake_bedrock_check(args.base_latency, violations=[{"rule": "risk-free investment"}],
+                                 seconds_per_word=args.ms_per_word / 1000, max_words=args.context_words)
+    print(f"{'minutes':>8} {'words':>7} {'single (s)':>11} {'chunked (s)':>12} {'chunks':>7}")
+    for minutes in args.minutes:
+        words = synthetic_words(minutes)
+        started = time.perf_counter()
+        try:
+            checker([{"speaker": "agent", "text": " ".join(w["text"] for w in words)}])
+            single = f"{time.perf_counter() - started:.2f}"
+        except ValueError:
+            single = "too long"
+        started = time.perf_counter()
+        result = check_long_transcript(words, checker, max_workers=args.workers, rate_per_sec=args.rate)
+        chunked = time.perf_counter() - started
+        print(f"{minutes:>8g} {len(words):>7} {single:>11} {chunked:>12.2f} {result['chunks']:>7}")
+
+
+if __name__ == "__main__":
+    main()
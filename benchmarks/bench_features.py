@@ -0,0 +1,102 @@
+"""
+Serial vs block-parallel feature extraction on a synthetic call, with a
+parity check between the two and peak memory of the run. ``--reference``
+also compares against the original extractor (audio_features.py), per
+feature, since the block-parallel values are close to it but not identical.
+
+    python -m benchmarks.bench_features --minutes 1 5 20 --workers 4 [--reference]
+"""
+import os
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+import parallel_features
+from benchmarks.synthetic_audio import synthetic_call
+
+
+def _run(path, warm_path, workers, block_seconds, out):
+    # Imports and JIT compilation happen here, outside the timed run
+    parallel_features.extract_audio_features(warm_path, workers=workers)
+    started = time.perf_counter()
+    features = parallel_features.extract_audio_features(path, workers=workers, block_seconds=block_seconds)
+    seconds = time.perf_counter() - started
+    # Reap the pool workers so RUSAGE_CHILDREN includes them
+    parallel_features.shutdown_pool()
+    rss = max(resource.getrusage(r).ru_maxrss for r in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    out.put((seconds, features, rss / 1024))
+
+
+def measure(path, warm_path, workers, block_seconds):
+    """Run one extraction in a fresh process so its peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    out = context.Queue()
+    proc = context.Process(target=_run, args=(path, warm_path, workers, block_seconds, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def _relative_diffs(a, b):
+    """Per-feature largest difference, relative to the magnitude of that feature in ``b``."""
+    return {
+        k: float(np.max(np.abs(np.asarray(a[k]) - np.asarray(b[k]))) / (np.max(np.abs(np.asarray(b[k]))) + 1e-9))
+        for k in b
+    }
+
+
+def _max_relative_diff(a, b):
+    return max(_relative_diffs(a, b).values())
+
+
+def compare_reference(path, parallel):
+    """Print how far the parallel extractor is from audio_features.py on ``path``."""
+    try:
+        from audio_features import extract_audio_features as reference_extract
+    except ImportError as e:
+        print(f"         reference: skipped ({e})")
+        return
+    reference = reference_extract(path)
+    missing = sorted(set(reference) ^ set(parallel))
+    if missing:
+        print(f"         reference: keys differ: {missing}")
+    shared = {k: reference[k] for k in reference if k in parallel
+              and np.shape(reference[k]) == np.shape(parallel[k])}
+    diffs = sorted(_relative_diffs(parallel, shared).items(), key=lambda kv: -kv[1])
+    print("         reference rel diff: " + ", ".join(f"{k} {d:.1e}" for k, d in diffs))
+    mismatched = sorted(set(reference) & set(parallel) - set(shared))
+    if mismatched:
+        print(f"         reference: shapes differ for {mismatched}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5])
+    parser.add_argument("--workers", type=int, default=parallel_features.FEATURE_WORKERS)
+    parser.add_argument("--reference", action="store_true",
+                        help="Also compare against audio_features.extract_audio_features")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        warm_path = os.path.join(tmp, "warm.wav")
+        synthetic_call(warm_path, 6, sr=parallel_features.SAMPLE_RATE)
+        for minutes in args.minutes:
+            path = os.path.join(tmp, f"call_{minutes}.wav")
+            synthetic_call(path, minutes * 60, sr=parallel_features.SAMPLE_RATE)
+            # One block covering the whole call = the plain serial computation
+            serial_s, serial, serial_mb = measure(path, warm_path, 1, minutes * 60 + 1)
+            parallel_s, parallel, parallel_mb = measure(path, warm_path, args.workers, parallel_features.BLOCK_SECONDS)
+            print(f"{minutes:>6.1f} min: serial {serial_s:>7.2f}s {serial_mb:>6.0f} MB | "
+                  f"parallel({args.workers}) {parallel_s:>7.2f}s {parallel_mb:>6.0f} MB "
+                  f"({serial_s / parallel_s:.1f}x) | max rel diff {_max_relative_diff(parallel, serial):.1e}")
+            if args.reference:
+                compare_reference(path, parallel)
+
+
+if __name__ == "__main__":
+    main()
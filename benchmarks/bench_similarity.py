@@ -0,0 +1,99 @@
+"""
+Similarity index at 10k-1M calls: build and single-call add throughput,
+IVF training time, top-k query latency (brute force vs IVF), IVF recall@k
+against the exact result, disk size and peak memory.
+
+Vectors are synthetic: noisy copies of a few thousand "voice" centres, so
+the data has the cluster structure IVF relies on.
+
+    python -m benchmarks.bench_similarity --sizes 10000 100000 1000000
+"""
+import os
+import time
+import argparse
+import resource
+import tempfile
+
+import numpy as np
+
+from similarity_index import SimilarityIndex
+
+
+def synthetic_vectors(n, dim, rng, n_centres=2000):
+    centres = rng.normal(0, 1, (n_centres, dim)).astype(np.float32) * rng.uniform(0.5, 3, dim).astype(np.float32)
+    labels = rng.integers(0, n_centres, n)
+    return centres[labels] + rng.normal(0, 0.3, (n, dim)).astype(np.float32)
+
+
+def _ms(values):
+    values = np.asarray(values) * 1000
+    return float(np.percentile(values, 50)), float(np.percentile(values, 95))
+
+
+def bench(n, k, queries, nprobe, batch, root):
+    rng = np.random.default_rng(n)
+    index = SimilarityIndex(root)
+    dim = index.dim
+
+    started = time.perf_counter()
+    for start in range(0, n, batch):
+        count = min(batch, n - start)
+        metas = [{"agent_name": f"agent_{(start + i) % 50}", "date": "2024-01-01",
+                  "file_name": f"call_{start + i}.mp3", "audio_hash": None} for i in range(count)]
+        index.add_vectors(synthetic_vectors(count, dim, rng), metas)
+    build = time.perf_counter() - started
+
+    # save_report path: one call at a time
+    adds = []
+    for i in range(20):
+        t0 = time.perf_counter()
+        index.add_vectors(synthetic_vectors(1, dim, rng), [{"agent_name": "agent_0", "date": "2024-01-02",
+                                                             "file_name": f"new_{i}.mp3", "audio_hash": None}])
+        adds.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    n_lists = index.train()
+    train = time.perf_counter() - started
+
+    raw = np.memmap(os.path.join(root, "raw.f32"), dtype=np.float32, mode="r").reshape(-1, dim)
+    picks = rng.choice(len(index), queries, replace=False)
+    probes = [raw[i] + rng.normal(0, 0.1, dim).astype(np.float32) for i in picks]
+
+    exact, approx, agent, recall = [], [], [], []
+    for q in probes:
+        t0 = time.perf_counter()
+        truth = index.search(q, k, exact=True)
+        exact.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        found = index.search(q, k, exact=False, nprobe=nprobe)
+        approx.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        index.search(q, k, agent_name="agent_7", exact=True)
+        agent.append(time.perf_counter() - t0)
+        recall.append(len({r["row"] for r in truth} & {r["row"] for r in found}) / k)
+
+    disk = sum(os.path.getsize(os.path.join(root, f)) for f in os.listdir(root))
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{n:>8} calls  build {n / build:>9.0f}/s  add p50 {_ms(adds)[0]:>6.2f} ms  "
+          f"train {train:>6.1f}s ({n_lists} lists)  disk {disk / 1e6:>7.1f} MB  peak RSS {rss:>6.0f} MB")
+    print(f"{'':>8}        exact p50/p95 {_ms(exact)[0]:>7.2f}/{_ms(exact)[1]:>7.2f} ms  "
+          f"IVF(nprobe={nprobe}) {_ms(approx)[0]:>6.2f}/{_ms(approx)[1]:>6.2f} ms  "
+          f"recall@{k} {np.mean(recall):.3f}  one agent (exact) {_ms(agent)[0]:>7.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=50_000, help="Vectors per bulk add while building")
+    args = parser.parse_args(argv)
+
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            bench(n, args.k, args.queries, args.nprobe, args.batch, root)
+
+
+if __name__ == "__main__":
+    main()
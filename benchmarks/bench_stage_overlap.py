@@ -0,0 +1,55 @@
+"""
+End-to-end latency of one audit with transcription and local feature
+extraction overlapping, against the sequential sum of the stage times.
+
+    python -m benchmarks.bench_stage_overlap --transcribe-seconds 2 --features-seconds 1.5
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import aws_call_audit
+from aws_call_audit import AuditContext, generate_full_audit
+from benchmarks.fakes import (
+    FakeS3Client, FakeTranscribeClient, fake_bedrock_check,
+    fake_extract_audio_features, fake_classify_call
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transcribe-seconds", type=float, default=2.0)
+    parser.add_argument("--bedrock-seconds", type=float, default=0.5)
+    parser.add_argument("--features-seconds", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    def slow_features(path):
+        time.sleep(args.features_seconds)
+        return fake_extract_audio_features(path)
+
+    aws_call_audit.check_bedrock = fake_bedrock_check(args.bedrock_seconds)
+    aws_call_audit.extract_audio_features = slow_features
+    aws_call_audit.classify_call = fake_classify_call
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "call.mp3")
+        with open(path, "wb") as f:
+            f.write(os.urandom(64 * 1024))
+        ctx = AuditContext(
+            audio_file=path, report_path=None, save_to_mongo=False, use_cache=False, poll_interval=0.05,
+            s3_client=FakeS3Client(), transcribe_client=FakeTranscribeClient(job_seconds=args.transcribe_seconds)
+        )
+        started = time.perf_counter()
+        report = generate_full_audit(ctx=ctx)
+        elapsed = time.perf_counter() - started
+
+    timings = report["stage_timings"]
+    for name, t in timings.items():
+        print(f"{name:<15} {t['start']:>7.2f}s -> {t['end']:>7.2f}s ({t['seconds']:.2f}s)")
+    sequential = sum(t["seconds"] for t in timings.values())
+    print(f"end-to-end {elapsed:.2f}s vs sequential {sequential:.2f}s ({sequential / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
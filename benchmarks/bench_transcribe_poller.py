@@ -0,0 +1,48 @@
+"""
+Drive many concurrent Transcribe jobs through one TranscriptionPoller.
+
+    python -m benchmarks.bench_transcribe_poller --jobs 500 --job-seconds 3
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from benchmarks.fakes import FakeTranscribeClient
+from transcribe_poller import TranscriptionPoller
+
+
+async def _run(jobs, job_seconds, spread, max_delay):
+    client = FakeTranscribeClient(job_seconds=job_seconds)
+    poller = TranscriptionPoller(client, initial_delay=0.25, max_delay=max_delay)
+    lags = []
+
+    async def one(i):
+        await asyncio.sleep(random.uniform(0, spread))
+        name = f"bench-job-{i}"
+        await poller.start_and_wait(TranscriptionJobName=name, Media={"MediaFileUri": "s3://b/k"},
+                                    MediaFormat="mp3", LanguageCode="en-US")
+        # Lag between the fake job finishing and the caller being woken up.
+        lags.append(time.monotonic() - (client.jobs[name] + job_seconds))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(jobs)))
+    elapsed = time.perf_counter() - started
+    lags.sort()
+    print(f"jobs={jobs} elapsed={elapsed:.2f}s api_calls={client.calls} poller={poller.stats}")
+    print(f"completion lag p50={lags[len(lags) // 2]:.2f}s p95={lags[int(len(lags) * 0.95) - 1]:.2f}s "
+          f"max={lags[-1]:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--job-seconds", type=float, default=2.0)
+    parser.add_argument("--spread", type=float, default=2.0, help="Seconds over which jobs are started")
+    parser.add_argument("--max-delay", type=float, default=2.0)
+    args = parser.parse_args(argv)
+    asyncio.run(_run(args.jobs, args.job_seconds, args.spread, args.max_delay))
+
+
+if __name__ == "__main__":
+    main()
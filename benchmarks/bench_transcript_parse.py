@@ -0,0 +1,96 @@
+"""
+Peak memory and time of indexing a Transcribe output with json.load vs the
+streamed (ijson) parse, on synthetic transcripts of growing call length
+built by repeating real_transcript.json.
+
+    python -m benchmarks.bench_transcript_parse --minutes 10 60 240
+"""
+import os
+import json
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+from benchmarks.fakes import SAMPLE_TRANSCRIPT
+
+# Transcribe produces roughly this many words per minute of conversation
+WORDS_PER_MINUTE = 150
+
+
+def write_transcript(path, minutes):
+    """Repeat the sample's items (with shifted times) up to ``minutes`` of call."""
+    with open(SAMPLE_TRANSCRIPT) as f:
+        sample = json.load(f)["results"]
+    words = [i for i in sample["items"] if i["type"] == "pronunciation"]
+    span = float(words[-1]["end_time"]) + 1.0
+    repeats = max(1, int(minutes * WORDS_PER_MINUTE / len(words)))
+
+    def shifted(entry, offset):
+        entry = dict(entry)
+        for key in ("start_time", "end_time"):
+            if key in entry:
+                entry[key] = f"{float(entry[key]) + offset:.3f}"
+        return entry
+
+    with open(path, "w") as f:
+        f.write('{"jobName": "bench", "results": {"transcripts": [{"transcript": ""}], ')
+        f.write('"speaker_labels": {"segments": [')
+        for r in range(repeats):
+            for k, seg in enumerate(sample["speaker_labels"]["segments"]):
+                seg = dict(shifted(seg, r * span), items=[shifted(i, r * span) for i in seg["items"]])
+                f.write(("," if r or k else "") + json.dumps(seg))
+        f.write(']}, "items": [')
+        for r in range(repeats):
+            for k, item in enumerate(sample["items"]):
+                f.write(("," if r or k else "") + json.dumps(shifted(item, r * span)))
+        f.write("]}}")
+    return repeats * len(words)
+
+
+def _run(path, mode, out):
+    from transcript_index import TranscriptIndex, fetch_transcript
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if mode == "stream":
+        index, _ = fetch_transcript(f"file://{path}")
+    else:
+        with open(path) as f:
+            index = TranscriptIndex.from_transcribe(json.load(f))
+    seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    out.put((seconds, (after - before) / 1024, len(index)))
+
+
+def measure(path, mode):
+    """Index one file in a fresh process so the peak RSS growth is its own."""
+    context = multiprocessing.get_context("spawn")
+    out = context.Queue()
+    proc = context.Process(target=_run, args=(path, mode, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 240])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            path = os.path.join(tmp, f"transcript_{minutes:g}.json")
+            words = write_transcript(path, minutes)
+            size_mb = os.path.getsize(path) / 1e6
+            for mode in ("load", "stream"):
+                seconds, grown_mb, n = measure(path, mode)
+                assert n == words
+                print(f"{minutes:>6g} min {words:>7} words {size_mb:>8.1f} MB  {mode:<6} "
+                      f"{seconds:>7.2f}s  peak RSS +{grown_mb:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
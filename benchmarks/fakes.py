@@ -0,0 +1,211 @@
+"""
+Deterministic local stand-ins for the AWS services used by the audit pipeline.
+
+They mimic only the boto3 calls this repo makes, with configurable latency, so
+pipeline orchestration can be benchmarked without network access or AWS cost.
+"""
+import os
+import time
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_TRANSCRIPT = os.path.join(REPO_DIR, "real_transcript.json")
+
+
+class FakeS3Client:
+    """Records uploads in memory; latency scales with the uploaded size."""
+
+    def __init__(self, seconds_per_mb=0.0, base_latency=0.0):
+        self.seconds_per_mb = seconds_per_mb
+        self.base_latency = base_latency
+        self.buckets = set()
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def head_bucket(self, Bucket):
+        if Bucket not in self.buckets:
+            raise Exception(f"NoSuchBucket: {Bucket}")
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        with self._lock:
+            self.buckets.add(Bucket)
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        size = os.path.getsize(Filename)
+        time.sleep(self.base_latency + self.seconds_per_mb * size / (1024 * 1024))
+        with self._lock:
+            self.buckets.add(Bucket)
+            self.objects[(Bucket, Key)] = size
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(self.base_latency + self.seconds_per_mb * len(Body) / (1024 * 1024))
+        with self._lock:
+            self.objects[(Bucket, Key)] = len(Body)
+        return {"ETag": '"fake"'}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        return {"UploadId": f"{Bucket}/{Key}"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        time.sleep(self.seconds_per_mb * len(Body) / (1024 * 1024))
+        with self._lock:
+            self.objects[(Bucket, Key)] = self.objects.get((Bucket, Key), 0) + len(Body)
+        return {"ETag": f'"part-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        time.sleep(self.base_latency)
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+
+class FakeTranscribeClient:
+    """Jobs complete ``job_seconds`` after they start and point at a local transcript."""
+
+    def __init__(self, job_seconds=0.0, transcript_path=SAMPLE_TRANSCRIPT, fail_jobs=()):
+        self.job_seconds = job_seconds
+        self.transcript_path = transcript_path
+        self.fail_jobs = set(fail_jobs)
+        self.jobs = {}
+        self.calls = {"start": 0, "get": 0, "list": 0}
+        self._lock = threading.Lock()
+
+    def start_transcription_job(self, TranscriptionJobName, Media, MediaFormat, LanguageCode, **kwargs):
+        with self._lock:
+            self.calls["start"] += 1
+            self.jobs[TranscriptionJobName] = time.monotonic()
+        return {"TranscriptionJob": {"TranscriptionJobName": TranscriptionJobName,
+                                     "TranscriptionJobStatus": "IN_PROGRESS"}}
+
+    def _job(self, name):
+        started = self.jobs[name]
+        if time.monotonic() - started < self.job_seconds:
+            state = "IN_PROGRESS"
+        elif name in self.fail_jobs:
+            state = "FAILED"
+        else:
+            state = "COMPLETED"
+        job = {"TranscriptionJobName": name, "TranscriptionJobStatus": state}
+        if state == "COMPLETED":
+            job["Transcript"] = {"TranscriptFileUri": f"file://{self.transcript_path}"}
+        return job
+
+    def get_transcription_job(self, TranscriptionJobName):
+        with self._lock:
+            self.calls["get"] += 1
+        return {"TranscriptionJob": self._job(TranscriptionJobName)}
+
+    def list_transcription_jobs(self, Status=None, MaxResults=100, NextToken=None, **kwargs):
+        with self._lock:
+            self.calls["list"] += 1
+            names = sorted(self.jobs)
+        summaries = []
+        for name in names:
+            job = self._job(name)
+            if Status is None or job["TranscriptionJobStatus"] == Status:
+                summaries.append({"TranscriptionJobName": name,
+                                  "TranscriptionJobStatus": job["TranscriptionJobStatus"]})
+        start = int(NextToken or 0)
+        page = {"TranscriptionJobSummaries": summaries[start:start + MaxResults]}
+        if start + MaxResults < len(summaries):
+            page["NextToken"] = str(start + MaxResults)
+        return page
+
+
+def fake_bedrock_check(latency=0.0, violations=(), seconds_per_word=0.0, max_words=None):
+    """
+    Build a stand-in for ``bedrock_rule_checker.check_violations``.
+
+    Latency grows with the prompt size (``seconds_per_word``); transcripts over
+    ``max_words`` fail like a request past the model's context limit.
+    """
+    def check_violations(transcript_list):
+        n_words = sum(len(t.get("text", "").split()) for t in transcript_list)
+        if max_words is not None and n_words > max_words:
+            raise ValueError(f"Input of {n_words} words exceeds the model context ({max_words})")
+        time.sleep(latency + seconds_per_word * n_words)
+        return {"total_violations": len(violations), "violations": list(violations)}
+    return check_violations
+
+
+def fake_extract_audio_features(audio_path):
+    """Fixed feature dict with the same keys and shapes as a real report."""
+    return {
+        "mel_spectrogram": [1.0] * 128,
+        "log_mel_spectrogram": [0.0] * 128,
+        "scalogram": [0.5] * 127,
+        "pitch": 180.0,
+        "pitch_range": 400.0,
+        "tempo": 120.0,
+        "jitter": 0.005,
+        "mfcc": [0.1] * 13,
+        "gfcc": [0.2] * 13,
+        "zero_crossing_rate": 0.03,
+        "rms_energy": 0.07,
+        "chroma": [0.3] * 12
+    }
+
+
+def fake_classify_call(features):
+    return 1, 0.78
+
+
+def train_fake_classifier(path, n_samples=500, seed=0):
+    """
+    Fit a small logistic regression on random rows of the default feature
+    schema and save it (joblib) at ``path``, so the real model registry and
+    classify_many can be exercised without the production model.
+    """
+    import joblib
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+
+    from feature_schema import SCHEMAS, DEFAULT_SCHEMA
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_samples, SCHEMAS[DEFAULT_SCHEMA].width)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * rng.normal(size=n_samples) > 0).astype(int)
+    joblib.dump(LogisticRegression(max_iter=200).fit(X, y), path)
+    return path
+
+
+def fake_features(seed=0):
+    """Feature dict shaped like fake_extract_audio_features, with varied values."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    features = fake_extract_audio_features(None)
+    for key, value in features.items():
+        if isinstance(value, list):
+            features[key] = rng.normal(size=len(value)).tolist()
+        else:
+            features[key] = float(value * (0.5 + rng.random()))
+    return features
+
+
+def use_mongomock():
+    """
+    Point mongo_connector at an in-memory mongomock server. Must run before
+    mongo_connector is first imported.
+    """
+    import mongomock
+    import pymongo
+    from pymongo import InsertOne
+
+    pymongo.MongoClient = mongomock.MongoClient
+
+    # mongomock's bulk_write does not accept current pymongo UpdateOne
+    # objects; apply the operations one by one instead
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        for op in requests:
+            if isinstance(op, InsertOne):
+                self.insert_one(op._doc)
+            else:
+                self.update_one(op._filter, op._doc, upsert=op._upsert)
+
+    mongomock.collection.Collection.bulk_write = bulk_write
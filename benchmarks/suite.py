@@ -0,0 +1,274 @@
+"""
+Benchmark suite over local fakes: full audits, feature extraction, the
+classifier and the MongoDB report queries at 1/10/100/1000-call scales.
+
+Results are written as JSON; pass a previous run as ``--baseline`` to fail on
+throughput/latency regressions beyond ``--tolerance``.
+
+    python -m benchmarks.suite --scales 1 10 100 1000
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --baseline benchmarks/results/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+
+from benchmarks import fakes
+from benchmarks.synthetic_audio import make_corpus
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCALES = (1, 10, 100, 1000)
+SCENARIOS = ("audit", "features", "classifier", "mongo")
+# Differences below these are timer noise, never reported as regressions
+MIN_COMPARE_SECONDS = 0.05
+MIN_COMPARE_MS = 1.0
+
+
+def _latency_stats(seconds):
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(values):
+        return {"p50_ms": 0.0, "p95_ms": 0.0}
+    return {"p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3)}
+
+
+def _result(scenario, scale, elapsed, latencies, completed=None, **extra):
+    completed = scale if completed is None else completed
+    return dict({
+        "scenario": scenario,
+        "scale": scale,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(completed / elapsed, 3) if elapsed > 0 else 0.0
+    }, **_latency_stats(latencies), **extra)
+
+
+def _use_fake_classifier(tmp):
+    """Serve classify_many from a small classifier trained on random rows."""
+    import aws_call_audit
+    from model_registry import ModelRegistry
+
+    path = os.path.join(tmp, "classifier.pkl")
+    if not os.path.exists(path):
+        fakes.train_fake_classifier(path)
+    registry = ModelRegistry(path)
+    aws_call_audit.get_model_registry = lambda: registry
+    return registry
+
+
+# ---------------- Scenarios ----------------
+def bench_audit(scale, tmp, args):
+    """generate_full_audit through run_batch, AWS replaced by fakes."""
+    import aws_call_audit
+    from batch_audit import run_batch
+    from instrumentation import JsonlSink, set_sinks, read_records, summarize
+
+    metrics_path = os.path.join(tmp, f"metrics_{scale}.jsonl")
+    set_sinks([JsonlSink(metrics_path)])
+    aws_call_audit.check_bedrock = fakes.fake_bedrock_check(args.bedrock_seconds)
+    aws_call_audit.extract_audio_features = fakes.fake_extract_audio_features
+    _use_fake_classifier(tmp)
+
+    paths = make_corpus(os.path.join(tmp, f"audit_{scale}"), scale, lengths=(2,))
+    summary = run_batch(
+        paths,
+        max_workers=args.workers,
+        output_dir=None,
+        context_defaults={
+            "save_to_mongo": False,
+            "use_cache": False,
+            "poll_interval": 0.02,
+            "s3_client": fakes.FakeS3Client(),
+            "transcribe_client": fakes.FakeTranscribeClient(job_seconds=args.transcribe_seconds)
+        }
+    )
+    stages = {row["stage"]: round(row["p50"] * 1000, 3) for row in summarize(read_records(metrics_path))}
+    return _result("audit", scale, summary["elapsed_seconds"], [r["seconds"] for r in summary["results"]],
+                   completed=summary["succeeded"], failed=summary["failed"], stage_p50_ms=stages)
+
+
+def bench_features(scale, tmp, args):
+    """The block-parallel extractor on synthetic 5 s calls (capped at --max-feature-calls)."""
+    try:
+        import parallel_features
+    except ImportError as e:
+        return {"scenario": "features", "scale": scale, "skipped": f"{e}"}
+    if scale > args.max_feature_calls:
+        return {"scenario": "features", "scale": scale, "skipped": f"above --max-feature-calls {args.max_feature_calls}"}
+
+    paths = make_corpus(os.path.join(tmp, f"features_{scale}"), scale, lengths=(5,))
+    parallel_features.extract_audio_features(paths[0])  # imports, JIT, process pool start
+    latencies = []
+    started = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        parallel_features.extract_audio_features(path)
+        latencies.append(time.perf_counter() - t0)
+    return _result("features", scale, time.perf_counter() - started, latencies)
+
+
+def bench_classifier(scale, tmp, args):
+    """classify_many on ``scale`` feature dicts, one call vs one row at a time."""
+    import aws_call_audit
+
+    _use_fake_classifier(tmp)
+    features = [fakes.fake_features(i) for i in range(scale)]
+    aws_call_audit.classify_many(features[:1])  # load the model outside the timing
+
+    started = time.perf_counter()
+    aws_call_audit.classify_many(features)
+    batched = time.perf_counter() - started
+
+    latencies = []
+    for f in features:
+        t0 = time.perf_counter()
+        aws_call_audit.classify_many([f])
+        latencies.append(time.perf_counter() - t0)
+    return _result("classifier", scale, batched, latencies, per_call_seconds=round(sum(latencies), 4))
+
+
+def bench_mongo(scale, tmp, args):
+    """save_report, paged listing and single-report fetches against mongomock."""
+    import mongo_connector
+    import agent_stats
+    import similarity_index
+
+    # Keep the incremental similarity index updates (opt-in), but out of the working tree
+    similarity_index.SIMILARITY_INDEX = True
+    similarity_index._index = similarity_index.SimilarityIndex(os.path.join(tmp, f"similarity_{scale}"))
+    with open(fakes.REPO_DIR + "/report.json") as f:
+        sample = json.load(f)
+    mongo_connector.collection.drop()
+    agent_stats.stats_collection.drop()
+    mongo_connector.ensure_indexes()
+    agent_stats.ensure_indexes()
+
+    agent, start = "bench_agent", date(2024, 1, 1)
+    saves = []
+    started = time.perf_counter()
+    for i in range(scale):
+        report = dict(sample, audio_hash=f"{i:064x}")
+        t0 = time.perf_counter()
+        mongo_connector.save_report(agent, str(start + timedelta(days=i % 30)), f"call_{i:05d}.wav", report)
+        saves.append(time.perf_counter() - t0)
+    save_seconds = time.perf_counter() - started
+
+    queries = []
+    t0 = time.perf_counter()
+    dates = mongo_connector.list_report_dates(agent)
+    queries.append(time.perf_counter() - t0)
+    listed, cursor = 0, None
+    while True:
+        t0 = time.perf_counter()
+        items, cursor = mongo_connector.list_report_summaries(agent, cursor=cursor)
+        queries.append(time.perf_counter() - t0)
+        listed += len(items)
+        if cursor is None:
+            break
+    rng = random.Random(0)
+    for _ in range(min(scale, 20)):
+        i = rng.randrange(scale)
+        t0 = time.perf_counter()
+        mongo_connector.get_report(agent, str(start + timedelta(days=i % 30)), f"call_{i:05d}.wav")
+        queries.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    agent_stats.get_daily_stats(agent)
+    queries.append(time.perf_counter() - t0)
+
+    return _result("mongo", scale, save_seconds, saves, listed=listed, dates=len(dates),
+                   query_p50_ms=_latency_stats(queries)["p50_ms"], query_p95_ms=_latency_stats(queries)["p95_ms"])
+
+
+BENCHMARKS = {
+    "audit": bench_audit,
+    "features": bench_features,
+    "classifier": bench_classifier,
+    "mongo": bench_mongo
+}
+
+
+# ---------------- Results ----------------
+def compare(results, baseline, tolerance):
+    """Regressions vs a baseline run: lower throughput or higher p95 beyond ``tolerance``."""
+    previous = {(r["scenario"], r["scale"]): r for r in baseline.get("results", []) if "skipped" not in r}
+    regressions = []
+    for r in results:
+        old = previous.get((r["scenario"], r["scale"]))
+        if old is None or "skipped" in r:
+            continue
+        measurable = min(r["seconds"], old["seconds"]) >= MIN_COMPARE_SECONDS
+        if measurable and r["throughput_per_s"] < old["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']}@{r['scale']}: throughput "
+                               f"{r['throughput_per_s']:.1f}/s vs {old['throughput_per_s']:.1f}/s")
+        if r["p95_ms"] - old["p95_ms"] >= MIN_COMPARE_MS and r["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['scenario']}@{r['scale']}: p95 {r['p95_ms']:.1f} ms vs {old['p95_ms']:.1f} ms")
+    return regressions
+
+
+def run_suite(scenarios, scales, args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scenario in scenarios:
+            for scale in scales:
+                result = BENCHMARKS[scenario](scale, tmp, args)
+                results.append(result)
+                if "skipped" in result:
+                    print(f"{scenario:<11} {scale:>5}  skipped: {result['skipped']}")
+                else:
+                    print(f"{scenario:<11} {scale:>5}  {result['seconds']:>9.3f}s "
+                          f"{result['throughput_per_s']:>10.1f}/s  p50 {result['p50_ms']:>9.2f} ms "
+                          f"p95 {result['p95_ms']:>9.2f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument("--workers", type=int, default=32, help="run_batch workers for the audit scenario")
+    parser.add_argument("--transcribe-seconds", type=float, default=0.05)
+    parser.add_argument("--bedrock-seconds", type=float, default=0.01)
+    parser.add_argument("--max-feature-calls", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write results as baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    # Before anything imports mongo_connector
+    fakes.use_mongomock()
+
+    results = run_suite(args.scenarios, args.scales, args)
+    run = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+    if args.save_baseline:
+        with open(os.path.join(RESULTS_DIR, "baseline.json"), "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
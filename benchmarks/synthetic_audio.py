@@ -0,0 +1,56 @@
+"""
+Deterministic synthetic call recordings (16-bit PCM WAV, stdlib only):
+alternating voiced/silent stretches with a wandering pitch, plus noise.
+"""
+import os
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Short, typical and long calls
+DEFAULT_LENGTHS = (5, 30, 120)
+
+
+def synthetic_call(path, seconds, sr=SAMPLE_RATE, seed=0):
+    """Write ``seconds`` of synthetic speech-like audio to ``path``; one second in memory at a time."""
+    rng = np.random.default_rng(seed)
+    base_pitch = 120 + 80 * rng.random()
+    phase = 0.0
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sr)
+        for second in range(int(np.ceil(seconds))):
+            n = min(sr, int(seconds * sr) - second * sr)
+            t = second + np.arange(n) / sr
+            pitch = base_pitch + 60 * np.sin(2 * np.pi * t / 7)
+            voiced = np.sin(2 * np.pi * t / 3 + seed) > -0.3
+            phases = phase + 2 * np.pi * np.cumsum(pitch) / sr
+            phase = phases[-1] if n else phase
+            y = 0.3 * np.sin(phases) * voiced + 0.01 * rng.standard_normal(n)
+            out.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
+    return path
+
+
+def make_corpus(directory, count, lengths=DEFAULT_LENGTHS, sr=SAMPLE_RATE, ext="wav"):
+    """
+    ``count`` recordings cycling through ``lengths`` (seconds). Each distinct
+    length is synthesized once and hard-linked (or copied) for the rest, so
+    large corpora are cheap to build but still separate files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    templates, paths = {}, []
+    for i in range(count):
+        seconds = lengths[i % len(lengths)]
+        if seconds not in templates:
+            templates[seconds] = synthetic_call(os.path.join(directory, f"template_{seconds}s.wav"),
+                                                seconds, sr, seed=len(templates))
+        path = os.path.join(directory, f"call_{i:05d}_{seconds}s.{ext}")
+        try:
+            os.link(templates[seconds], path)
+        except OSError:
+            with open(templates[seconds], "rb") as src, open(path, "wb") as dst:
+                dst.write(src.read())
+        paths.append(path)
+    return paths
@@ -0,0 +1,185 @@
+import json
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Supported per-feature operations on the value found at ``path``
+OPS = ("value", "mean", "index", "len")
+
+
+@dataclass(frozen=True)
+class Feature:
+    """One model input column: where to find it in a report and how to reduce it."""
+    path: Tuple[str, ...]
+    op: str = "value"
+    index: Optional[int] = None
+    default: float = 0.0
+
+    @property
+    def name(self):
+        suffix = f"[{self.index}]" if self.op == "index" else (f".{self.op}" if self.op != "value" else "")
+        return ".".join(self.path) + suffix
+
+    def to_dict(self):
+        d = {"path": list(self.path), "op": self.op, "default": self.default}
+        if self.index is not None:
+            d["index"] = self.index
+        return d
+
+
+def _getter(feature):
+    path, default = feature.path, feature.default
+
+    def lookup(report):
+        value = report
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    if feature.op == "value":
+        def get(report):
+            v = lookup(report)
+            return default if v is None else v
+    elif feature.op == "mean":
+        def get(report):
+            v = lookup(report)
+            return sum(v) / len(v) if v else default
+    elif feature.op == "index":
+        i = feature.index
+
+        def get(report):
+            v = lookup(report)
+            return v[i] if v is not None and len(v) > i else default
+    elif feature.op == "len":
+        def get(report):
+            v = lookup(report)
+            return default if v is None else len(v)
+    else:
+        raise ValueError(f"Unknown feature op '{feature.op}', expected one of {OPS}")
+    return get
+
+
+@dataclass
+class FeatureSchema:
+    """
+    Declarative, versioned list of model inputs.
+
+    ``build(reports)`` maps N report dicts (the same shape generate_full_audit
+    saves) to a contiguous (N, F) float32 matrix in a single pass.
+    """
+    name: str
+    features: Tuple[Feature, ...]
+    _getters: list = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.features = tuple(self.features)
+        self._getters = [_getter(f) for f in self.features]
+
+    @property
+    def width(self):
+        return len(self.features)
+
+    @property
+    def columns(self):
+        return [f.name for f in self.features]
+
+    def unfilled(self, available):
+        """Columns whose top-level report key is not among ``available``."""
+        return [f.name for f in self.features if f.path[0] not in available]
+
+    def row(self, report):
+        return [g(report) for g in self._getters]
+
+    def build(self, reports):
+        getters, width = self._getters, len(self._getters)
+        values = chain.from_iterable((g(r) for g in getters) for r in reports)
+        flat = np.fromiter(values, dtype=np.float32, count=len(reports) * width)
+        return flat.reshape(len(reports), width)
+
+    def to_dict(self):
+        return {"name": self.name, "features": [f.to_dict() for f in self.features]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            name=data["name"],
+            features=[
+                Feature(path=tuple(f["path"]), op=f.get("op", "value"),
+                        index=f.get("index"), default=f.get("default", 0.0))
+                for f in data["features"]
+            ]
+        )
+
+
+def _audio(key, op="value", index=None):
+    return Feature(path=("audio_features", key), op=op, index=index)
+
+
+# ---------------- Built-in Schemas ----------------
+# Inputs used by aws_call_audit.classify_call
+AUDIT_V1 = FeatureSchema("audit_v1", [
+    _audio("pitch"),
+    _audio("pitch_range"),
+    _audio("tempo"),
+    _audio("jitter"),
+    _audio("zero_crossing_rate"),
+    _audio("rms_energy"),
+    _audio("mfcc", "mean"),
+    _audio("gfcc", "mean"),
+    _audio("chroma", "mean")
+])
+
+# Inputs used by aws_full_pipeline (audio + rule violations + tone)
+PIPELINE_V1 = FeatureSchema("pipeline_v1", [
+    _audio("mfcc", "index", 0),
+    _audio("mfcc", "index", 1),
+    _audio("pitch"),
+    _audio("tempo"),
+    _audio("rms_energy"),
+    Feature(path=("rule_violations", "violations"), op="len"),
+    Feature(path=("tone_scores", "positive")),
+    Feature(path=("tone_scores", "negative")),
+    Feature(path=("tone_scores", "neutral"))
+])
+
+# Call "sound" vector for the cross-call similarity index: spectral shape
+# (every MFCC/GFCC/chroma coefficient, every 4th log-mel band) plus prosody
+SIMILARITY_V1 = FeatureSchema("similarity_v1", [
+    *(_audio("mfcc", "index", i) for i in range(13)),
+    *(_audio("gfcc", "index", i) for i in range(13)),
+    *(_audio("chroma", "index", i) for i in range(12)),
+    *(_audio("log_mel_spectrogram", "index", i) for i in range(0, 128, 4)),
+    _audio("pitch"),
+    _audio("pitch_range"),
+    _audio("tempo"),
+    _audio("jitter"),
+    _audio("zero_crossing_rate"),
+    _audio("rms_energy")
+])
+
+SCHEMAS = {s.name: s for s in (AUDIT_V1, PIPELINE_V1, SIMILARITY_V1)}
+DEFAULT_SCHEMA = AUDIT_V1.name
+
+
+def load_schema(path):
+    """
+    Read a schema sidecar file. It may name a built-in schema
+    (``{"name": "pipeline_v1"}``) or define the full feature list.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if "features" in data:
+        return FeatureSchema.from_dict(data)
+    if data.get("name") not in SCHEMAS:
+        raise ValueError(f"Unknown feature schema '{data.get('name')}' in {path}")
+    return SCHEMAS[data["name"]]
+
+
+def save_schema(schema, path):
+    """Write a schema sidecar; ship it next to the model it was trained with."""
+    with open(path, "w") as f:
+        json.dump(schema.to_dict(), f, indent=2)
@@ -0,0 +1,297 @@
+"""
+Per-stage instrumentation for the audit pipelines.
+
+Wrap a step in ``measure_stage("bedrock")`` to record its wall time, CPU time
+(of the calling thread), bytes transferred and how much it raised the process
+peak RSS. Records go to the configured sinks, none by default: a size-rotated
+JSON lines file and/or an in-process Prometheus text endpoint
+(METRICS_SINKS=jsonl,prometheus).
+
+Summarize a JSON lines file:
+
+    python instrumentation.py summarize audit_metrics.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- Metrics Settings ----------------
+METRICS_SINKS = os.getenv("METRICS_SINKS", "")
+METRICS_JSONL = os.getenv("METRICS_JSONL", "audit_metrics.jsonl")
+# The JSON lines file is rotated to <path>.1 (replacing the previous one) at this size
+METRICS_JSONL_MAX_MB = float(os.getenv("METRICS_JSONL_MAX_MB", "50"))
+METRICS_PROMETHEUS_PORT = int(os.getenv("METRICS_PROMETHEUS_PORT", "9108"))
+# Histogram buckets (seconds) for the Prometheus stage duration metric
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Run (audit) the current stage belongs to; copied into stage_graph worker threads
+_current_run = contextvars.ContextVar("audit_run", default={"run_id": None, "pipeline": None})
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageSpan:
+    """Handle yielded by measure_stage; add to ``bytes`` as data moves."""
+
+    def __init__(self, bytes=0):
+        self.bytes = bytes
+
+
+# ---------------- Sinks ----------------
+class JsonlSink:
+    """Appends one JSON record per line, rotating the file once it reaches ``max_mb``."""
+
+    def __init__(self, path=METRICS_JSONL, max_mb=METRICS_JSONL_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+                full = self.max_bytes is not None and f.tell() >= self.max_bytes
+            if full:
+                os.replace(self.path, f"{self.path}.1")
+
+
+class PrometheusSink:
+    """
+    Aggregates records into Prometheus counters and a duration histogram per
+    (pipeline, stage). ``render()`` returns the text exposition format and
+    ``serve(port)`` exposes it on /metrics from a daemon thread.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+        self._peak_rss = 0.0
+        self._server = None
+
+    def emit(self, record):
+        key = (record.get("pipeline") or "", record["stage"])
+        with self._lock:
+            s = self._series.setdefault(key, {
+                "count": 0, "errors": 0, "wall": 0.0, "cpu": 0.0, "bytes": 0,
+                "buckets": [0] * len(self.buckets)
+            })
+            s["count"] += 1
+            s["errors"] += 0 if record["ok"] else 1
+            s["wall"] += record["wall_seconds"]
+            s["cpu"] += record["cpu_seconds"]
+            s["bytes"] += record["bytes"]
+            for i, bound in enumerate(self.buckets):
+                if record["wall_seconds"] <= bound:
+                    s["buckets"][i] += 1
+            self._peak_rss = max(self._peak_rss, record["peak_rss_mb"])
+
+    def render(self):
+        lines = [
+            "# TYPE audit_stage_seconds histogram",
+            "# TYPE audit_stage_cpu_seconds_total counter",
+            "# TYPE audit_stage_bytes_total counter",
+            "# TYPE audit_stage_errors_total counter",
+            "# TYPE audit_peak_rss_megabytes gauge"
+        ]
+        with self._lock:
+            for (pipeline, stage), s in sorted(self._series.items()):
+                labels = f'pipeline="{pipeline}",stage="{stage}"'
+                for bound, count in zip(self.buckets, s["buckets"]):
+                    lines.append(f'audit_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'audit_stage_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+                lines.append(f"audit_stage_seconds_sum{{{labels}}} {s['wall']}")
+                lines.append(f"audit_stage_seconds_count{{{labels}}} {s['count']}")
+                lines.append(f"audit_stage_cpu_seconds_total{{{labels}}} {s['cpu']}")
+                lines.append(f"audit_stage_bytes_total{{{labels}}} {s['bytes']}")
+                lines.append(f"audit_stage_errors_total{{{labels}}} {s['errors']}")
+            if self._series:
+                lines.append(f"audit_peak_rss_megabytes {self._peak_rss}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=METRICS_PROMETHEUS_PORT):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[INFO] Prometheus metrics on http://localhost:{self._server.server_port}/metrics")
+        return self._server
+
+
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+def get_sinks():
+    """Sinks configured by METRICS_SINKS, created on first use."""
+    global _sinks
+    with _sinks_lock:
+        if _sinks is None:
+            _sinks = []
+            names = {n.strip() for n in METRICS_SINKS.split(",") if n.strip()}
+            if "jsonl" in names:
+                _sinks.append(JsonlSink())
+            if "prometheus" in names:
+                sink = PrometheusSink()
+                try:
+                    sink.serve()
+                except OSError as e:
+                    print(f"[WARN] Could not start metrics endpoint: {e}")
+                _sinks.append(sink)
+        return _sinks
+
+
+def set_sinks(sinks):
+    """Replace the configured sinks (e.g. a PrometheusSink you serve yourself)."""
+    global _sinks
+    with _sinks_lock:
+        _sinks = list(sinks)
+
+
+# ---------------- Recording ----------------
+@contextmanager
+def audit_run(run_id, pipeline):
+    """Tag every stage measured inside this block with the run id and pipeline."""
+    token = _current_run.set({"run_id": run_id, "pipeline": pipeline})
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def measure_stage(stage, bytes=0):
+    """
+    Time one stage and emit its record, also when the stage raises. CPU time
+    is the calling thread's, so work inside other processes is not included.
+
+    ``peak_rss_mb`` is the process's lifetime peak; ``rss_growth_mb`` is how
+    much this stage raised it (0 once an earlier, larger stage set the peak,
+    and shared with stages running concurrently in other threads).
+    """
+    span = StageSpan(bytes)
+    run = _current_run.get()
+    wall0, cpu0, rss0 = time.perf_counter(), time.thread_time(), _peak_rss_mb()
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        peak = _peak_rss_mb()
+        record = {
+            "ts": time.time(),
+            "run_id": run["run_id"],
+            "pipeline": run["pipeline"],
+            "stage": stage,
+            "wall_seconds": round(time.perf_counter() - wall0, 6),
+            "cpu_seconds": round(time.thread_time() - cpu0, 6),
+            "bytes": span.bytes,
+            "peak_rss_mb": peak,
+            "rss_growth_mb": round(peak - rss0, 1),
+            "ok": error is None,
+            "error": error
+        }
+        for sink in get_sinks():
+            try:
+                sink.emit(record)
+            except Exception as e:
+                print(f"[WARN] Metrics sink {type(sink).__name__} failed: {e}")
+
+
+# ---------------- Summary CLI ----------------
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(records):
+    """Per (pipeline, stage): count, errors, wall p50/p95/p99, mean CPU, bytes, max RSS growth."""
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r.get("pipeline") or "-", r["stage"])].append(r)
+    summary = []
+    for (pipeline, stage), rs in sorted(groups.items()):
+        walls = sorted(r["wall_seconds"] for r in rs)
+        summary.append({
+            "pipeline": pipeline,
+            "stage": stage,
+            "count": len(rs),
+            "errors": sum(1 for r in rs if not r["ok"]),
+            "p50": _percentile(walls, 50),
+            "p95": _percentile(walls, 95),
+            "p99": _percentile(walls, 99),
+            "cpu_mean": sum(r["cpu_seconds"] for r in rs) / len(rs),
+            "bytes": sum(r["bytes"] for r in rs),
+            "rss_growth_mb": max(r.get("rss_growth_mb", 0.0) for r in rs)
+        })
+    return summary
+
+
+def read_records(path, run_prefix=None):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if run_prefix:
+        records = [r for r in records if (r.get("run_id") or "").startswith(run_prefix)]
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit pipeline stage metrics.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("summarize", help="p50/p95/p99 per stage from a JSON lines file")
+    s.add_argument("path", nargs="?", default=METRICS_JSONL)
+    s.add_argument("--run-prefix", default=None, help="Only runs whose id starts with this")
+    s.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = summarize(read_records(args.path, args.run_prefix))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{'pipeline':<18} {'stage':<20} {'n':>6} {'err':>4} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'cpu':>8} {'MB moved':>9} {'+rss MB':>7}")
+    for row in summary:
+        print(f"{row['pipeline']:<18} {row['stage']:<20} {row['count']:>6} {row['errors']:>4} "
+              f"{row['p50']:>8.3f}s {row['p95']:>8.3f}s {row['p99']:>8.3f}s {row['cpu_mean']:>7.3f}s "
+              f"{row['bytes'] / 1e6:>9.2f} {row['rss_growth_mb']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Persistent, SQLite-backed queue of audit jobs shared by the dashboard (which
+enqueues) and audit_worker processes (which claim and run them).
+
+Higher ``priority`` runs first, then oldest first. A failed job is retried
+with exponential backoff until ``max_attempts`` is reached. A running job
+records its worker's host and pid and a heartbeat; when that process is gone
+(or, on another host, the heartbeat stops) the job is requeued.
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from transcribe_poller import jittered
+
+load_dotenv()
+
+# ---------------- Queue Settings ----------------
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "audit_jobs.db")
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "10"))
+RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+# Workers refresh their running job's heartbeat this often (seconds)
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+# A running job without a heartbeat for this long is assumed lost with its worker
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "120"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    worker_host TEXT,
+    worker_pid INTEGER,
+    heartbeat_at REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, run_after, id);
+"""
+# Columns added after the first release, for queue files created before them
+ADDED_COLUMNS = {"worker_host": "TEXT", "worker_pid": "INTEGER", "heartbeat_at": "REAL"}
+
+
+def retry_delay(attempts, base=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Backoff before the next attempt: base * 2^(attempts-1), capped and jittered."""
+    return jittered(min(max_delay, base * 2 ** max(0, attempts - 1)))
+
+
+def pid_alive(pid):
+    """Whether a process with ``pid`` exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _row(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    """
+    Each call opens a short-lived connection, so one JobQueue can be used from
+    any thread or process. Claims run in an IMMEDIATE transaction, so two
+    workers never get the same job.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            # WAL lets the dashboard read job status while workers write
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self, immediate=False):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, payload, priority=0, max_attempts=MAX_ATTEMPTS):
+        """Add a job; returns its id."""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO jobs (status, priority, payload, max_attempts, run_after, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (QUEUED, priority, json.dumps(payload), max_attempts, now, now, now)
+            )
+            return cur.lastrowid
+
+    def claim(self, worker, pid=None, host=None):
+        """
+        Mark the next ready job running for ``worker`` and return it (None if
+        idle). The claiming process (``pid`` on ``host``, by default this one)
+        is recorded so the job can be requeued if it dies.
+        """
+        now = time.time()
+        pid = os.getpid() if pid is None else pid
+        host = socket.gethostname() if host is None else host
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND run_after <= ?"
+                " ORDER BY priority DESC, run_after, id LIMIT 1",
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, worker_host = ?,"
+                " worker_pid = ?, heartbeat_at = ?, stage = ?, progress = 0, updated_at = ? WHERE id = ?",
+                (RUNNING, worker, host, pid, now, "starting", now, row["id"])
+            )
+            job = _row(row)
+        job.update(status=RUNNING, attempts=job["attempts"] + 1, worker=worker, worker_host=host,
+                   worker_pid=pid, heartbeat_at=now)
+        return job
+
+    def heartbeat(self, job_id):
+        """Tell the queue the job's worker is still alive."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                         (time.time(), job_id, RUNNING))
+
+    def update_progress(self, job_id, stage, progress):
+        with self._connect() as conn:
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ?, heartbeat_at = ?"
+                " WHERE id = ? AND status = ?",
+                (stage, progress, now, now, job_id, RUNNING)
+            )
+
+    def complete(self, job_id, result=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = 1, error = NULL, result = ?,"
+                " updated_at = ? WHERE id = ?",
+                (DONE, "done", json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """
+        Record a failed attempt: requeue with backoff while attempts remain,
+        otherwise mark the job failed. Returns the new status.
+        """
+        with self._connect(immediate=True) as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            return self._fail(conn, job_id, row, error)
+
+    def _fail(self, conn, job_id, row, error):
+        now = time.time()
+        if row["attempts"] < row["max_attempts"]:
+            status, run_after = QUEUED, now + retry_delay(row["attempts"])
+        else:
+            status, run_after = FAILED, now
+        conn.execute(
+            "UPDATE jobs SET status = ?, run_after = ?, error = ?, worker = NULL, worker_pid = NULL,"
+            " updated_at = ? WHERE id = ?",
+            (status, run_after, error, now, job_id)
+        )
+        return status
+
+    def requeue_stale(self, stale_after=STALE_AFTER, host=None):
+        """
+        Return running jobs whose worker is gone to the queue (counts as a
+        failed attempt): on this host as soon as its process no longer
+        exists, on any host once its heartbeat is older than ``stale_after``
+        seconds.
+        """
+        host = socket.gethostname() if host is None else host
+        cutoff = time.time() - stale_after
+        requeued = 0
+        with self._connect(immediate=True) as conn:
+            rows = conn.execute(
+                "SELECT id, attempts, max_attempts, worker_host, worker_pid,"
+                " COALESCE(heartbeat_at, updated_at) AS seen FROM jobs WHERE status = ?",
+                (RUNNING,)
+            ).fetchall()
+            for row in rows:
+                local = row["worker_host"] == host and row["worker_pid"] is not None
+                if local and not pid_alive(row["worker_pid"]):
+                    reason = f"worker process {row['worker_pid']} exited"
+                elif row["seen"] < cutoff:
+                    reason = "worker stopped responding"
+                else:
+                    continue
+                self._fail(conn, row["id"], row, reason)
+                requeued += 1
+        return requeued
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            return _row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list_jobs(self, status=None, limit=50):
+        """Most recent jobs first, optionally filtered by status."""
+        query, params = "SELECT * FROM jobs", ()
+        if status:
+            query, params = query + " WHERE status = ?", (status,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [_row(r) for r in rows]
+
+    def counts(self):
+        with self._connect() as conn:
+            return {r["status"]: r["n"] for r in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            )}
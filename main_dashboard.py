@@ -1,15 +1,16 @@
 import streamlit as st
 import base64
-import json
 import datetime
 import os
+import uuid
 import pandas as pd
 import plotly.express as px
 import numpy as np
 
 # ---------------- Local Imports ----------------
 from auth_utils import login, check_login, logout, signup
-from mongo_connector import save_report, get_reports_for_agent
+from mongo_connector import list_report_dates, list_report_summaries, get_report
+from job_queue import JobQueue
 
 # ---------------- Streamlit Config ----------------
 st.set_page_config(
@@ -18,15 +19,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# ---------------- Caching ----------------
+# Streamlit reruns this script on every interaction; listings and reports are
+# cached for this many seconds and cleared as soon as one of the session's
+# uploads has finished (checked on both pages)
+CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+# Interactive uploads jump ahead of queued batch work
+UPLOAD_PRIORITY = int(os.getenv("UPLOAD_JOB_PRIORITY", "10"))
+
 # ---------------- Background Image Setup ----------------
-def get_base64_image(path):
+@st.cache_resource
+def get_base64_image(path, mtime=None):
+    # Read and encoded once per process (and again only if the file changes)
     with open(path, "rb") as f:
         data = f.read()
     return base64.b64encode(data).decode()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 bg_image_path = os.path.join(BASE_DIR, "static", "tiger.JPG")
-bg_image = get_base64_image(bg_image_path)
+bg_image = get_base64_image(bg_image_path, os.path.getmtime(bg_image_path))
 
 st.markdown(f"""
     <style>
@@ -54,6 +65,117 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
+# ---------------- Cached Data & Figures ----------------
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_report_dates(agent_name):
+    return list_report_dates(agent_name)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_report_files(agent_name, date):
+    # Summaries only, paged through the index
+    files, cursor = [], None
+    while True:
+        page_items, cursor = list_report_summaries(agent_name, date=date, cursor=cursor)
+        files.extend(item["file_name"] for item in page_items)
+        if cursor is None:
+            break
+    return sorted(set(files))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=200)
+def cached_report(agent_name, date, file_name):
+    return get_report(agent_name, date, file_name)
+
+
+# Figures are keyed by the report they are drawn from, so switching back to a
+# report already viewed reuses them
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=200)
+def probability_figure(agent_name, date, file_name):
+    compliance = cached_report(agent_name, date, file_name).get("classification", {})
+    status = compliance.get("status", "Unknown")
+    conf = compliance.get("confidence", 0)
+    prob_df = pd.DataFrame({
+        "Class": ["Compliant", "Non-Compliant"],
+        "Probability": [conf if status == "Compliant" else 1 - conf,
+                         1 - conf if status == "Compliant" else conf]
+    })
+    fig_prob = px.bar(prob_df, x="Class", y="Probability", color="Class", text="Probability",
+                      title="📊 Classification Probabilities")
+    fig_prob.update_traces(texttemplate='%{y:.2f}', textposition='outside')
+    return fig_prob
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=200)
+def voice_profile_figure(agent_name, date, file_name):
+    audio_features = cached_report(agent_name, date, file_name).get("audio_features", {})
+    feature_names = ["pitch", "pitch_range", "tempo", "jitter", "zero_crossing_rate", "rms_energy"]
+    values = [audio_features.get(f, 0) for f in feature_names]
+    max_val = max(values) if max(values) != 0 else 1
+    norm_values = [v / max_val for v in values]
+
+    radar_data = pd.DataFrame({"Feature": feature_names, "Value": norm_values})
+    return px.line_polar(radar_data, r='Value', theta='Feature',
+                         line_close=True, title="🎙️ Voice Feature Profile (Normalized)",
+                         markers=True)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=200)
+def sentiment_figure(agent_name, date, file_name):
+    tone_scores = cached_report(agent_name, date, file_name).get("tone_scores", {})
+    if not tone_scores:
+        return None
+    pie_df = pd.DataFrame(tone_scores.items(), columns=["Sentiment", "Score"])
+    return px.pie(pie_df, names="Sentiment", values="Score", title="🗣️ Sentiment Distribution")
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=200)
+def mfcc_figure(agent_name, date, file_name):
+    mfcc = cached_report(agent_name, date, file_name).get("audio_features", {}).get("mfcc", [])
+    if not mfcc:
+        return None
+    top_n = min(len(mfcc), 5)
+    mfcc_df = pd.DataFrame({"MFCC Index": list(range(top_n)), "Value": mfcc[:top_n]})
+    return px.bar(mfcc_df, x="MFCC Index", y="Value", title="🎵 Top MFCC Components")
+
+
+def clear_report_caches():
+    """Drop cached listings, reports and figures (a new report was just saved)."""
+    for cached in (cached_report_dates, cached_report_files, cached_report,
+                   probability_figure, voice_profile_figure, sentiment_figure, mfcc_figure):
+        cached.clear()
+
+
+def refresh_after_finished_jobs(job_ids):
+    """Clear the report caches once any tracked job finished since the last check."""
+    seen = st.session_state.setdefault("seen_jobs", set())
+    pending = [job_id for job_id in job_ids if job_id not in seen]
+    if not pending:
+        return
+    queue = get_job_queue()
+    finished = [job_id for job_id in pending if (queue.get(job_id) or {}).get("status") == "done"]
+    if finished:
+        seen.update(finished)
+        clear_report_caches()
+
+
+def chart_section(label, key, build, *args, shown=False):
+    """
+    Draw a chart only while its section is switched on. Streamlit runs the body
+    of a collapsed expander anyway, so a checkbox (remembered across reruns)
+    gates the figure work instead; ``shown`` sets its initial state.
+    """
+    if st.checkbox(label, value=shown, key=key):
+        fig = build(*args)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+
+
 # ---------------- Authentication ----------------
 if not check_login():
     option = st.sidebar.radio("🔐 Authentication", ["Login", "Signup"])
@@ -78,56 +200,80 @@ elif page == "Upload & Analyze":
     date_str = st.date_input("📅 Select Call Date", value=datetime.date.today())
     uploaded_file = st.file_uploader("🎧 Upload MP3/WAV/M4A Call Recording", type=["mp3", "wav", "m4a"])
 
-    if uploaded_file:
-        # Save file locally
-        audio_dir = "uploaded_calls"
-        os.makedirs(audio_dir, exist_ok=True)
-        file_path = os.path.join(audio_dir, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.read())
-        st.success(f"Uploaded: {uploaded_file.name}")
-
-        # Run call audit pipeline
-        st.info("Running call analysis...")
-        from aws_call_audit import generate_full_audit
-        generate_full_audit(audio_path=file_path)
-
-        if not os.path.exists("report.json"):
-            st.error("❌ Failed to generate report.")
-        else:
-            with open("report.json") as f:
-                report = json.load(f)
-
-            save_report(
-                agent_name=st.session_state["agent_name"],
-                date=str(date_str),
-                file_name=uploaded_file.name,
-                report_data=report
-            )
-            st.success("✅ Report saved to MongoDB.")
-            st.json(report)
+    if uploaded_file and st.session_state.get("last_upload") != (uploaded_file.name, uploaded_file.size):
+        # Save the upload for the worker processes and queue the audit; the
+        # session is free again as soon as the job is recorded. Each upload gets
+        # its own directory, so a later upload with the same name can't replace
+        # the file before its worker reads it (the name is kept for the report)
+        upload_dir = os.path.abspath(os.path.join("uploaded_calls", uuid.uuid4().hex))
+        os.makedirs(upload_dir, exist_ok=True)
+        audio_path = os.path.join(upload_dir, uploaded_file.name)
+        with open(audio_path, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+
+        job_id = get_job_queue().enqueue({
+            "audio_file": audio_path,
+            "agent_name": st.session_state["agent_name"],
+            "call_date": str(date_str)
+        }, priority=UPLOAD_PRIORITY)
+        st.session_state["last_upload"] = (uploaded_file.name, uploaded_file.size)
+        st.session_state.setdefault("jobs", []).insert(0, job_id)
+        st.success(f"Uploaded: {uploaded_file.name} (queued as job #{job_id})")
+
+    # ---------------- Job Status ----------------
+    job_ids = st.session_state.get("jobs", [])
+    refresh_after_finished_jobs(job_ids)
+    if job_ids:
+        st.subheader("🛠️ Analysis Jobs")
+        st.button("🔄 Refresh status")
+        queue = get_job_queue()
+        for job_id in job_ids:
+            job = queue.get(job_id)
+            if job is None:
+                continue
+            name = os.path.basename(job["payload"]["audio_file"])
+            if job["status"] == "done":
+                result = job["result"] or {}
+                report = result.get("report", result)
+                if result.get("mongo_saved") is False:
+                    st.warning(f"⚠️ #{job_id} {name}: audited, but the report could not be saved to MongoDB: "
+                               f"{result.get('mongo_error')}")
+                elif result.get("mongo_saved"):
+                    st.success(f"✅ #{job_id} {name}: report saved to MongoDB.")
+                else:
+                    st.success(f"✅ #{job_id} {name}: audit finished.")
+                with st.expander(f"Report for {name}"):
+                    st.json(report)
+            elif job["status"] == "failed":
+                st.error(f"❌ #{job_id} {name}: failed after {job['attempts']} attempts: "
+                         f"{(job['error'] or '').splitlines()[0]}")
+            elif job["status"] == "running":
+                st.progress(job["progress"], text=f"#{job_id} {name}: {job['stage']}...")
+            else:
+                retry = f" (retry {job['attempts'] + 1})" if job["attempts"] else ""
+                st.info(f"⏳ #{job_id} {name}: waiting for a worker{retry}")
 
 # ---------------- View Reports ----------------
 elif page == "📊 View Reports":
     st.title("📈 View Past Call Reports")
-    reports = get_reports_for_agent(st.session_state["agent_name"])
+    agent_name = st.session_state["agent_name"]
+    # Uploads that finished while on this page must show up in the listings
+    st.button("🔄 Refresh reports")
+    refresh_after_finished_jobs(st.session_state.get("jobs", []))
+    date_options = cached_report_dates(agent_name)
 
-    if not reports:
+    if not date_options:
         st.warning("No reports found.")
     else:
         # --- Date selection
-        date_options = sorted(set(r["date"] for r in reports))
         selected_date = st.selectbox("📆 Select Date", date_options)
 
         # --- File selection
-        files_for_date = sorted(set(r["file_name"] for r in reports if r["date"] == selected_date))
+        files_for_date = cached_report_files(agent_name, selected_date)
         selected_file = st.selectbox("🎧 Select Call File", files_for_date)
 
-        # --- Get matching report
-        report = next(
-            (r["report"] for r in reports if r["date"] == selected_date and r["file_name"] == selected_file),
-            None
-        )
+        # --- Fetch only the selected report
+        report = cached_report(agent_name, selected_date, selected_file)
 
         if report:
             st.subheader("📋 Compliance Summary")
@@ -137,44 +283,15 @@ elif page == "📊 View Reports":
             st.metric("Status", status)
             st.metric("Confidence", f"{conf * 100:.2f} %")
 
-            # --- Classification probability bar
-            prob_df = pd.DataFrame({
-                "Class": ["Compliant", "Non-Compliant"],
-                "Probability": [conf if status == "Compliant" else 1 - conf,
-                                 1 - conf if status == "Compliant" else conf]
-            })
-            fig_prob = px.bar(prob_df, x="Class", y="Probability", color="Class", text="Probability",
-                              title="📊 Classification Probabilities")
-            fig_prob.update_traces(texttemplate='%{y:.2f}', textposition='outside')
-            st.plotly_chart(fig_prob, use_container_width=True)
-
-            # --- Voice Feature Profile (normalized)
-            audio_features = report.get("audio_features", {})
-            feature_names = ["pitch", "pitch_range", "tempo", "jitter", "zero_crossing_rate", "rms_energy"]
-            values = [audio_features.get(f, 0) for f in feature_names]
-            max_val = max(values) if max(values) != 0 else 1
-            norm_values = [v / max_val for v in values]
-
-            radar_data = pd.DataFrame({"Feature": feature_names, "Value": norm_values})
-            fig_radar = px.line_polar(radar_data, r='Value', theta='Feature',
-                                      line_close=True, title="🎙️ Voice Feature Profile (Normalized)",
-                                      markers=True)
-            st.plotly_chart(fig_radar, use_container_width=True)
-
-            # --- Sentiment Pie Chart
-            tone_scores = report.get("tone_scores", {})
-            if tone_scores:
-                pie_df = pd.DataFrame(tone_scores.items(), columns=["Sentiment", "Score"])
-                fig_pie = px.pie(pie_df, names="Sentiment", values="Score", title="🗣️ Sentiment Distribution")
-                st.plotly_chart(fig_pie, use_container_width=True)
-
-            # --- MFCC Top Components
-            mfcc = audio_features.get("mfcc", [])
-            if mfcc:
-                top_n = min(len(mfcc), 5)
-                mfcc_df = pd.DataFrame({"MFCC Index": list(range(top_n)), "Value": mfcc[:top_n]})
-                fig_mfcc = px.bar(mfcc_df, x="MFCC Index", y="Value", title="🎵 Top MFCC Components")
-                st.plotly_chart(fig_mfcc, use_container_width=True)
+            # --- Charts, each computed only when its section is shown
+            key = (agent_name, selected_date, selected_file)
+            chart_section("📊 Classification Probabilities", "show_probabilities", probability_figure, *key,
+                          shown=True)
+            chart_section("🎙️ Voice Feature Profile", "show_voice_profile", voice_profile_figure, *key)
+            if report.get("tone_scores"):
+                chart_section("🗣️ Sentiment Distribution", "show_sentiment", sentiment_figure, *key)
+            if report.get("audio_features", {}).get("mfcc"):
+                chart_section("🎵 Top MFCC Components", "show_mfcc", mfcc_figure, *key)
 
             # --- Rule Violations
             violations = report.get("bedrock_analysis", {}).get("violations", [])
@@ -183,4 +300,4 @@ elif page == "📊 View Reports":
                 st.write(f"Total Violations: {len(violations)}")
                 st.dataframe(pd.DataFrame(violations))
             else:
-                st.success("🎉 No rule violations detected.")
\ No newline at end of file
+                st.success("🎉 No rule violations detected.")
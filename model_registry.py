@@ -0,0 +1,125 @@
+import os
+import time
+import hashlib
+import threading
+from collections import namedtuple
+
+import joblib
+from dotenv import load_dotenv
+
+from feature_schema import SCHEMAS, DEFAULT_SCHEMA, load_schema
+from instrumentation import measure_stage
+
+load_dotenv()
+
+# ---------------- Registry Settings ----------------
+MODEL_PATH = os.getenv("CLASSIFIER_PATH", "call_classifier.pkl")
+# "r" memory-maps the model's numpy arrays (only for uncompressed joblib dumps)
+MMAP_MODE = os.getenv("CLASSIFIER_MMAP_MODE") or None
+# How often (seconds) to stat the model file for hot reloads
+CHECK_INTERVAL = float(os.getenv("CLASSIFIER_CHECK_INTERVAL", "5"))
+
+
+LoadedModel = namedtuple("LoadedModel", ["model", "schema", "version"])
+
+
+def schema_path_for(model_path):
+    """Feature schema sidecar versioned next to the model, e.g. call_classifier.schema.json."""
+    return os.path.splitext(model_path)[0] + ".schema.json"
+
+
+def _file_hash(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Loads a joblib classifier once per process and hot-reloads it when the
+    file changes.
+
+    The model and its feature schema sidecar are stat'ed at most every
+    ``check_interval`` seconds; a changed mtime/size triggers a content hash,
+    and only a changed hash reloads. ``version`` is the first 12 hex chars of
+    that hash, so it covers both the model and the schema it was trained on.
+    Without a sidecar the model is assumed to use the default schema.
+    """
+
+    def __init__(self, path=MODEL_PATH, mmap_mode=MMAP_MODE, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.schema_path = schema_path_for(path)
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self.load_count = 0
+        self._lock = threading.Lock()
+        self._model = None
+        self._schema = None
+        self._hash = None
+        self._stat = None
+        self._checked_at = 0.0
+
+    def _stat_key(self):
+        st = os.stat(self.path)
+        key = (st.st_mtime_ns, st.st_size)
+        if os.path.exists(self.schema_path):
+            sidecar = os.stat(self.schema_path)
+            key += (sidecar.st_mtime_ns, sidecar.st_size)
+        return key
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._model is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and self._model is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            stat = self._stat_key()
+            if not force and self._model is not None and stat == self._stat:
+                return
+            file_hash = _file_hash(self.path, self.schema_path)
+            if force or self._model is None or file_hash != self._hash:
+                print(f"[INFO] Loading classifier from: {self.path}")
+                with measure_stage("model_load", bytes=stat[1]):
+                    self._model = joblib.load(self.path, mmap_mode=self.mmap_mode)
+                self._schema = (load_schema(self.schema_path) if os.path.exists(self.schema_path)
+                                else SCHEMAS[DEFAULT_SCHEMA])
+                self._hash = file_hash
+                self.load_count += 1
+            self._stat = stat
+
+    def get(self):
+        """Current model, reloading first if the file changed."""
+        return self.current().model
+
+    def current(self):
+        """Model, schema and version read together so a concurrent reload can't mix them."""
+        self._refresh()
+        with self._lock:
+            return LoadedModel(self._model, self._schema, self._hash[:12])
+
+    @property
+    def version(self):
+        return self.current().version
+
+    def reload(self):
+        self._refresh(force=True)
+        return self._model
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(path=MODEL_PATH):
+    """Process-wide registry for the classifier at ``path``."""
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = ModelRegistry(path)
+        return _registries[path]
@@ -1,7 +1,16 @@
 import os
-from pymongo import MongoClient
+import json
+import time
+import base64
+import threading
+from bson import ObjectId
+from pymongo import MongoClient, DESCENDING, InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
 
+from array_codec import maybe_encode_report, decode_report
+from instrumentation import measure_stage
+
 # Load environment variables
 load_dotenv()
 
@@ -9,30 +18,291 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB_NAME", "call_audit_db")
 COLLECTION_NAME = os.getenv("MONGO_COLLECTION", "call_reports")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
 
-client = MongoClient(MONGO_URI)
+# The one pooled client for the whole process; every module (reports, users,
+# stats) goes through this connection pool instead of opening its own
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
 db = client[DB_NAME]
 collection = db[COLLECTION_NAME]
 
+# Fields returned by the lightweight listing (no audio feature arrays)
+SUMMARY_PROJECTION = {"date": 1, "file_name": 1, "report.classification.status": 1}
+SUMMARY_SORT = [("date", DESCENDING), ("file_name", DESCENDING), ("_id", DESCENDING)]
 
-def save_report(agent_name, date, file_name, report_data):
+
+def ensure_indexes():
     """
-    Save a report for a specific agent, date, and file name.
-    This will allow multiple files per date without overwriting.
+    Compound index behind every per-agent query: equality on agent_name,
+    then date/file_name/_id for filtering, sorting and cursor pagination
+    (SUMMARY_SORT walks it backwards, with no in-memory sort).
+    """
+    collection.create_index(
+        [("agent_name", 1), ("date", 1), ("file_name", 1), ("_id", 1)],
+        name="agent_date_file_id"
+    )
+    # Superseded by agent_date_file_id (a prefix of it)
+    if "agent_date_file" in collection.index_information():
+        collection.drop_index("agent_date_file")
+    # Upsert key: one document per agent and recording content
+    collection.create_index(
+        [("agent_name", 1), ("audio_hash", 1)],
+        name="agent_audio_hash",
+        unique=True,
+        partialFilterExpression={"audio_hash": {"$exists": True}}
+    )
+
+
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+
+def create_indexes_once(name, create):
     """
+    Run an index setup function the first time this process writes, not at
+    import, so importing (dashboard, CLIs) never waits on an unreachable
+    server. Retried on the next write if it fails.
+    """
+    if name in _indexed:
+        return
+    with _indexed_lock:
+        if name in _indexed:
+            return
+        try:
+            create()
+            _indexed.add(name)
+        except Exception as e:
+            print(f"[WARN] Could not create MongoDB indexes ({name}): {e}")
+
+
+def _record(agent_name, date, file_name, report_data):
     # Ensure report_data is a pure dict (avoid BSON encoding issues)
     if not isinstance(report_data, dict):
         raise ValueError("report_data must be a dictionary")
-
-    # Insert as a new record — do not overwrite
     record = {
         "agent_name": agent_name,
         "date": date,
         "file_name": file_name,
-        "report": report_data
+        "report": maybe_encode_report(report_data)
     }
-    collection.insert_one(record)
+    if report_data.get("audio_hash"):
+        record["audio_hash"] = report_data["audio_hash"]
+    return record
+
+
+def _write_op(record):
+    """Upsert on (agent_name, audio_hash) when the hash is known, else a plain insert."""
+    if "audio_hash" in record:
+        return UpdateOne(
+            {"agent_name": record["agent_name"], "audio_hash": record["audio_hash"]},
+            {"$set": record},
+            upsert=True
+        )
+    return InsertOne(record)
+
+
+def save_report(agent_name, date, file_name, report_data):
+    """
+    Save a report for a specific agent, date, and file name.
+    This will allow multiple files per date without overwriting.
+    Reports carrying an audio_hash are upserted, so saving the same recording
+    again replaces its report instead of storing a duplicate.
+    """
+    from agent_stats import METRICS_PROJECTION
+
+    record = _record(agent_name, date, file_name, report_data)
+    create_indexes_once("reports", ensure_indexes)
+    previous = None
+    with measure_stage("mongo_write"):
+        if "audio_hash" in record:
+            previous = collection.find_one_and_update(
+                {"agent_name": agent_name, "audio_hash": record["audio_hash"]},
+                {"$set": record},
+                projection=METRICS_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        else:
+            collection.insert_one(record)
     print(f"[MONGO] Report saved for agent={agent_name}, date={date}, file={file_name}")
+    _update_stats([record], {(agent_name, record.get("audio_hash")): previous} if previous else None)
+    _update_similarity([record])
+
+
+def _update_stats(records, previous_by_hash=None):
+    """Fold saved reports into the per-agent daily stats; never fails the save itself."""
+    try:
+        from agent_stats import record_calls
+
+        record_calls(records, previous_by_hash)
+    except Exception as e:
+        print(f"[WARN] Could not update agent stats: {e}")
+
+
+def _update_similarity(records):
+    """Add saved reports to the cross-call similarity index; never fails the save itself."""
+    try:
+        from similarity_index import SIMILARITY_INDEX, get_similarity_index
+
+        if not SIMILARITY_INDEX:
+            return
+        get_similarity_index().add(
+            (r["agent_name"], r["date"], r["file_name"], dict(r["report"], audio_hash=r.get("audio_hash")))
+            for r in records
+        )
+    except Exception as e:
+        print(f"[WARN] Could not update similarity index: {e}")
+
+
+class ReportWriter:
+    """
+    Buffered report writer for batch runs.
+
+    Reports are queued and written with one unordered ``bulk_write`` whenever
+    ``max_batch`` are pending or the oldest has waited ``max_delay`` seconds.
+    Use as a context manager (or call ``close``) so the tail is flushed.
+    Each flush also updates the daily stats and the similarity index (when
+    SIMILARITY_INDEX=1).
+
+    A failed write puts its reports back at the head of the queue and is
+    retried with exponential backoff from ``retry_delay`` seconds; after
+    ``max_retries`` consecutive failures they are moved to ``failed`` so the
+    caller can report them.
+    """
+
+    def __init__(self, max_batch=500, max_delay=5.0, target=None, update_stats=None, update_index=None,
+                 max_retries=5, retry_delay=1.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.target = target if target is not None else collection
+        self.update_stats = target is None if update_stats is None else update_stats
+        self.update_index = target is None if update_index is None else update_index
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.metrics = {"reports": 0, "flushes": 0, "write_seconds": 0.0, "errors": 0, "retries": 0}
+        self.failed = []
+        self.last_error = None
+        self._attempts = 0
+        self._retry_at = 0.0
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def add(self, agent_name, date, file_name, report_data):
+        record = _record(agent_name, date, file_name, report_data)
+        with self._lock:
+            self._pending.append(record)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_batch and time.monotonic() >= self._retry_at
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every pending report; returns how many were written (never raises)."""
+        with self._lock:
+            records, self._pending, self._oldest = self._pending, [], None
+        if not records:
+            return 0
+        create_indexes_once("reports", ensure_indexes)
+        started = time.perf_counter()
+        previous, unwritten = None, []
+        try:
+            previous = self._replaced(records) if self.update_stats else None
+            with measure_stage("mongo_write"):
+                self.target.bulk_write([_write_op(r) for r in records], ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything but the reported operations went through
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            unwritten = [r for i, r in enumerate(records) if i in failed]
+            records = [r for i, r in enumerate(records) if i not in failed]
+            self._write_failed(unwritten, e)
+        except Exception as e:
+            unwritten, records = records, []
+            self._write_failed(unwritten, e)
+        finally:
+            self.metrics["write_seconds"] += time.perf_counter() - started
+        if not unwritten:
+            with self._lock:
+                self._attempts, self._retry_at = 0, 0.0
+        if not records:
+            return 0
+        self.metrics["reports"] += len(records)
+        self.metrics["flushes"] += 1
+        if self.update_stats:
+            _update_stats(records, previous)
+        if self.update_index:
+            _update_similarity(records)
+        return len(records)
+
+    def _write_failed(self, records, error):
+        """Requeue ``records`` for a backed-off retry, or give up on them after max_retries."""
+        self.metrics["errors"] += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self._attempts += 1
+            if self._attempts > self.max_retries:
+                self.failed.extend(records)
+                self._attempts, self._retry_at = 0, 0.0
+                retry_in = None
+            else:
+                self._pending[:0] = records
+                self._oldest = self._oldest or time.monotonic()
+                retry_in = self.retry_delay * 2 ** (self._attempts - 1)
+                self._retry_at = time.monotonic() + retry_in
+                self.metrics["retries"] += 1
+        if retry_in is None:
+            print(f"[WARN] Giving up on {len(records)} reports after {self.max_retries} retries: {self.last_error}")
+        else:
+            print(f"[WARN] Bulk report write failed ({len(records)} reports), retrying in {retry_in:.1f}s: "
+                  f"{self.last_error}")
+
+    def _replaced(self, records):
+        """Stored documents the upserts in ``records`` are about to replace."""
+        from agent_stats import METRICS_PROJECTION
+
+        keys = [{"agent_name": r["agent_name"], "audio_hash": r["audio_hash"]}
+                for r in records if "audio_hash" in r]
+        if not keys:
+            return {}
+        docs = self.target.find({"$or": keys}, dict(METRICS_PROJECTION, audio_hash=1))
+        return {(d["agent_name"], d["audio_hash"]): d for d in docs}
+
+    def _flush_periodically(self):
+        while not self._closed.wait(min(1.0, self.max_delay)):
+            with self._lock:
+                now = time.monotonic()
+                due = self._oldest is not None and now - self._oldest >= self.max_delay and now >= self._retry_at
+            if due:
+                self.flush()
+
+    def stats(self):
+        seconds = self.metrics["write_seconds"]
+        return dict(self.metrics, failed_reports=len(self.failed), last_error=self.last_error,
+                    reports_per_sec=round(self.metrics["reports"] / seconds, 1) if seconds else 0.0)
+
+    def close(self):
+        """Flush the tail, waiting out retries; never raises (unwritten reports stay in ``failed``)."""
+        self._closed.set()
+        while True:
+            self.flush()
+            with self._lock:
+                if not self._pending:
+                    break
+                wait = max(0.0, self._retry_at - time.monotonic())
+            time.sleep(wait)
+        print(f"[MONGO] Report writer closed: {self.stats()}")
+        if self.failed:
+            print(f"[WARN] {len(self.failed)} reports could not be written to MongoDB")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def get_reports_for_agent(agent_name):
@@ -46,15 +316,85 @@ def get_reports_for_agent(agent_name):
         results.append({
             "date": r.get("date"),
             "file_name": r.get("file_name"),
-            "report": r.get("report")
+            "report": decode_report(r.get("report"))
         })
     return results
 
 
+def _encode_cursor(doc):
+    raw = json.dumps([doc.get("date"), doc.get("file_name"), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    date, file_name, oid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return date, file_name, ObjectId(oid)
+
+
+def list_report_summaries(agent_name, date=None, limit=50, cursor=None):
+    """
+    One page of report summaries (date, file_name, status) for an agent,
+    newest first, without loading the report bodies.
+
+    Returns ``(items, next_cursor)``; pass ``next_cursor`` back to get the next
+    page, it is None on the last page.
+    """
+    query = {"agent_name": agent_name}
+    if date is not None:
+        query["date"] = date
+    if cursor:
+        last_date, last_file, last_id = _decode_cursor(cursor)
+        query["$or"] = [
+            {"date": {"$lt": last_date}},
+            {"date": last_date, "file_name": {"$lt": last_file}},
+            {"date": last_date, "file_name": last_file, "_id": {"$lt": last_id}}
+        ]
+
+    docs = list(collection.find(query, SUMMARY_PROJECTION).sort(SUMMARY_SORT).limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    items = [
+        {
+            "date": d.get("date"),
+            "file_name": d.get("file_name"),
+            "status": (d.get("report") or {}).get("classification", {}).get("status")
+        }
+        for d in docs
+    ]
+    next_cursor = _encode_cursor(docs[-1]) if has_more else None
+    return items, next_cursor
+
+
+def list_report_dates(agent_name):
+    """Distinct report dates for an agent, newest first (answered from the index)."""
+    return sorted(collection.distinct("date", {"agent_name": agent_name}), reverse=True)
+
+
+def get_report(agent_name, date, file_name):
+    """
+    Fetch the full report for one selected file (latest if saved more than once).
+    Arrays stored in the compact binary form are decoded back to lists.
+    """
+    doc = collection.find_one(
+        {"agent_name": agent_name, "date": date, "file_name": file_name},
+        {"report": 1},
+        sort=[("_id", DESCENDING)]
+    )
+    return decode_report(doc.get("report")) if doc else None
+
+
 def delete_reports_for_agent(agent_name):
     """
     Deletes all reports for a given agent.
     Useful for testing or resetting.
     """
     result = collection.delete_many({"agent_name": agent_name})
+    db[os.getenv("MONGO_STATS_COLLECTION", "agent_daily_stats")].delete_many({"agent_name": agent_name})
+    try:
+        from similarity_index import SIMILARITY_INDEX, get_similarity_index
+
+        if SIMILARITY_INDEX:
+            get_similarity_index().remove_agent(agent_name)
+    except Exception as e:
+        print(f"[WARN] Could not update similarity index: {e}")
     print(f"[MONGO] Deleted {result.deleted_count} reports for agent={agent_name}")
\ No newline at end of file
@@ -1,20 +1,20 @@
-from pymongo import MongoClient
-import os
+# Backwards-compatible helpers; everything goes through mongo_connector's
+# shared client and its agent_name/file_name document layout.
+from mongo_connector import collection, save_report as _save_report
+from array_codec import decode_report
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["call_audit_db"]
 
 def save_report(agent, date, filename, report_dict):
-    collection = db["call_reports"]
-    collection.insert_one({
-        "agent": agent,
-        "date": date,
-        "filename": filename,
-        "report": report_dict
-    })
+    _save_report(agent_name=agent, date=date, file_name=filename, report_data=report_dict)
+
+
+def _decoded(docs):
+    return [dict(d, report=decode_report(d.get("report"))) for d in docs]
+
 
 def get_reports_by_agent(agent):
-    return list(db["call_reports"].find({"agent": agent}))
+    return _decoded(collection.find({"agent_name": agent}))
+
 
 def get_reports_by_agent_and_date(agent, date):
-    return list(db["call_reports"].find({"agent": agent, "date": date}))
\ No newline at end of file
+    return _decoded(collection.find({"agent_name": agent, "date": date}))
@@ -0,0 +1,334 @@
+"""
+Block-parallel audio feature extraction.
+
+The recording is decoded and resampled to mono exactly once, into a float32
+file that worker processes memory-map. The signal is cut into fixed-size
+blocks and every (feature family, block) pair is an independent task in a
+process pool; each task returns additive statistics (sums, counts, min/max)
+that are merged into the final values. Peak memory is therefore bounded by
+the block size, not the call length.
+
+The result has the same keys, order and shapes as the ``audio_features`` dict
+stored in reports (see report.json). The values are close to, but not the
+same as, audio_features.py's (fixed chroma tuning, YIN pitch on voiced frames),
+so results are cached per extractor; benchmarks/bench_features.py --reference
+reports the per-feature differences.
+"""
+import os
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.fft import dct, rfft, irfft, next_fast_len
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- Extraction Settings ----------------
+SAMPLE_RATE = int(os.getenv("FEATURE_SAMPLE_RATE", "22050"))
+BLOCK_SECONDS = float(os.getenv("FEATURE_BLOCK_SECONDS", "30"))
+FEATURE_WORKERS = int(os.getenv("FEATURE_WORKERS", str(min(4, os.cpu_count() or 1))))
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 13
+N_GAMMATONE = 64
+N_GFCC = 13
+SCALOGRAM_WIDTHS = np.arange(1, 128)
+# The scalogram is computed on a decimated signal; fine scales above this
+# rate carry no speech information worth the convolution cost
+SCALOGRAM_DECIMATE = 8
+PITCH_FMIN, PITCH_FMAX = 50.0, 2000.0
+# Frames quieter than this RMS are treated as unvoiced for pitch and jitter
+VOICED_MIN_RMS = 0.01
+
+FAMILIES = ("spectral", "temporal", "pitch", "gfcc", "scalogram")
+
+
+# ---------------- Decode Once ----------------
+def decode_to_file(audio_path, out_path, sr=SAMPLE_RATE):
+    """
+    Decode ``audio_path`` to mono float32 at ``sr`` and write the raw samples to
+    ``out_path``. Uses a streaming ffmpeg pipe when available (constant memory),
+    otherwise librosa. Returns the number of samples.
+    """
+    if shutil.which("ffmpeg"):
+        cmd = ["ffmpeg", "-v", "error", "-i", audio_path, "-ac", "1", "-ar", str(sr), "-f", "f32le", "-"]
+        written = 0
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc, open(out_path, "wb") as out:
+            for chunk in iter(lambda: proc.stdout.read(1024 * 1024), b""):
+                out.write(chunk)
+                written += len(chunk)
+        if proc.returncode == 0:
+            return written // 4
+        print(f"[WARN] ffmpeg could not decode {audio_path}; falling back to librosa")
+
+    import librosa
+
+    y, _ = librosa.load(audio_path, sr=sr, mono=True)
+    y.astype(np.float32).tofile(out_path)
+    return len(y)
+
+
+def _block_bounds(n_samples, sr, block_seconds):
+    # Blocks are whole multiples of the hop so frame grids line up across blocks
+    block = max(HOP_LENGTH, int(block_seconds * sr) // HOP_LENGTH * HOP_LENGTH)
+    return [(start, min(start + block, n_samples)) for start in range(0, n_samples, block)]
+
+
+# ---------------- Filterbanks ----------------
+@lru_cache(maxsize=4)
+def _mel_basis(sr):
+    import librosa
+
+    return librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=N_MELS)
+
+
+@lru_cache(maxsize=4)
+def _gammatone_basis(sr):
+    """Magnitude responses of 4th-order gammatone filters on ERB-spaced centers."""
+    freqs = np.linspace(0, sr / 2, N_FFT // 2 + 1)
+    erb_lo, erb_hi = (21.4 * np.log10(1 + 0.00437 * f) for f in (50.0, sr / 2 * 0.9))
+    centers = (10 ** (np.linspace(erb_lo, erb_hi, N_GAMMATONE) / 21.4) - 1) / 0.00437
+    bandwidth = 1.019 * 24.7 * (4.37e-3 * centers + 1)
+    return (1 + ((freqs[None, :] - centers[:, None]) / bandwidth[:, None]) ** 2) ** -2.0
+
+
+def _ricker(points, width):
+    t = np.arange(points) - (points - 1) / 2
+    a = t / width
+    return (2 / (np.sqrt(3 * width) * np.pi ** 0.25)) * (1 - a ** 2) * np.exp(-a ** 2 / 2)
+
+
+# ---------------- Per-Block Statistics ----------------
+def _power_spectrogram(y):
+    import librosa
+
+    return np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+
+
+def _spectral(y, sr):
+    import librosa
+
+    power = _power_spectrogram(y)
+    mel = _mel_basis(sr) @ power
+    log_mel = librosa.power_to_db(mel, top_db=None)
+    mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=N_MFCC)
+    # Fixed tuning: per-block tuning estimates would make blocks disagree
+    chroma = librosa.feature.chroma_stft(S=power, sr=sr, tuning=0.0)
+    return {
+        "frames": mel.shape[1],
+        "mel": mel.sum(axis=1),
+        "log_mel": log_mel.sum(axis=1),
+        "mfcc": mfcc.sum(axis=1),
+        "chroma": chroma.sum(axis=1)
+    }
+
+
+def _temporal(y, sr):
+    import librosa
+
+    zcr = librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    rms = librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    onset = librosa.onset.onset_strength(y=y, sr=sr, hop_length=HOP_LENGTH)
+    return {"frames": len(zcr), "zcr": float(zcr.sum()), "rms": float(rms.sum()), "onset": onset}
+
+
+def _pitch(y, sr):
+    import librosa
+
+    f0 = librosa.yin(y, fmin=PITCH_FMIN, fmax=PITCH_FMAX, sr=sr, frame_length=N_FFT, hop_length=HOP_LENGTH)
+    rms = librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH)[0][:len(f0)]
+    f0 = f0[:len(rms)][rms >= VOICED_MIN_RMS]
+    if not len(f0):
+        return {"n": 0}
+    periods = 1.0 / f0
+    return {
+        "n": len(f0),
+        "f0_sum": float(f0.sum()),
+        "f0_min": float(f0.min()),
+        "f0_max": float(f0.max()),
+        "period_sum": float(periods.sum()),
+        "period_diff_sum": float(np.abs(np.diff(periods)).sum()),
+        "first_period": float(periods[0]),
+        "last_period": float(periods[-1])
+    }
+
+
+def _gfcc(y, sr):
+    energies = _gammatone_basis(sr) @ _power_spectrogram(y)
+    coeffs = dct(np.cbrt(energies), type=2, axis=0, norm="ortho")[:N_GFCC]
+    return {"frames": coeffs.shape[1], "gfcc": coeffs.sum(axis=1)}
+
+
+@lru_cache(maxsize=8)
+def _ricker_spectra(size, n):
+    """FFTs of every scalogram kernel at one transform size (same for all full blocks)."""
+    return [rfft(_ricker(min(10 * width, n), width), size) for width in SCALOGRAM_WIDTHS]
+
+
+def _scalogram(y, sr):
+    y = y[::SCALOGRAM_DECIMATE]
+    sums = np.zeros(len(SCALOGRAM_WIDTHS))
+    if not len(y):
+        return {"n": 0, "scalogram": sums}
+    # One forward transform of the block, one inverse per width
+    longest = min(10 * int(SCALOGRAM_WIDTHS[-1]), len(y))
+    size = next_fast_len(len(y) + longest - 1, real=True)
+    spectrum = rfft(y, size)
+    for i, (width, kernel) in enumerate(zip(SCALOGRAM_WIDTHS, _ricker_spectra(size, len(y)))):
+        start = (min(10 * int(width), len(y)) - 1) // 2
+        conv = irfft(spectrum * kernel, size)
+        sums[i] = np.abs(conv[start:start + len(y)]).sum()
+    return {"n": len(y), "scalogram": sums}
+
+
+BLOCK_FUNCTIONS = {
+    "spectral": _spectral,
+    "temporal": _temporal,
+    "pitch": _pitch,
+    "gfcc": _gfcc,
+    "scalogram": _scalogram
+}
+
+
+def _run_block(family, samples_path, start, end, sr):
+    """Worker task: memory-map the decoded samples and reduce one block."""
+    samples = np.memmap(samples_path, dtype=np.float32, mode="r")
+    y = np.array(samples[start:end])
+    del samples
+    return family, BLOCK_FUNCTIONS[family](y, sr)
+
+
+# ---------------- Merging ----------------
+def _merge(family, parts):
+    """Combine a family's per-block statistics (in block order)."""
+    if family in ("spectral", "gfcc"):
+        merged = {"frames": sum(p["frames"] for p in parts)}
+        for key in parts[0]:
+            if key != "frames":
+                merged[key] = np.sum([p[key] for p in parts], axis=0)
+        return merged
+    if family == "temporal":
+        return {
+            "frames": sum(p["frames"] for p in parts),
+            "zcr": sum(p["zcr"] for p in parts),
+            "rms": sum(p["rms"] for p in parts),
+            "onset": np.concatenate([p["onset"] for p in parts])
+        }
+    if family == "pitch":
+        voiced = [p for p in parts if p["n"]]
+        if not voiced:
+            return {"n": 0}
+        diff_sum = sum(p["period_diff_sum"] for p in voiced)
+        # Period changes across block boundaries
+        diff_sum += sum(abs(b["first_period"] - a["last_period"]) for a, b in zip(voiced, voiced[1:]))
+        return {
+            "n": sum(p["n"] for p in voiced),
+            "f0_sum": sum(p["f0_sum"] for p in voiced),
+            "f0_min": min(p["f0_min"] for p in voiced),
+            "f0_max": max(p["f0_max"] for p in voiced),
+            "period_sum": sum(p["period_sum"] for p in voiced),
+            "period_diff_sum": diff_sum
+        }
+    if family == "scalogram":
+        return {"n": sum(p["n"] for p in parts), "scalogram": np.sum([p["scalogram"] for p in parts], axis=0)}
+    raise ValueError(f"Unknown feature family '{family}'")
+
+
+def _tempo(onset, sr):
+    import librosa
+
+    if not len(onset):
+        return 0.0
+    tempo_fn = getattr(getattr(librosa, "feature", None), "tempo", None) or librosa.beat.tempo
+    return float(tempo_fn(onset_envelope=onset, sr=sr, hop_length=HOP_LENGTH)[0])
+
+
+def _finalize(stats, sr):
+    spectral, temporal, pitch = stats["spectral"], stats["temporal"], stats["pitch"]
+    frames = max(1, spectral["frames"])
+    n_voiced = pitch["n"]
+    mean_period = pitch["period_sum"] / n_voiced if n_voiced else 0.0
+    jitter = (pitch["period_diff_sum"] / (n_voiced - 1)) / mean_period if n_voiced > 1 and mean_period else 0.0
+    scalogram = stats["scalogram"]
+    return {
+        "mel_spectrogram": (spectral["mel"] / frames).tolist(),
+        "log_mel_spectrogram": (spectral["log_mel"] / frames).tolist(),
+        "scalogram": (scalogram["scalogram"] / max(1, scalogram["n"])).tolist(),
+        "pitch": pitch["f0_sum"] / n_voiced if n_voiced else 0.0,
+        "pitch_range": pitch["f0_max"] - pitch["f0_min"] if n_voiced else 0.0,
+        "tempo": _tempo(temporal["onset"], sr),
+        "jitter": jitter,
+        "mfcc": (spectral["mfcc"] / frames).tolist(),
+        "gfcc": (stats["gfcc"]["gfcc"] / max(1, stats["gfcc"]["frames"])).tolist(),
+        "zero_crossing_rate": temporal["zcr"] / max(1, temporal["frames"]),
+        "rms_energy": temporal["rms"] / max(1, temporal["frames"]),
+        "chroma": (spectral["chroma"] / frames).tolist()
+    }
+
+
+# ---------------- Entry Points ----------------
+_pool = None
+
+
+def _get_pool():
+    """
+    The shared process pool, or None inside a daemonic process (e.g. a
+    multiprocessing.Process(daemon=True) worker), which may not have children.
+    """
+    global _pool
+    if multiprocessing.current_process().daemon:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=FEATURE_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the shared pool. A multiprocessing child that started one must call
+    this before returning, or the idle pool workers keep it from exiting.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def extract_audio_features(audio_path, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS, workers=None):
+    """
+    Drop-in replacement for audio_features.extract_audio_features.
+
+    ``workers=1`` runs every task in-process (same blocks, same merge), which
+    is also what happens in a daemonic process that cannot start a pool.
+    """
+    workers = FEATURE_WORKERS if workers is None else workers
+    tmp_dir = tempfile.mkdtemp(prefix="features-")
+    try:
+        samples_path = os.path.join(tmp_dir, "samples.f32")
+        n_samples = decode_to_file(audio_path, samples_path, sr)
+        if not n_samples:
+            raise ValueError(f"No audio decoded from {audio_path}")
+        tasks = [
+            (family, samples_path, start, end, sr)
+            for family in FAMILIES
+            for start, end in _block_bounds(n_samples, sr, block_seconds)
+        ]
+        pool = _get_pool() if workers > 1 else None
+        if pool is not None:
+            results = list(pool.map(_run_block, *zip(*tasks)))
+        else:
+            results = [_run_block(*task) for task in tasks]
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Results come back in task order, i.e. block order within each family
+    parts = {family: [] for family in FAMILIES}
+    for family, part in results:
+        parts[family].append(part)
+    return _finalize({family: _merge(family, p) for family, p in parts.items()}, sr)
@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import bisect
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from transcript_index import TranscriptIndex
+
+# ---------------- Matcher Settings ----------------
+# A transcript with no rule words at all is normally still checked by Bedrock
+# (finding no phrase is not evidence of compliance); "1" accepts it as clean
+TRUST_LOCAL_CLEAN = os.getenv("LOCAL_MATCHER_TRUST_CLEAN", "0") == "1"
+
+# ---------------- Normalization Tables ----------------
+TOKEN_RE = re.compile(r"\d+(?:\.\d+)?|%|[a-z]+")
+
+STOPWORDS = {
+    "a", "an", "the", "of", "at", "to", "your", "you", "will", "be", "is", "are",
+    "uh", "um", "this", "that", "very"
+}
+
+# Every word in a group is rewritten to the group's canonical form, so
+# "definite 100% returns" and "guaranteed 100% return" normalize identically
+SYNONYMS = {
+    "guarantee": ["guarantee", "guaranteed", "guaranty", "definite", "definitely",
+                  "assured", "assure", "certain", "certainly", "sure"],
+    "return": ["return", "returns", "profit", "profits", "gain", "gains", "yield", "yields"],
+    "%": ["%", "percent", "pct"],
+    "riskfree": ["riskless", "riskfree"],
+    "rich": ["rich", "wealthy"],
+    "quick": ["quick", "quickly", "fast"],
+    "information": ["information", "info", "tip", "tips"],
+    "double": ["double", "doubling", "doubled", "twice"]
+}
+CANONICAL = {word: canon for canon, words in SYNONYMS.items() for word in words}
+
+# Words allowed between two rule words ("guaranteed *a* 100% return")
+MAX_GAP = 1
+# Words before a match checked for a negation ("this is *not* a risk-free investment")
+NEGATION_WINDOW = 3
+NEGATIONS = {"not", "no", "never", "cannot", "without", "dont", "doesnt", "isnt", "arent", "wasnt",
+             "wont", "cant", "aint", "nothing", "neither", "nor"}
+# A transcript with this many distinct words of one rule but no full match is ambiguous
+UNCERTAIN_MIN_TOKENS = 2
+
+MATCHER_VERSION = "3"
+
+
+def stem(word):
+    """Very small suffix stripper; enough for plural/tense variants of rule words."""
+    if word in CANONICAL or len(word) <= 4 or word.isdigit():
+        return word
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("ly", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def normalize_word(word):
+    """Canonical token for one raw word, or None when it is a stopword."""
+    word = word.lower()
+    if word in STOPWORDS:
+        return None
+    if word in CANONICAL:
+        return CANONICAL[word]
+    stemmed = stem(word)
+    return CANONICAL.get(stemmed, stemmed)
+
+
+def tokenize(text):
+    """Raw lower-cased tokens of a text (hyphens split, % kept as its own token)."""
+    return TOKEN_RE.findall(text.lower().replace("-", " "))
+
+
+def is_negation(word):
+    """Negations such as "not", "never", "don't" or "isn't" (punctuation ignored)."""
+    word = word.lower().replace("’", "'").strip(".,!?;:\"")
+    return word.endswith("n't") or word.replace("'", "") in NEGATIONS
+
+
+# ---------------- Match Results ----------------
+@dataclass
+class PhraseMatch:
+    rule: str
+    text: str
+    start_word: int
+    end_word: int  # inclusive
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    # Word for word the rule's phrase (no synonyms, stems or gap words)
+    exact: bool = False
+    negated: bool = False
+
+    @property
+    def confirmed(self):
+        return self.exact and not self.negated
+
+    def to_dict(self):
+        return {
+            "rule": self.rule,
+            "text": self.text,
+            "start_word": self.start_word,
+            "end_word": self.end_word,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "source": "local_matcher"
+        }
+
+
+@dataclass
+class Verdict:
+    """Outcome of the local pre-filter: "violation", "clean" or "uncertain"."""
+    decision: str
+    matches: List[PhraseMatch] = field(default_factory=list)
+    partial_rules: List[str] = field(default_factory=list)
+
+    def is_final(self, trust_clean=TRUST_LOCAL_CLEAN):
+        """
+        Whether the verdict can stand without Bedrock: only "clean", and only
+        when explicitly trusted. Confirmed violations are kept but Bedrock
+        still runs, since it finds paraphrases the matcher cannot.
+        """
+        return self.decision == "clean" and trust_clean
+
+    @property
+    def confirmed(self):
+        """Exact, non-negated matches: violations whether or not Bedrock agrees."""
+        return [m for m in self.matches if m.confirmed]
+
+    def as_bedrock_result(self, confirmed_only=False):
+        """Same shape as bedrock_rule_checker.check_violations output."""
+        violations = [m.to_dict() for m in (self.confirmed if confirmed_only else self.matches)]
+        return {
+            "total_violations": len(violations),
+            "violations": violations,
+            "source": "local_matcher"
+        }
+
+    def merge_into(self, result):
+        """
+        Add the confirmed local matches to a Bedrock result, skipping those
+        Bedrock already reported (same rule over the same stretch of time).
+        """
+        result = dict(result or {})
+        violations = list(result.get("violations", []))
+        added = []
+        for m in self.confirmed:
+            if not any(_covers(v, m) for v in violations):
+                added.append(m.to_dict())
+        if added:
+            violations.extend(added)
+            result["violations"] = violations
+            result["total_violations"] = len(violations)
+        return result
+
+
+def _covers(violation, match):
+    """Whether a Bedrock violation names ``match``'s rule and spans its time."""
+    if not isinstance(violation, dict):
+        return str(violation).strip().lower() == match.rule.lower()
+    name = next((str(violation[f]) for f in ("rule", "violation", "phrase") if violation.get(f)), "")
+    if name.strip().lower() != match.rule.lower():
+        return False
+    start, end = violation.get("start_time"), violation.get("end_time")
+    if start is None or end is None or match.start_time is None or match.end_time is None:
+        return True
+    return start <= match.end_time and match.start_time <= end
+
+
+# ---------------- Compiled Matcher ----------------
+class PhraseMatcher:
+    """
+    All forbidden phrases compiled into one regex over the normalized token
+    stream. Built once per rule set; matching a transcript is a single scan.
+    """
+
+    def __init__(self, phrases, max_gap=MAX_GAP):
+        self.phrases = list(phrases)
+        self.rule_tokens = []
+        # Raw rule words without leading/trailing stopwords, for exact checks
+        self.rule_words = []
+        alternatives = []
+        gap = rf"(?: \S+){{0,{max_gap}}}? " if max_gap else " "
+        for i, phrase in enumerate(self.phrases):
+            tokens = [t for t in (normalize_word(w) for w in tokenize(phrase)) if t]
+            self.rule_tokens.append(tokens)
+            raw = tokenize(phrase)
+            while raw and raw[0] in STOPWORDS:
+                raw = raw[1:]
+            while raw and raw[-1] in STOPWORDS:
+                raw = raw[:-1]
+            self.rule_words.append(raw)
+            if tokens:
+                alternatives.append(f"(?P<r{i}>" + gap.join(re.escape(t) for t in tokens) + ")")
+        self.pattern = re.compile(r"(?<!\S)(?:" + "|".join(alternatives) + r")(?!\S)") if alternatives else None
+
+    @classmethod
+    def from_rules_file(cls, path="rules.json"):
+        with open(path) as f:
+            return cls(json.load(f).get("violations", []))
+
+    def _normalize(self, words):
+        """Normalized string plus, per token, its char offset and source word index."""
+        tokens, offsets, origin = [], [], []
+        pos = 0
+        for word_index, word in enumerate(words):
+            for raw in tokenize(word):
+                token = normalize_word(raw)
+                if token is None:
+                    continue
+                tokens.append(token)
+                offsets.append(pos)
+                origin.append(word_index)
+                pos += len(token) + 1
+        return " ".join(tokens), tokens, offsets, origin
+
+    def match_words(self, words, start_times=None, end_times=None):
+        """
+        Match over a word sequence. Times (seconds), when given, are parallel
+        to ``words`` and are copied onto each match.
+        """
+        return self._find(self._normalize(words), words, start_times, end_times)
+
+    def _find(self, normalized, words, start_times, end_times):
+        if self.pattern is None:
+            return []
+        text, _, offsets, origin = normalized
+        matches = []
+        for m in self.pattern.finditer(text):
+            rule_index = int(m.lastgroup[1:])
+            first = origin[bisect.bisect_right(offsets, m.start()) - 1]
+            last = origin[bisect.bisect_right(offsets, m.end() - 1) - 1]
+            span = [t for w in words[first:last + 1] for t in tokenize(w)]
+            window = words[max(0, first - NEGATION_WINDOW):first]
+            matches.append(PhraseMatch(
+                rule=self.phrases[rule_index],
+                text=" ".join(words[first:last + 1]),
+                start_word=first,
+                end_word=last,
+                start_time=start_times[first] if start_times else None,
+                end_time=end_times[last] if end_times else None,
+                exact=span == self.rule_words[rule_index],
+                negated=any(is_negation(w) for w in window)
+            ))
+        return matches
+
+    def match_text(self, text):
+        return self.match_words(text.split())
+
+    def triage(self, words, start_times=None, end_times=None):
+        """
+        Decide locally where possible. Only exact, non-negated matches make a
+        "violation"; fuzzy (synonym, stem, gap word) or negated matches and
+        transcripts sharing several words with a rule are "uncertain";
+        anything else is "clean" (see Verdict.is_final for what skips Bedrock).
+        """
+        normalized = self._normalize(words)
+        matches = self._find(normalized, words, start_times, end_times)
+        if matches:
+            confirmed = all(m.confirmed for m in matches)
+            return Verdict("violation" if confirmed else "uncertain", matches,
+                           partial_rules=[] if confirmed else sorted({m.rule for m in matches if not m.confirmed}))
+        present = set(normalized[1])
+        partial = [
+            phrase for phrase, tokens in zip(self.phrases, self.rule_tokens)
+            if len(present.intersection(tokens)) >= min(UNCERTAIN_MIN_TOKENS, len(set(tokens)))
+        ]
+        return Verdict("uncertain" if partial else "clean", partial_rules=partial)
+
+
+# ---------------- Transcript Helpers ----------------
+def transcript_words(transcript_list):
+    """
+    Flatten a standardized transcript (list of {"speaker", "text", ["words"]})
+    or a TranscriptIndex into words plus optional start/end times.
+    """
+    if isinstance(transcript_list, TranscriptIndex):
+        return transcript_list.tokens, transcript_list.starts, transcript_list.ends
+    words, starts, ends = [], [], []
+    timed = all(entry.get("words") for entry in transcript_list) if transcript_list else False
+    for entry in transcript_list:
+        if timed:
+            for w in entry["words"]:
+                words.append(w["text"])
+                starts.append(w.get("start_time"))
+                ends.append(w.get("end_time"))
+        else:
+            words.extend(entry.get("text", "").split())
+    return words, (starts if timed else None), (ends if timed else None)
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(rules_path="rules.json", fingerprint=""):
+    """Matcher for a rule set, compiled once per (path, rules fingerprint)."""
+    key = (rules_path, fingerprint)
+    with _matchers_lock:
+        if key not in _matchers:
+            _matchers[key] = PhraseMatcher.from_rules_file(rules_path)
+        return _matchers[key]
+
+
+def triage_transcript(transcript_list, rules_path="rules.json", fingerprint=""):
+    words, starts, ends = transcript_words(transcript_list)
+    return get_matcher(rules_path, fingerprint).triage(words, starts, ends)
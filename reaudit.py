@@ -0,0 +1,186 @@
+"""
+Re-audit stored reports after rules.json (or the local matcher) changes.
+
+Every report records the ``rules_version`` it was checked with and its
+transcript. Reports from an older version are re-checked from the stored
+transcript: only violation detection and classification run again (no
+upload, transcription or feature extraction), in parallel batches, and
+each batch is written back with one bulk update.
+
+    python reaudit.py [--agent NAME] [--batch-size 200] [--workers 8] [--dry-run]
+
+Reports saved before transcripts were stored cannot be re-checked this way;
+they are counted and need a full run (batch_audit.py).
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+from mongo_connector import collection
+from array_codec import decode_report
+from transcript_index import TranscriptIndex
+from result_cache import get_result_cache, rules_fingerprint
+from aws_call_audit import detect_violations, classify_many, classification_block, rules_version
+from instrumentation import audit_run, measure_stage
+
+load_dotenv()
+
+# ---------------- Re-audit Settings ----------------
+REAUDIT_BATCH_SIZE = int(os.getenv("REAUDIT_BATCH_SIZE", "200"))
+REAUDIT_WORKERS = int(os.getenv("REAUDIT_WORKERS", "8"))
+
+# What a re-check needs (transcript, features) plus what the stats update reads
+REAUDIT_PROJECTION = {
+    "agent_name": 1, "date": 1, "audio_hash": 1,
+    "report.transcript": 1, "report.audio_features": 1,
+    "report.bedrock_analysis": 1, "report.classification": 1
+}
+
+
+def stale_query(version, agent_name=None):
+    """Reports not checked with ``version`` that still have their transcript."""
+    query = {"report.rules_version": {"$ne": version}, "report.transcript": {"$exists": True}}
+    if agent_name:
+        query["agent_name"] = agent_name
+    return query
+
+
+def count_stale(version, agent_name=None):
+    """``(reauditable, without_transcript)`` counts of reports older than ``version``."""
+    query = stale_query(version, agent_name)
+    reauditable = collection.count_documents(query)
+    query["report.transcript"] = {"$exists": False}
+    return reauditable, collection.count_documents(query)
+
+
+def _batches(query, batch_size):
+    """Matching documents in ``_id`` order, ``batch_size`` at a time."""
+    last_id = None
+    while True:
+        page = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        docs = list(collection.find(page, REAUDIT_PROJECTION).sort("_id", 1).limit(batch_size))
+        if not docs:
+            return
+        yield docs
+        last_id = docs[-1]["_id"]
+
+
+def reaudit_batch(docs, version, rules_fp, pool, cache=None):
+    """
+    Re-check one batch: violations per transcript on ``pool`` (Bedrock only
+    for the ones the local matcher is unsure about), then one classify_many
+    call for the whole batch. Returns the report updates, the stats ops, how
+    many reports got a different violation result and the reports whose
+    check or classification failed (left stale for the next run).
+    """
+    from agent_stats import recheck_ops
+
+    reports = [decode_report(d.get("report") or {}) for d in docs]
+
+    def check(i):
+        index = TranscriptIndex.from_dict(reports[i]["transcript"])
+        audio_hash = docs[i].get("audio_hash")
+        if cache is None or not audio_hash:
+            return detect_violations(index, rules_fp)
+        return cache.get_or_compute(audio_hash, "bedrock", lambda: detect_violations(index, rules_fp), version)
+
+    def check_or_error(i):
+        # One failing transcript (e.g. a Bedrock error) must not abort the batch
+        try:
+            return check(i), None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    checked = [list(c) for c in pool.map(check_or_error, range(len(docs)))]
+    ok = [i for i, (_, error) in enumerate(checked) if error is None]
+    with_features = [i for i in ok if reports[i].get("audio_features")]
+    try:
+        classified = dict(zip(with_features, classify_many([reports[i]["audio_features"] for i in with_features])))
+    except Exception as e:
+        # E.g. no model or an unfillable schema: these reports stay stale, the run goes on
+        classified = {}
+        for i in with_features:
+            checked[i][1] = f"classification failed: {type(e).__name__}: {e}"
+        ok = [i for i in ok if i not in set(with_features)]
+
+    errors = [
+        {"_id": str(doc["_id"]), "agent_name": doc.get("agent_name"), "date": doc.get("date"), "error": error}
+        for doc, (_, error) in zip(docs, checked) if error
+    ]
+    for e in errors:
+        print(f"[WARN] Could not re-check report {e['_id']} ({e['agent_name']}, {e['date']}): {e['error']}")
+
+    updates, stat_ops, changed = [], [], 0
+    for i in ok:
+        doc, report, violations = docs[i], reports[i], checked[i][0]
+        changes = {"report.bedrock_analysis": violations, "report.rules_version": version}
+        if i in classified:
+            changes["report.classification"] = classification_block(*classified[i])
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        new_report = dict(report, bedrock_analysis=violations,
+                          classification=changes.get("report.classification", report.get("classification")))
+        stat_ops.extend(recheck_ops(doc["agent_name"], doc["date"], report, new_report))
+        changed += report.get("bedrock_analysis") != violations
+    return updates, stat_ops, changed, errors
+
+
+def reaudit(agent_name=None, batch_size=REAUDIT_BATCH_SIZE, workers=REAUDIT_WORKERS, dry_run=False,
+            use_cache=True):
+    """Bring every stale report up to the current rules version; returns a summary dict."""
+    from agent_stats import apply_stats_ops
+
+    rules_fp = rules_fingerprint()
+    version = rules_version(rules_fp)
+    reauditable, missing = count_stale(version, agent_name)
+    print(f"[INFO] Rules version {version}: {reauditable} reports to re-check, "
+          f"{missing} without a stored transcript (need a full run)")
+    summary = {"rules_version": version, "reaudited": 0, "changed": 0, "without_transcript": missing,
+               "errors": [], "elapsed_seconds": 0.0}
+    if dry_run or not reauditable:
+        return summary
+
+    cache = get_result_cache() if use_cache else None
+    started = time.perf_counter()
+    with audit_run(f"reaudit-{version}", "reaudit"), ThreadPoolExecutor(max_workers=workers) as pool:
+        for docs in _batches(stale_query(version, agent_name), batch_size):
+            with measure_stage("reaudit_batch"):
+                updates, stat_ops, changed, errors = reaudit_batch(docs, version, rules_fp, pool, cache)
+            if updates:
+                with measure_stage("mongo_write"):
+                    collection.bulk_write(updates, ordered=False)
+            try:
+                apply_stats_ops(stat_ops)
+            except Exception as e:
+                print(f"[WARN] Could not update agent stats: {e}")
+            summary["reaudited"] += len(updates)
+            summary["changed"] += changed
+            summary["errors"].extend(errors)
+            print(f"[INFO] Re-audited {summary['reaudited']}/{reauditable} reports")
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    print(f"[INFO] Re-audit finished: {summary['reaudited']} reports, {summary['changed']} with new "
+          f"violation results in {summary['elapsed_seconds']}s")
+    if summary["errors"]:
+        print(f"[WARN] {len(summary['errors'])} reports could not be re-checked and stay on their old "
+              f"rules version; run again to retry them")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-check stored reports against the current rules.json.")
+    parser.add_argument("--agent", default=None, help="Limit to one agent")
+    parser.add_argument("--batch-size", type=int, default=REAUDIT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=REAUDIT_WORKERS,
+                        help="Transcripts checked concurrently (Bedrock calls for uncertain ones)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count stale reports")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or store cached bedrock results")
+    args = parser.parse_args(argv)
+    summary = reaudit(args.agent, args.batch_size, args.workers, args.dry_run, use_cache=not args.no_cache)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- Cache Settings ----------------
+CACHE_DIR = os.getenv("RESULT_CACHE_DIR", ".audit_cache")
+CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Pipeline stages that are cached independently of each other
+STAGES = ("transcript", "bedrock", "features", "classification")
+
+
+# ---------------- Hashing Helpers ----------------
+def hash_audio(source):
+    """SHA-256 of an audio file path or binary file-like object, read in chunks."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """Short content hash of a config/model file, or '' when it does not exist."""
+    if not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def rules_fingerprint(path="rules.json"):
+    """Changes whenever the rule set changes, invalidating only the bedrock stage."""
+    return file_fingerprint(path)
+
+
+def model_fingerprint(path=None):
+    """
+    Model registry version of the classifier: a content hash of the model and
+    its feature schema sidecar, so a schema change also invalidates cached
+    classifications. '' when there is no model file.
+    """
+    from model_registry import MODEL_PATH, get_model_registry
+
+    try:
+        return get_model_registry(path or MODEL_PATH).version
+    except OSError:
+        return ""
+
+
+# ---------------- On-Disk Backend ----------------
+class DiskCache:
+    """
+    JSON values stored one file per key under ``root``, evicted least recently
+    used first once the total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=int(CACHE_MAX_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # relative path -> size, oldest access first
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                found.append((st.st_atime if st.st_atime > st.st_mtime else st.st_mtime,
+                              os.path.relpath(path, self.root), st.st_size))
+        for _, rel, size in sorted(found):
+            self._entries[rel] = size
+            self._total += size
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(digest[:2], f"{digest}.json")
+
+    def get(self, key):
+        rel = self._path(key)
+        path = os.path.join(self.root, rel)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                if rel in self._entries:
+                    self._total -= self._entries.pop(rel)
+            return None
+        with self._lock:
+            if rel in self._entries:
+                self._entries.move_to_end(rel)
+            else:
+                # Written by another process sharing the directory
+                size = os.path.getsize(path)
+                self._entries[rel] = size
+                self._total += size
+        now = time.time()
+        os.utime(path, (now, now))
+        return value["value"]
+
+    def set(self, key, value):
+        rel = self._path(key)
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"key": key, "value": value}, default=float)
+        # Unique per process and thread: workers share the cache directory
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = len(data)
+        with self._lock:
+            self._total += size - self._entries.pop(rel, 0)
+            self._entries[rel] = size
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            rel, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.root, rel))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def size_bytes(self):
+        return self._total
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ---------------- Stage-Aware Cache ----------------
+class ResultCache:
+    """
+    Per-stage results keyed by the audio content hash.
+
+    Each entry is addressed by ``(audio_hash, stage, fingerprint)``; the
+    fingerprint captures whatever else the stage depends on (rule set, model
+    file), so changing one of those only misses for that stage.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else DiskCache()
+        self.hits = {stage: 0 for stage in STAGES}
+        self.misses = {stage: 0 for stage in STAGES}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(audio_hash, stage, fingerprint):
+        return f"{stage}:{fingerprint}:{audio_hash}"
+
+    def get(self, audio_hash, stage, fingerprint=""):
+        value = self.backend.get(self._key(audio_hash, stage, fingerprint))
+        with self._lock:
+            counter = self.misses if value is None else self.hits
+            counter[stage] = counter.get(stage, 0) + 1
+        return value
+
+    def put(self, audio_hash, stage, value, fingerprint=""):
+        self.backend.set(self._key(audio_hash, stage, fingerprint), value)
+
+    def get_or_compute(self, audio_hash, stage, compute, fingerprint=""):
+        value = self.get(audio_hash, stage, fingerprint)
+        if value is None:
+            value = compute()
+            self.put(audio_hash, stage, value, fingerprint)
+        else:
+            print(f"[CACHE] Hit for stage '{stage}' ({audio_hash[:12]})")
+        return value
+
+    def stats(self):
+        total_hits, total_misses = sum(self.hits.values()), sum(self.misses.values())
+        lookups = total_hits + total_misses
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.backend),
+            "size_bytes": self.backend.size_bytes
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Process-wide cache shared by every audit in this process."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
@@ -0,0 +1,94 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.s3.transfer import TransferConfig
+from dotenv import load_dotenv
+
+from aws_clients import get_client
+
+load_dotenv()
+
+# ---------------- Upload Settings ----------------
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+PART_SIZE = max(MIN_PART_SIZE, int(os.getenv("S3_UPLOAD_PART_MB", "8")) * 1024 * 1024)
+MAX_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+
+
+def transfer_config(part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+    """TransferConfig for ``upload_file`` calls, matching the streaming path's tuning."""
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency
+    )
+
+
+def _read_part(fileobj, size):
+    """Read up to ``size`` bytes, looping because some streams return short reads."""
+    chunks, remaining = [], size
+    while remaining > 0:
+        chunk = fileobj.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def stream_upload(fileobj, bucket, key, part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY,
+                  s3_client=None):
+    """
+    Stream a binary file-like object into S3 and hash it in the same pass.
+
+    Parts are read sequentially (so the SHA-256 sees bytes in order) and
+    uploaded by up to ``max_concurrency`` threads; at most that many parts are
+    held in memory at once. Objects smaller than one part use a single
+    ``put_object``. Returns bucket, key, size and the content hash.
+    """
+    if part_size < MIN_PART_SIZE:
+        raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+    s3_client = s3_client or get_client("s3")
+    digest = hashlib.sha256()
+
+    first = _read_part(fileobj, part_size)
+    digest.update(first)
+    if len(first) < part_size:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=first)
+        return {"bucket": bucket, "key": key, "size": len(first), "sha256": digest.hexdigest(), "parts": 1}
+
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+    slots = threading.BoundedSemaphore(max_concurrency)
+    size = 0
+
+    def send(number, body):
+        try:
+            response = s3_client.upload_part(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body
+            )
+            return {"PartNumber": number, "ETag": response["ETag"]}
+        finally:
+            slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures, number, body = [], 1, first
+            while body:
+                size += len(body)
+                slots.acquire()
+                futures.append(pool.submit(send, number, body))
+                body = _read_part(fileobj, part_size)
+                digest.update(body)
+                number += 1
+            parts = [f.result() for f in futures]
+
+        s3_client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except BaseException:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    print(f"[INFO] Streamed {size / (1024 * 1024):.1f} MB to s3://{bucket}/{key} in {len(parts)} parts")
+    return {"bucket": bucket, "key": key, "size": size, "sha256": digest.hexdigest(), "parts": len(parts)}
@@ -0,0 +1,471 @@
+"""
+Cross-call similarity index over the audio feature vectors stored in reports.
+
+With SIMILARITY_INDEX=1 each saved report adds one row: its SIMILARITY_V1
+feature vector, standardized and scaled to unit length, so cosine
+similarity is a dot product. Rows live in append-only files under SIMILARITY_INDEX_DIR that
+are memory-mapped for queries:
+
+    raw.f32 / unit.f32   (N, D) float32 raw and normalized vectors
+    agents.i32           agent id per row (names in state.json)
+    alive.u8             0 once a row was replaced or deleted
+    assign.i32           IVF list per row (-1 until trained)
+    meta.jsonl           agent_name, date, file_name, audio_hash per row
+    centroids.npy        IVF coarse centroids (after train)
+
+Small indexes are searched exactly (brute force, in blocks). Once trained,
+larger ones are searched approximately (IVF): only the rows in the
+``nprobe`` lists whose centroids are closest to the query are scored.
+Queries limited to one agent always scan exactly.
+
+    python similarity_index.py --rebuild            # from MongoDB, trains IVF when large
+    python similarity_index.py --agent A --date 2024-01-05 --file call.mp3 [-k 10]
+"""
+import os
+import json
+import fcntl
+import argparse
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+from feature_schema import SIMILARITY_V1
+from array_codec import decode_report
+
+load_dotenv()
+
+# ---------------- Similarity Settings ----------------
+SIMILARITY_INDEX = os.getenv("SIMILARITY_INDEX", "0") == "1"
+SIMILARITY_INDEX_DIR = os.getenv("SIMILARITY_INDEX_DIR", ".similarity_index")
+# Below this many rows queries stay exact, even when an IVF is trained
+SIMILARITY_BRUTE_FORCE_MAX = int(os.getenv("SIMILARITY_BRUTE_FORCE_MAX", "50000"))
+SIMILARITY_NPROBE = int(os.getenv("SIMILARITY_NPROBE", "8"))
+# Calls at least this similar are reported as likely duplicates / replays
+DUPLICATE_THRESHOLD = float(os.getenv("SIMILARITY_DUPLICATE_THRESHOLD", "0.995"))
+# Standardization stats are refitted on every add until the index has this many rows
+STATS_MIN_ROWS = 64
+# Rows scored per step of a brute-force scan
+SCAN_BLOCK = 65536
+
+
+def _unit(vectors, mean, std):
+    z = (np.asarray(vectors, dtype=np.float32) - mean) / std
+    norms = np.linalg.norm(z, axis=1, keepdims=True)
+    return (z / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _top_k(scores, rows, k, best=None):
+    """Merge ``(scores, rows)`` into the running best ``k`` (descending by score)."""
+    if best is not None:
+        scores, rows = np.concatenate([best[0], scores]), np.concatenate([best[1], rows])
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], rows[order]
+
+
+def kmeans(vectors, n_clusters, iters=10, seed=0):
+    """Spherical k-means on unit vectors; returns (n_clusters, D) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_clusters)
+        empty = counts == 0
+        # Re-seed empty clusters with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+class SimilarityIndex:
+    """
+    On-disk vector index shared by every process using the same directory.
+    Writers take an exclusive file lock; readers re-open the memory maps
+    whenever another process has added rows.
+    """
+
+    def __init__(self, root=SIMILARITY_INDEX_DIR, schema=SIMILARITY_V1):
+        self.root = root
+        self.schema = schema
+        self.dim = schema.width
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        # Raw metadata lines (parsed only for results) and key -> row, built on demand
+        self._meta, self._meta_offset, self._keys, self._keyed = [], 0, {}, 0
+        self._lists = None
+        self._load()
+
+    # ---------------- Files & State ----------------
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive across threads and processes; state is re-read under the lock."""
+        with self._lock, open(self._path("lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._load()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_state(self):
+        try:
+            with open(self._path("state.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"schema": self.schema.name, "count": 0, "version": 0, "agents": [],
+                    "mean": None, "std": None, "trained": False}
+
+    def _write_state(self):
+        self.state["version"] += 1
+        tmp = self._path("state.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self._path("state.json"))
+
+    def _map(self, name, dtype, shape, mode="r"):
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _load(self):
+        """(Re)open the memory maps if the index changed since the last load."""
+        state = self._read_state()
+        if state["version"] == self._loaded_version:
+            return
+        if state["schema"] != self.schema.name:
+            raise ValueError(f"Index at {self.root} was built with schema '{state['schema']}'")
+        self.state = state
+        n = state["count"]
+        self.unit = self._map("unit.f32", np.float32, (n, self.dim))
+        self.agents = self._map("agents.i32", np.int32, (n,))
+        self.alive = self._map("alive.u8", np.uint8, (n,))
+        self.assign = self._map("assign.i32", np.int32, (n,))
+        self.centroids = np.load(self._path("centroids.npy")) if state["trained"] else None
+        self._agent_ids = {name: i for i, name in enumerate(state["agents"])}
+        self._lists = None
+        self._loaded_version = state["version"]
+        # Metadata lines are appended, so only the new tail is read (up to the
+        # last complete line; a writer may be mid-append)
+        with open(self._path("meta.jsonl"), "a+b") as f:
+            f.seek(self._meta_offset)
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    break
+                self._meta.append(line)
+                self._meta_offset += len(line)
+
+    def __len__(self):
+        self._load()
+        return int(self.state["count"])
+
+    def _key_rows(self):
+        for row in range(self._keyed, len(self._meta)):
+            self._keys[self._key(json.loads(self._meta[row]))] = row
+        self._keyed = len(self._meta)
+        return self._keys
+
+    @staticmethod
+    def _key(meta):
+        """Replacing a call (same recording saved again) supersedes its old row."""
+        if meta.get("audio_hash"):
+            return (meta["agent_name"], meta["audio_hash"])
+        return (meta["agent_name"], meta.get("date"), meta.get("file_name"))
+
+    # ---------------- Adding ----------------
+    def vectors_for(self, reports):
+        """Raw (N, D) vectors for report dicts (compact arrays are decoded)."""
+        return self.schema.build([decode_report(r) for r in reports])
+
+    def add(self, entries):
+        """
+        Add ``(agent_name, date, file_name, report)`` tuples; a call already in
+        the index (same agent and audio_hash) has its old row retired.
+        """
+        entries = list(entries)
+        if not entries:
+            return 0
+        metas = [{"agent_name": a, "date": d, "file_name": f, "audio_hash": (r or {}).get("audio_hash")}
+                 for a, d, f, r in entries]
+        return self.add_vectors(self.vectors_for([r for _, _, _, r in entries]), metas)
+
+    def add_vectors(self, vectors, metas):
+        """Append raw vectors with their metadata dicts (agent_name, date, file_name, audio_hash)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._writing():
+            n = self.state["count"]
+            refit = self.state["mean"] is None or n + len(vectors) <= STATS_MIN_ROWS
+            if refit:
+                raw = np.concatenate([self._map("raw.f32", np.float32, (n, self.dim)), vectors])
+                self._fit_stats(raw)
+            mean, std = np.asarray(self.state["mean"], np.float32), np.asarray(self.state["std"], np.float32)
+            unit = _unit(vectors, mean, std)
+
+            agent_ids = np.empty(len(metas), dtype=np.int32)
+            for i, meta in enumerate(metas):
+                name = meta["agent_name"]
+                if name not in self._agent_ids:
+                    self._agent_ids[name] = len(self.state["agents"])
+                    self.state["agents"].append(name)
+                agent_ids[i] = self._agent_ids[name]
+            assign = (np.argmax(unit @ self.centroids.T, axis=1).astype(np.int32)
+                      if self.centroids is not None else np.full(len(unit), -1, np.int32))
+
+            retired, batch_rows, keys = [], {}, self._key_rows()
+            for i, meta in enumerate(metas):
+                key = self._key(meta)
+                previous = batch_rows.get(key, keys.get(key))
+                if previous is not None:
+                    retired.append(previous)
+                batch_rows[key] = n + i
+            self._append("raw.f32", vectors)
+            self._append("unit.f32", unit)
+            self._append("agents.i32", agent_ids)
+            self._append("alive.u8", np.ones(len(unit), np.uint8))
+            self._append("assign.i32", assign)
+            with open(self._path("meta.jsonl"), "a") as f:
+                f.writelines(json.dumps(m) + "\n" for m in metas)
+            self.state["count"] = n + len(vectors)
+            if refit:
+                self._renormalize()
+            self._retire(retired)
+            self._write_state()
+        return len(vectors)
+
+    def _append(self, name, array):
+        with open(self._path(name), "ab") as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def _retire(self, rows):
+        if not len(rows):
+            return
+        alive = self._map("alive.u8", np.uint8, (self.state["count"],), mode="r+")
+        alive[np.asarray(rows, dtype=np.int64)] = 0
+        alive.flush()
+
+    def _fit_stats(self, raw):
+        if not len(raw):
+            return
+        std = raw.std(axis=0)
+        self.state["mean"] = raw.mean(axis=0).tolist()
+        self.state["std"] = np.where(std > 1e-9, std, 1.0).tolist()
+
+    def _renormalize(self):
+        """Rewrite unit.f32 from raw.f32 with the current stats, block by block."""
+        n = self.state["count"]
+        raw = self._map("raw.f32", np.float32, (n, self.dim))
+        unit = self._map("unit.f32", np.float32, (n, self.dim), mode="r+")
+        mean, std = np.asarray(self.state["mean"], np.float32), np.asarray(self.state["std"], np.float32)
+        for start in range(0, n, SCAN_BLOCK):
+            unit[start:start + SCAN_BLOCK] = _unit(raw[start:start + SCAN_BLOCK], mean, std)
+        if n:
+            unit.flush()
+
+    def remove_agent(self, agent_name):
+        """Retire every row of one agent (their reports were deleted)."""
+        with self._writing():
+            agent_id = self._agent_ids.get(agent_name)
+            if agent_id is None:
+                return 0
+            rows = np.flatnonzero(np.asarray(self.agents) == agent_id)
+            self._retire(rows)
+            self._write_state()
+            return len(rows)
+
+    # ---------------- IVF ----------------
+    def train(self, n_lists=None, sample=None, iters=10):
+        """
+        Refit the standardization on all rows, cluster a sample of them into
+        ``n_lists`` (default about sqrt(N)) IVF lists and assign every row.
+        """
+        with self._writing():
+            n = self.state["count"]
+            if not n:
+                return 0
+            self._fit_stats(self._sample_raw(min(n, 200_000)))
+            self._renormalize()
+            self.unit = self._map("unit.f32", np.float32, (n, self.dim))
+            n_lists = n_lists or max(1, min(4096, int(np.sqrt(n))))
+            rng = np.random.default_rng(0)
+            picked = np.sort(rng.choice(n, min(n, sample or 64 * n_lists), replace=False))
+            centroids = kmeans(np.asarray(self.unit[picked]), n_lists, iters)
+            np.save(self._path("centroids.npy"), centroids)
+
+            assign = self._map("assign.i32", np.int32, (n,), mode="r+")
+            for start in range(0, n, SCAN_BLOCK):
+                block = np.asarray(self.unit[start:start + SCAN_BLOCK])
+                assign[start:start + SCAN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+            assign.flush()
+            self.state["trained"] = True
+            self._write_state()
+            print(f"[INFO] Similarity index trained: {n} rows in {n_lists} lists")
+            return n_lists
+
+    def _sample_raw(self, size):
+        n = self.state["count"]
+        raw = self._map("raw.f32", np.float32, (n, self.dim))
+        if size >= n:
+            return np.asarray(raw)
+        return np.asarray(raw[np.sort(np.random.default_rng(0).choice(n, size, replace=False))])
+
+    def _inverted_lists(self):
+        """Rows grouped by IVF list: (rows sorted by list, start offset per list)."""
+        if self._lists is None:
+            assign = np.asarray(self.assign)
+            order = np.argsort(assign, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    # ---------------- Search ----------------
+    def search(self, query, k=10, agent_name=None, exact=None, nprobe=SIMILARITY_NPROBE, exclude=None):
+        """
+        Top ``k`` live rows most similar to ``query`` (a report dict or a raw
+        vector), optionally only one agent's calls. ``exact`` forces brute
+        force (True) or IVF (False); by default IVF is used once trained and
+        larger than SIMILARITY_BRUTE_FORCE_MAX. Agent-scoped queries are always
+        exact, since the probed lists hold only a fraction of an agent's calls.
+        Returns metadata dicts with a cosine ``score``.
+        """
+        self._load()
+        n = self.state["count"]
+        if not n or self.state["mean"] is None:
+            return []
+        if isinstance(query, dict):
+            query = self.vectors_for([query])[0]
+        q = _unit(np.asarray(query, np.float32).reshape(1, -1),
+                  np.asarray(self.state["mean"], np.float32), np.asarray(self.state["std"], np.float32))[0]
+        agent_id = None
+        if agent_name is not None:
+            agent_id = self._agent_ids.get(agent_name)
+            if agent_id is None:
+                return []
+        if agent_id is not None:
+            exact = True
+        elif exact is None:
+            exact = self.centroids is None or n <= SIMILARITY_BRUTE_FORCE_MAX
+        want = k + (1 if exclude is not None else 0)
+
+        if exact:
+            best = None
+            for start in range(0, n, SCAN_BLOCK):
+                rows = np.arange(start, min(n, start + SCAN_BLOCK))
+                best = self._score(q, rows, agent_id, want, best)
+        else:
+            order, offsets = self._inverted_lists()
+            probes = np.argsort(-(self.centroids @ q))[:nprobe]
+            rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes]))
+            best = self._score(q, rows, agent_id, want, None)
+
+        results = []
+        for score, row in zip(*best):
+            if row == exclude:
+                continue
+            results.append(dict(json.loads(self._meta[row]), score=round(float(score), 6), row=int(row)))
+        return results[:k]
+
+    def _score(self, q, rows, agent_id, k, best):
+        keep = np.asarray(self.alive[rows]).astype(bool)
+        if agent_id is not None:
+            keep &= np.asarray(self.agents[rows]) == agent_id
+        rows = rows[keep]
+        if not len(rows):
+            return best if best is not None else (np.zeros(0, np.float32), rows)
+        contiguous = rows[-1] - rows[0] + 1 == len(rows)
+        vectors = self.unit[rows[0]:rows[-1] + 1] if contiguous else self.unit[rows]
+        return _top_k(np.asarray(vectors) @ q, rows, k, best)
+
+    def row_of(self, agent_name, audio_hash=None, date=None, file_name=None):
+        self._load()
+        row = self._key_rows().get(self._key({"agent_name": agent_name, "audio_hash": audio_hash,
+                                         "date": date, "file_name": file_name}))
+        return row if row is not None and self.alive[row] else None
+
+    def similar_calls(self, agent_name, date, file_name, k=10, same_agent=False):
+        """Calls that sound most like a stored one (the call itself excluded)."""
+        from mongo_connector import get_report
+
+        report = get_report(agent_name, date, file_name)
+        if report is None:
+            return []
+        exclude = self.row_of(agent_name, report.get("audio_hash"), date, file_name)
+        return self.search(report, k, agent_name=agent_name if same_agent else None, exclude=exclude)
+
+    def duplicates(self, report, threshold=DUPLICATE_THRESHOLD, k=10, exclude=None):
+        """Likely duplicate or replayed recordings of ``report``'s call."""
+        return [r for r in self.search(report, k, exclude=exclude) if r["score"] >= threshold]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """Process-wide index on SIMILARITY_INDEX_DIR, opened on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex()
+        return _index
+
+
+# ---------------- Maintenance ----------------
+def rebuild_index(root=SIMILARITY_INDEX_DIR, batch_size=5000):
+    """Recreate the index from every report in MongoDB; trains IVF when large."""
+    import shutil
+    from mongo_connector import collection
+
+    global _index
+    shutil.rmtree(root, ignore_errors=True)
+    index = SimilarityIndex(root)
+    projection = {"agent_name": 1, "date": 1, "file_name": 1, "audio_hash": 1, "report.audio_features": 1}
+    batch = []
+    for doc in collection.find({}, projection).sort("_id", 1):
+        batch.append((doc.get("agent_name"), doc.get("date"), doc.get("file_name"),
+                      dict(doc.get("report") or {}, audio_hash=doc.get("audio_hash"))))
+        if len(batch) >= batch_size:
+            index.add(batch)
+            batch = []
+    index.add(batch)
+    if len(index) > SIMILARITY_BRUTE_FORCE_MAX:
+        index.train()
+    print(f"[INFO] Similarity index rebuilt with {len(index)} calls")
+    with _index_lock:
+        _index = index
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-call audio similarity index.")
+    parser.add_argument("--rebuild", action="store_true", help="Recreate the index from MongoDB")
+    parser.add_argument("--train", action="store_true", help="(Re)train the IVF lists")
+    parser.add_argument("--agent", default=None)
+    parser.add_argument("--date", default=None)
+    parser.add_argument("--file", default=None)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--same-agent", action="store_true", help="Only search the agent's own calls")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        rebuild_index()
+    index = get_similarity_index()
+    if args.train:
+        index.train()
+    if args.agent and args.date and args.file:
+        for r in index.similar_calls(args.agent, args.date, args.file, args.k, args.same_agent):
+            print(f"{r['score']:.4f}  {r['agent_name']:<20} {r['date']}  {r['file_name']}")
+    elif not (args.rebuild or args.train):
+        print(f"[INFO] {len(index)} calls indexed in {index.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import time
+import contextvars
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Tuple
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step. ``fn`` receives the results of ``deps`` as keyword
+    arguments (by stage name) and returns this stage's result.
+    """
+    name: str
+    fn: Callable
+    deps: Tuple[str, ...] = field(default_factory=tuple)
+
+
+def _check(stages):
+    names = {s.name for s in stages}
+    if len(names) != len(stages):
+        raise ValueError("Stage names must be unique")
+    for s in stages:
+        missing = set(s.deps) - names
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown stages {sorted(missing)}")
+
+
+def run_stages(stages, max_workers=None, on_start=None):
+    """
+    Run a DAG of stages, each as soon as all of its dependencies finished, so
+    independent branches overlap.
+
+    Returns ``(results, timings)``: results by stage name, and per stage its
+    start/end offset and duration in seconds from the start of the run. The
+    first failing stage's exception is re-raised once running stages finish;
+    stages that had not started yet are skipped.
+    """
+    stages = list(stages)
+    _check(stages)
+    pending = {s.name: s for s in stages}
+    results, timings, running = {}, {}, {}
+    t0 = time.perf_counter()
+
+    def call(stage):
+        started = time.perf_counter()
+        try:
+            return stage.fn(**{d: results[d] for d in stage.deps})
+        finally:
+            ended = time.perf_counter()
+            timings[stage.name] = {
+                "start": round(started - t0, 4),
+                "end": round(ended - t0, 4),
+                "seconds": round(ended - started, 4)
+            }
+
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as pool:
+        while pending or running:
+            if error is None:
+                for name in [n for n, s in pending.items() if all(d in results for d in s.deps)]:
+                    stage = pending.pop(name)
+                    if on_start is not None:
+                        on_start(name, len(results), len(stages))
+                    # Each stage runs in a copy of the caller's context (run tags etc.)
+                    running[pool.submit(contextvars.copy_context().run, call, stage)] = name
+            if not running:
+                if pending and error is None:
+                    raise ValueError(f"Dependency cycle among stages {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+    if error is not None:
+        raise error
+    return results, timings
@@ -0,0 +1,250 @@
+"""
+Near-real-time auditing: audio (or replayed results) is transcribed as a
+stream and the violation check runs on every partial result, so violations
+are reported while the call is still going.
+
+    python streaming_audit.py real_transcript.json --speed 5
+"""
+import json
+import asyncio
+import argparse
+from typing import AsyncIterator
+
+from phrase_matcher import get_matcher, MATCHER_VERSION
+from result_cache import rules_fingerprint
+from transcript_index import TranscriptIndex
+
+# Words kept from finalized results when re-matching a new partial, so a
+# phrase spanning the boundary is still found (longest rule + filler words)
+CARRY_WORDS = 12
+
+
+# ---------------- Stream Sources ----------------
+# A source is an async iterator of result dicts in the shape Transcribe
+# Streaming produces, flattened:
+#   {"result_id": str, "is_partial": bool,
+#    "words": [{"text", "start_time", "end_time", "speaker"}]}
+
+class LocalReplayer:
+    """
+    Replays a batch Transcribe JSON (like real_transcript.json) as a stream.
+
+    Each speaker segment is emitted as a run of growing partial results
+    followed by a final one, paced by the word timestamps divided by ``speed``
+    (``speed=0`` replays as fast as possible).
+    """
+
+    def __init__(self, transcript_data, speed=1.0, words_per_partial=3):
+        self.transcript_data = transcript_data
+        self.speed = speed
+        self.words_per_partial = words_per_partial
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def _segments(self):
+        index = TranscriptIndex.from_transcribe(self.transcript_data)
+        return [index.words(i, j) for _, i, j in index.turns()]
+
+    async def __aiter__(self):
+        clock = 0.0
+        for index, segment in enumerate(self._segments()):
+            result_id = f"replay-{index}"
+            for end in range(self.words_per_partial, len(segment), self.words_per_partial):
+                clock = await self._pace(clock, segment[end - 1]["end_time"])
+                yield {"result_id": result_id, "is_partial": True, "words": segment[:end]}
+            clock = await self._pace(clock, segment[-1]["end_time"])
+            yield {"result_id": result_id, "is_partial": False, "words": segment}
+
+    async def _pace(self, clock, until):
+        if self.speed and until > clock:
+            await asyncio.sleep((until - clock) / self.speed)
+        return max(clock, until)
+
+
+class TranscribeStreamingSource:
+    """
+    Amazon Transcribe Streaming adapter (needs the optional
+    ``amazon-transcribe`` package). ``audio_chunks`` is an async iterator of
+    16-bit mono PCM byte chunks at ``sample_rate``.
+    """
+
+    def __init__(self, audio_chunks, sample_rate=16000, region="us-east-1", language_code="en-US"):
+        self.audio_chunks = audio_chunks
+        self.sample_rate = sample_rate
+        self.region = region
+        self.language_code = language_code
+
+    async def __aiter__(self):
+        from amazon_transcribe.client import TranscribeStreamingClient
+
+        client = TranscribeStreamingClient(region=self.region)
+        stream = await client.start_stream_transcription(
+            language_code=self.language_code,
+            media_sample_rate_hz=self.sample_rate,
+            media_encoding="pcm",
+            show_speaker_label=True
+        )
+
+        async def feed():
+            async for chunk in self.audio_chunks:
+                await stream.input_stream.send_audio_event(audio_chunk=chunk)
+            await stream.input_stream.end_stream()
+
+        feeder = asyncio.create_task(feed())
+        try:
+            async for event in stream.output_stream:
+                for result in getattr(event.transcript, "results", []):
+                    if not result.alternatives:
+                        continue
+                    yield {
+                        "result_id": result.result_id,
+                        "is_partial": result.is_partial,
+                        "words": [
+                            {
+                                "text": item.content,
+                                "start_time": item.start_time,
+                                "end_time": item.end_time,
+                                "speaker": getattr(item, "speaker", None) or "spk_0"
+                            }
+                            for item in result.alternatives[0].items
+                            if item.item_type == "pronunciation"
+                        ]
+                    }
+        finally:
+            await feeder
+
+
+# ---------------- Incremental Auditor ----------------
+class StreamingAuditor:
+    """
+    Consumes stream results and yields events as they happen:
+
+        {"type": "violation", "violation": {...}, "provisional": bool}
+        {"type": "segment", "speaker", "text", "start_time", "end_time"}
+        {"type": "report", "report": {...}}   # once, at the end
+
+    Violations are matched only on the new partial words plus a short tail of
+    finalized words, so the per-result cost does not grow with call length.
+    Only exact, non-negated matches on finalized words are confirmed; fuzzy
+    or negated ones stay provisional (``"uncertain": True``) until the final
+    report. The final report has the same schema generate_full_audit produces.
+    """
+
+    def __init__(self, rules_path="rules.json", audio_file=None, bedrock_checker=None):
+        self.rules_path = rules_path
+        self.audio_file = audio_file
+        self.bedrock_checker = bedrock_checker
+        self.matcher = get_matcher(rules_path, rules_fingerprint(rules_path))
+        self.final_words = []
+        self._reported = {}
+
+    def _scan(self, words, is_partial):
+        tail = self.final_words[-CARRY_WORDS:]
+        window = tail + list(words)
+        offset = len(self.final_words) - len(tail)
+        matches = self.matcher.match_words(
+            [w["text"] for w in window],
+            [w["start_time"] for w in window],
+            [w["end_time"] for w in window]
+        )
+        for m in matches:
+            key = (m.rule, offset + m.start_word)
+            provisional = is_partial or not m.confirmed
+            previous = self._reported.get(key)
+            if previous is not None and (previous or provisional):
+                # Already reported (a confirmed one, or provisional again)
+                continue
+            self._reported[key] = not provisional
+            violation = m.to_dict()
+            violation["start_word"] += offset
+            violation["end_word"] += offset
+            event = {"type": "violation", "violation": violation, "provisional": provisional}
+            if not is_partial and not m.confirmed:
+                event["uncertain"] = True
+            yield event
+
+    async def run(self, source: AsyncIterator[dict]):
+        async for result in source:
+            words = result["words"]
+            for event in self._scan(words, result["is_partial"]):
+                yield event
+            if not result["is_partial"] and words:
+                self.final_words.extend(words)
+                yield {
+                    "type": "segment",
+                    "speaker": words[0].get("speaker"),
+                    "text": " ".join(w["text"] for w in words),
+                    "start_time": words[0]["start_time"],
+                    "end_time": words[-1]["end_time"]
+                }
+        yield {"type": "report", "report": await asyncio.get_running_loop().run_in_executor(None, self.build_report)}
+
+    def build_report(self):
+        """
+        Full-transcript verdict plus (when an audio file is known) features
+        and classification. Without a ``bedrock_checker`` only the confirmed
+        local matches are stored and the result is marked ``"checked": False``,
+        with the rules Bedrock would have had to confirm.
+        """
+        from aws_call_audit import build_report, classify_features, extract_audio_features
+        from bedrock_chunker import check_long_transcript
+
+        words = self.final_words
+        verdict = self.matcher.triage(
+            [w["text"] for w in words], [w["start_time"] for w in words], [w["end_time"] for w in words]
+        )
+        if verdict.is_final():
+            violations = verdict.as_bedrock_result()
+        elif self.bedrock_checker is not None:
+            violations = verdict.merge_into(check_long_transcript(words, self.bedrock_checker))
+        else:
+            violations = verdict.as_bedrock_result(confirmed_only=True)
+            violations["checked"] = False
+            violations["unconfirmed_rules"] = verdict.partial_rules
+        violations["matcher_version"] = MATCHER_VERSION
+
+        features, classification = {}, {}
+        if self.audio_file:
+            features = json.loads(json.dumps(extract_audio_features(self.audio_file), default=lambda o: float(o)))
+            classification = classify_features(features)
+        return build_report(features, violations, classification)
+
+
+async def stream_audit(source, **auditor_kwargs):
+    """Convenience wrapper: ``async for event in stream_audit(LocalReplayer(...))``."""
+    async for event in StreamingAuditor(**auditor_kwargs).run(source):
+        yield event
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a Transcribe JSON through the streaming auditor.")
+    parser.add_argument("transcript", help="Batch Transcribe output JSON to replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (0 = no pacing)")
+    parser.add_argument("--audio", default=None, help="Audio file for features/classification in the final report")
+    parser.add_argument("--bedrock", action="store_true",
+                        help="Confirm uncertain matches with Bedrock in the final report (else it is left unchecked)")
+    args = parser.parse_args(argv)
+    checker = None
+    if args.bedrock:
+        from bedrock_rule_checker import check_violations as checker
+
+    async def run():
+        source = LocalReplayer.from_file(args.transcript, speed=args.speed)
+        async for event in stream_audit(source, audio_file=args.audio, bedrock_checker=checker):
+            if event["type"] == "violation":
+                v = event["violation"]
+                tag = "UNCERTAIN" if event.get("uncertain") else "PROVISIONAL" if event["provisional"] else "VIOLATION"
+                print(f"[{tag}] {v['start_time']:.2f}s-{v['end_time']:.2f}s '{v['text']}' ~ '{v['rule']}'")
+            elif event["type"] == "segment":
+                print(f"[{event['speaker']}] {event['start_time']:.2f}s {event['text']}")
+            else:
+                print(json.dumps(event["report"]["bedrock_analysis"], indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import time
+import random
+import asyncio
+import threading
+import concurrent.futures
+
+# ---------------- Polling Defaults ----------------
+INITIAL_DELAY = 1.0
+MAX_DELAY = 10.0
+BACKOFF_FACTOR = 2.0
+MAX_CONSECUTIVE_ERRORS = 5
+ACTIVE_STATES = ("QUEUED", "IN_PROGRESS")
+FINAL_STATES = ("COMPLETED", "FAILED")
+
+
+class TranscriptionFailed(Exception):
+    """Raised when an AWS Transcribe job ends in the FAILED state."""
+
+    def __init__(self, job):
+        self.job = job
+        reason = job.get("FailureReason", "unknown reason")
+        super().__init__(f"Transcription job {job.get('TranscriptionJobName')} failed: {reason}")
+
+
+def jittered(delay):
+    """Equal-jitter: keep half the delay, randomize the other half."""
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def wait_for_transcription(transcribe_client, job_name, initial_delay=INITIAL_DELAY,
+                           max_delay=MAX_DELAY, timeout=None):
+    """
+    Block until a single Transcribe job finishes, backing off exponentially.
+
+    Returns the ``TranscriptionJob`` dict for a COMPLETED job and raises
+    TranscriptionFailed for a FAILED one.
+    """
+    delay = initial_delay
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        job = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)["TranscriptionJob"]
+        state = job["TranscriptionJobStatus"]
+        if state == "COMPLETED":
+            return job
+        if state == "FAILED":
+            raise TranscriptionFailed(job)
+        if deadline and time.monotonic() >= deadline:
+            raise TimeoutError(f"Transcription job {job_name} still {state} after {timeout}s")
+        print(f"[INFO] Transcription job {job_name} is {state}, checking again in ~{delay:.1f}s...")
+        time.sleep(jittered(delay))
+        delay = min(delay * BACKOFF_FACTOR, max_delay)
+
+
+class TranscriptionPoller:
+    """
+    One asyncio task that tracks many in-flight Transcribe jobs.
+
+    Instead of one ``get_transcription_job`` loop per job, each tick lists the
+    jobs that are still QUEUED/IN_PROGRESS and only fetches full details for
+    tracked jobs that dropped out of that list. The tick interval backs off
+    exponentially (with jitter) while nothing finishes and resets when a job
+    completes or a new one is tracked.
+
+        poller = TranscriptionPoller(client)
+        job = await poller.wait("CallAuditJob-...")
+    """
+
+    def __init__(self, transcribe_client, initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY,
+                 batch_threshold=3, list_page_size=100):
+        self.client = transcribe_client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.batch_threshold = batch_threshold
+        self.list_page_size = list_page_size
+        self.stats = {"list_calls": 0, "get_calls": 0, "ticks": 0}
+        self._pending = {}
+        self._errors = {}
+        self._delay = initial_delay
+        self._task = None
+
+    # ---------------- Public API ----------------
+    def track(self, job_name):
+        """Start tracking an already-started job; returns an awaitable future."""
+        loop = asyncio.get_running_loop()
+        if job_name in self._pending:
+            return self._pending[job_name]
+        future = loop.create_future()
+        self._pending[job_name] = future
+        self._delay = self.initial_delay
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return future
+
+    async def wait(self, job_name):
+        return await self.track(job_name)
+
+    async def start_and_wait(self, **start_kwargs):
+        """Call ``start_transcription_job`` off the event loop, then await completion."""
+        await self._call(self.client.start_transcription_job, **start_kwargs)
+        return await self.wait(start_kwargs["TranscriptionJobName"])
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+    # ---------------- Internals ----------------
+    async def _call(self, fn, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fn(**kwargs))
+
+    async def _active_job_names(self):
+        """Names of every job Transcribe still reports as QUEUED or IN_PROGRESS."""
+        active = set()
+        for status in ACTIVE_STATES:
+            kwargs = {"Status": status, "MaxResults": self.list_page_size}
+            while True:
+                self.stats["list_calls"] += 1
+                page = await self._call(self.client.list_transcription_jobs, **kwargs)
+                active.update(s["TranscriptionJobName"] for s in page.get("TranscriptionJobSummaries", []))
+                if not page.get("NextToken"):
+                    break
+                kwargs["NextToken"] = page["NextToken"]
+        return active
+
+    async def _resolve(self, job_name):
+        self.stats["get_calls"] += 1
+        job = (await self._call(self.client.get_transcription_job,
+                                TranscriptionJobName=job_name))["TranscriptionJob"]
+        state = job["TranscriptionJobStatus"]
+        if state not in FINAL_STATES:
+            return False
+        future = self._pending.pop(job_name, None)
+        if future is not None and not future.done():
+            if state == "COMPLETED":
+                future.set_result(job)
+            else:
+                future.set_exception(TranscriptionFailed(job))
+        return True
+
+    async def _tick(self):
+        self.stats["ticks"] += 1
+        names = [n for n, f in self._pending.items() if not f.cancelled()]
+        for n in [n for n, f in self._pending.items() if f.cancelled()]:
+            del self._pending[n]
+
+        if len(names) >= self.batch_threshold:
+            active = await self._active_job_names()
+            candidates = [n for n in names if n not in active]
+        else:
+            candidates = names
+
+        finished = await asyncio.gather(*(self._resolve(n) for n in candidates), return_exceptions=True)
+        for name, outcome in zip(candidates, finished):
+            if not isinstance(outcome, Exception):
+                self._errors.pop(name, None)
+                continue
+            # Transient errors (throttling) keep the job pending; persistent ones fail it.
+            self._errors[name] = self._errors.get(name, 0) + 1
+            if self._errors[name] >= MAX_CONSECUTIVE_ERRORS:
+                self._errors.pop(name)
+                future = self._pending.pop(name, None)
+                if future is not None and not future.done():
+                    future.set_exception(outcome)
+        return any(outcome is True for outcome in finished)
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(jittered(self._delay))
+            try:
+                progressed = await self._tick()
+            except Exception as e:
+                # Listing failed (throttling, network); keep jobs pending and back off.
+                print(f"[WARN] Transcribe poll failed: {e}")
+                progressed = False
+            self._delay = self.initial_delay if progressed else min(self._delay * BACKOFF_FACTOR, self.max_delay)
+
+
+class BackgroundPoller:
+    """
+    A TranscriptionPoller on its own event-loop thread for synchronous
+    callers (the batch thread pool, audit workers): every thread that calls
+    ``wait`` is served by the one shared poll loop instead of polling its
+    job separately.
+    """
+
+    def __init__(self, transcribe_client, **poller_kwargs):
+        self.poller = TranscriptionPoller(transcribe_client, **poller_kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="transcribe-poller", daemon=True)
+        self._thread.start()
+
+    @property
+    def stats(self):
+        return self.poller.stats
+
+    def wait(self, job_name, timeout=None):
+        """Block until ``job_name`` finishes; same result/errors as wait_for_transcription."""
+        future = asyncio.run_coroutine_threadsafe(self.poller.wait(job_name), self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Transcription job {job_name} still running after {timeout}s")
+
+    def close(self):
+        if not self._loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.poller.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def get_background_poller(transcribe_client, **poller_kwargs):
+    """
+    Process-wide BackgroundPoller for ``transcribe_client``, started on
+    first use (``poller_kwargs`` only apply then).
+    """
+    key = id(transcribe_client)
+    with _pollers_lock:
+        entry = _pollers.get(key)
+        if entry is None or entry[0] is not transcribe_client:
+            entry = _pollers[key] = (transcribe_client, BackgroundPoller(transcribe_client, **poller_kwargs))
+        return entry[1]
+
+
+def shutdown_pollers():
+    """Stop every background poller (pending waits are cancelled)."""
+    with _pollers_lock:
+        pollers = [poller for _, poller in _pollers.values()]
+        _pollers.clear()
+    for poller in pollers:
+        poller.close()
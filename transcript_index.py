@@ -0,0 +1,242 @@
+"""
+Word-level index over an AWS Transcribe result, built once per call and
+shared by rule matching, chunking and tone analysis.
+
+Words are stored as parallel arrays (token, start/end time, speaker id)
+instead of one dict per word, so a long call stays compact and time-range
+lookups are a binary search.
+"""
+import json
+import bisect
+from array import array
+
+import requests
+
+try:
+    import ijson
+except ImportError:  # optional: streamed parsing of large transcripts
+    ijson = None
+
+# Label used when Transcribe returned no speaker labels at all
+DEFAULT_SPEAKER = "spk_0"
+
+
+class TranscriptIndex:
+    """
+    ``tokens[i]`` is the i-th spoken word (with any following punctuation
+    attached), ``starts[i]``/``ends[i]`` its times in seconds and
+    ``speakers[speaker_ids[i]]`` its speaker label.
+    """
+
+    def __init__(self, tokens=(), starts=(), ends=(), speaker_ids=(), speakers=()):
+        self.tokens = list(tokens)
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+        self.speaker_ids = array("H", speaker_ids)
+        self.speakers = list(speakers) or [DEFAULT_SPEAKER]
+        if not (len(self.tokens) == len(self.starts) == len(self.ends) == len(self.speaker_ids)):
+            raise ValueError("Transcript index arrays must have the same length")
+
+    # ---------------- Building ----------------
+    @classmethod
+    def from_transcribe(cls, transcript_data):
+        """Build from an already parsed Transcribe output JSON document."""
+        results = transcript_data.get("results", {})
+        segments = [
+            (float(s["start_time"]), s["speaker_label"])
+            for s in results.get("speaker_labels", {}).get("segments", [])
+        ]
+        return cls.from_items(results.get("items", []), segments)
+
+    @classmethod
+    def from_items(cls, items, segments=()):
+        """
+        Build in one pass over Transcribe ``items`` (any iterable, consumed
+        once, so it can be a streaming parser).
+
+        Items carry their own ``speaker_label`` when speaker identification
+        was on; otherwise the label comes from the ``segments`` span
+        (``(start_seconds, label)`` pairs) containing the word. ``segments``
+        may still be filling up while ``items`` is consumed.
+        """
+        index = cls()
+        speaker_lookup, unlabelled = {}, []
+        tokens, starts, ends, ids = index.tokens, index.starts, index.ends, index.speaker_ids
+        index.speakers = []
+
+        def speaker_id(label):
+            if label not in speaker_lookup:
+                speaker_lookup[label] = len(index.speakers)
+                index.speakers.append(label)
+            return speaker_lookup[label]
+
+        for item in items:
+            content = item["alternatives"][0]["content"]
+            if item.get("type") == "punctuation":
+                if tokens:
+                    tokens[-1] += content
+                continue
+            label = item.get("speaker_label")
+            if label is None:
+                unlabelled.append(len(tokens))
+            tokens.append(content)
+            starts.append(float(item["start_time"]))
+            ends.append(float(item["end_time"]))
+            ids.append(speaker_id(label) if label is not None else 0)
+
+        if unlabelled:
+            segment_starts = [start for start, _ in segments]
+            for k in unlabelled:
+                label = DEFAULT_SPEAKER
+                if segments:
+                    label = segments[max(0, bisect.bisect_right(segment_starts, starts[k]) - 1)][1]
+                ids[k] = speaker_id(label)
+        if not index.speakers:
+            index.speakers = [DEFAULT_SPEAKER]
+        return index
+
+    @classmethod
+    def from_stream(cls, stream):
+        """
+        Build from a binary file-like object holding Transcribe output JSON
+        without loading the document: with the optional ``ijson`` package the
+        items are parsed incrementally and fed straight into the index, so
+        memory does not grow with the JSON size. Falls back to ``json.load``.
+        """
+        if ijson is None:
+            return cls.from_transcribe(json.load(stream))
+        segments = []
+        return cls.from_items(_stream_items(stream, segments), segments)
+
+    def to_dict(self):
+        """JSON-serializable form (e.g. for the result cache)."""
+        return {
+            "tokens": self.tokens,
+            "starts": self.starts.tolist(),
+            "ends": self.ends.tolist(),
+            "speaker_ids": self.speaker_ids.tolist(),
+            "speakers": self.speakers
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["tokens"], data["starts"], data["ends"], data["speaker_ids"], data["speakers"])
+
+    # ---------------- Lookup ----------------
+    def __len__(self):
+        return len(self.tokens)
+
+    def speaker(self, i):
+        return self.speakers[self.speaker_ids[i]]
+
+    def time_range(self, start, end):
+        """``(i, j)`` such that words ``i..j-1`` overlap ``[start, end)`` seconds; O(log n)."""
+        i = bisect.bisect_right(self.ends, start)
+        j = bisect.bisect_left(self.starts, end, lo=i)
+        return i, j
+
+    def text(self, i=0, j=None):
+        return " ".join(self.tokens[i:j])
+
+    def text_between(self, start, end):
+        return self.text(*self.time_range(start, end))
+
+    def turns(self):
+        """``(speaker, i, j)`` for each run of consecutive words by the same speaker."""
+        runs, ids = [], self.speaker_ids
+        i = 0
+        for j in range(1, len(ids) + 1):
+            if j == len(ids) or ids[j] != ids[i]:
+                runs.append((self.speakers[ids[i]], i, j))
+                i = j
+        return runs
+
+    def speaker_text(self, speaker):
+        """Everything one speaker said, turns joined in call order."""
+        return " ".join(self.text(i, j) for label, i, j in self.turns() if label == speaker)
+
+    def words(self, i=0, j=None):
+        """Words ``i..j-1`` as ``{"text", "start_time", "end_time", "speaker"}`` dicts."""
+        j = len(self.tokens) if j is None else j
+        return [
+            {
+                "text": self.tokens[k],
+                "start_time": self.starts[k],
+                "end_time": self.ends[k],
+                "speaker": self.speakers[self.speaker_ids[k]]
+            }
+            for k in range(i, j)
+        ]
+
+    def to_transcript_list(self):
+        """Standardized ``[{"speaker", "text"}]`` transcript, one entry per speaker turn."""
+        return [{"speaker": speaker, "text": self.text(i, j)} for speaker, i, j in self.turns()]
+
+
+# ---------------- Streaming Parse ----------------
+_ITEM = "results.items.item"
+_SEGMENT = "results.speaker_labels.segments.item"
+
+
+def _stream_items(stream, segments):
+    """
+    Yield Transcribe items one at a time from ijson parse events, keeping
+    only the fields the index needs. Speaker segment starts and labels are
+    appended to ``segments`` as they go by; the per-word entries nested
+    inside each segment are skipped.
+    """
+    item, segment = None, None
+    for prefix, event, value in ijson.parse(stream):
+        if prefix == _ITEM:
+            if event == "start_map":
+                item = {"alternatives": []}
+            elif event == "end_map":
+                yield item
+                item = None
+        elif item is not None:
+            if prefix == _ITEM + ".alternatives.item.content":
+                item["alternatives"].append({"content": value})
+            elif event == "string" and prefix in _ITEM_FIELDS:
+                item[_ITEM_FIELDS[prefix]] = value
+        elif prefix == _SEGMENT:
+            if event == "start_map":
+                segment = {}
+            elif event == "end_map":
+                if "start_time" in segment and "speaker_label" in segment:
+                    segments.append((float(segment["start_time"]), segment["speaker_label"]))
+                segment = None
+        elif segment is not None and prefix in (_SEGMENT + ".start_time", _SEGMENT + ".speaker_label"):
+            segment[prefix.rsplit(".", 1)[1]] = value
+
+
+_ITEM_FIELDS = {_ITEM + "." + name: name for name in ("type", "start_time", "end_time", "speaker_label")}
+
+
+def fetch_transcript(uri):
+    """
+    Download and index a Transcribe output (https:// or file:// URI) as a
+    stream, never holding the whole document. Returns ``(index, bytes_read)``.
+    """
+    if uri.startswith("file://"):
+        with open(uri[len("file://"):], "rb") as f:
+            reader = _CountingReader(f)
+            return TranscriptIndex.from_stream(reader), reader.count
+    with requests.get(uri, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        reader = _CountingReader(r.raw)
+        return TranscriptIndex.from_stream(reader), reader.count
+
+
+class _CountingReader:
+    """Binary reader wrapper that counts the bytes read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def read(self, size=-1):
+        # json.load (the fallback without ijson) reads everything at once
+        data = self.raw.read() if size is None or size < 0 else self.raw.read(size)
+        self.count += len(data)
+        return data